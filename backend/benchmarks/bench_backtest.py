@@ -0,0 +1,79 @@
+"""
+Backtest sweep benchmark over a synthetic year of recorded snapshots.
+
+Records a 0DTE chain every 30 minutes of every weekday for `days` days into
+a temporary snapshot directory (spot follows a random walk), then times a
+sweep of iron condor settings over it and checks that grids in which no
+trade qualifies come back empty.
+
+Usage (from backend/):
+    python -m benchmarks.bench_backtest [days]
+"""
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_chain
+from services import snapshots
+from services.backtest import run_backtest
+
+SESSION = pd.timedelta_range("9:30:00", "16:00:00", freq="30min")
+
+
+def record_year(root: str, days: int, n_strikes: int = 400, seed: int = 0) -> int:
+    rng = np.random.default_rng(seed)
+    spot = 5000.0
+    count = 0
+    for day in pd.bdate_range(end="2026-10-16", periods=days):
+        expiration = day.strftime("%Y-%m-%d")
+        close = pd.Timestamp(day).tz_localize(snapshots.MARKET_TZ) + pd.Timedelta(hours=16)
+        for offset in SESSION:
+            taken_at = pd.Timestamp(day).tz_localize(snapshots.MARKET_TZ) + offset
+            T = max((close - taken_at).total_seconds() / (365 * 86400), 1 / (365 * 24))
+            spot *= np.exp(rng.normal(0, 0.002))
+            chain = make_chain(n_strikes, spot=round(spot / 5) * 5, T=T, expiration=expiration,
+                               seed=count, step=5.0)
+            snapshots.record(chain, root, taken_at.to_pydatetime())
+            count += 1
+    return count
+
+
+def check_no_trades(root: str):
+    """A grid in which no trade qualifies returns an empty response, not an error"""
+    grid = dict(short_deltas=[0.1], widths=[10], take_profits=[50], stop_losses=[100], include_trades=True)
+    for name, overrides in (("no entries", {"entry_time": "17:00"}), ("no strikes", {"widths": [5000]})):
+        result = run_backtest("BENCH", "iron_condor", root=root, **{**grid, **overrides})
+        assert result.results == [] and result.trades == [], name
+    print("no-trade grids: empty results")
+
+
+def main(days: int = 250):
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        count = record_year(root, days)
+        print(f"recorded {count} snapshots in {time.perf_counter() - start:.1f}s")
+        
+        grid = dict(
+            short_deltas=list(np.round(np.arange(0.05, 0.31, 0.025), 3)),
+            widths=[5, 10, 15, 20, 25],
+            take_profits=[25, 50, 75, 100],
+            stop_losses=[50, 100, 200, 300],
+        )
+        configs = np.prod([len(v) for v in grid.values()])
+        start = time.perf_counter()
+        result = run_backtest("BENCH", "iron_condor", root=root, **grid)
+        elapsed = time.perf_counter() - start
+        print(f"{configs} configurations over {result.entries} entries in {elapsed:.1f}s")
+        for summary in result.results[:5]:
+            print(f"  delta {summary.short_delta:.3f} width {summary.width:>4.0f} "
+                  f"tp {summary.take_profit_pct:>3.0f} sl {summary.stop_loss_pct:>3.0f}: "
+                  f"{summary.trades} trades, win {summary.win_rate:.1f}%, P/L {summary.total_pnl:.0f}, "
+                  f"max DD {summary.max_drawdown:.0f}, exits {summary.exits}")
+        
+        check_no_trades(root)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 250)
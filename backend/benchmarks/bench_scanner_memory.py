@@ -0,0 +1,53 @@
+"""
+Memory/time benchmark for scanner candidate generation on a dense chain.
+
+Compares the structured-array records produced by services.scanners with
+materializing a pydantic model for every candidate (the previous approach).
+
+Usage (from backend/):
+    python -m benchmarks.bench_scanner_memory [n_strikes]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_chain
+from models.schemas import IronCondor, IronButterfly, Straddle, Strangle, CreditSpread
+from services import scanners
+from services.scanners import records_to_models
+
+
+def measure(fn):
+    """Run fn once, returning (result, seconds, peak traced bytes)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(n_strikes: int = 2000):
+    chain = make_chain(n_strikes)
+    cases = [
+        ("credit spreads", lambda: scanners.vertical_spreads(chain, chain.puts, -5, 5), CreditSpread, {"spread_type": "Bull Put"}),
+        ("iron condors", lambda: scanners.iron_condors(chain, 25), IronCondor, {}),
+        ("iron butterflies", lambda: scanners.iron_butterflies(chain, 25), IronButterfly, {}),
+        ("straddles", lambda: scanners.straddles(chain), Straddle, {}),
+        ("strangles", lambda: scanners.strangles(chain, 50), Strangle, {}),
+    ]
+    
+    print(f"{n_strikes}-strike chain")
+    print(f"{'scanner':<18}{'candidates':>12}{'records MB':>12}{'records ms':>12}{'models MB':>12}{'models ms':>12}")
+    for name, generate, model, constants in cases:
+        records, rec_time, rec_peak = measure(generate)
+        _, model_time, model_peak = measure(lambda: records_to_models(records, model, **constants))
+        print(f"{name:<18}{len(records):>12}{rec_peak / 1e6:>12.1f}{rec_time * 1e3:>12.1f}"
+              f"{model_peak / 1e6:>12.1f}{model_time * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
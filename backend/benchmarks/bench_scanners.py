@@ -0,0 +1,61 @@
+"""
+Latency of each scanner endpoint's work on one chain snapshot.
+
+Times candidate generation, ranking and model conversion of the returned
+records (everything the handler does after get_chain) on a synthetic chain
+the size of a full SPX expiration.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scanners [n_strikes]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmarks.synthetic import make_chain
+from models.schemas import IronCondor, IronButterfly, Straddle, Strangle
+from services import scanners
+from services.scanners import records_to_models
+
+
+def best_of(fn, repeat: int = 20) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def main(n_strikes: int = 600):
+    chain = make_chain(n_strikes)
+    
+    def endpoint(generate, limit, sort_field, descending, model, decimals):
+        def run():
+            candidates = generate()
+            best = scanners.top(candidates, np.round(candidates[sort_field], 2), limit, descending)
+            return records_to_models(best, model, decimals)
+        return run
+    
+    cases = [
+        ("straddles", endpoint(lambda: scanners.straddles(chain), 100, 'distance_from_spot', False,
+                               Straddle, scanners.STRADDLE_DECIMALS)),
+        ("iron butterflies", endpoint(lambda: scanners.iron_butterflies(chain, 25), 100, 'net_credit', True,
+                                      IronButterfly, scanners.IRON_BUTTERFLY_DECIMALS)),
+        ("iron butterflies x5", endpoint(lambda: scanners.iron_butterflies(chain, [10, 25, 50, 75, 100]), 100,
+                                         'net_credit', True, IronButterfly, scanners.IRON_BUTTERFLY_DECIMALS)),
+        ("strangles", endpoint(lambda: scanners.strangles(chain, 50), 100, 'total_cost', False,
+                               Strangle, scanners.STRANGLE_DECIMALS)),
+        ("iron condors", endpoint(lambda: scanners.iron_condors(chain, 25), 200, 'net_credit', True,
+                                  IronCondor, scanners.IRON_CONDOR_DECIMALS)),
+    ]
+    
+    print(f"{n_strikes}-strike chain")
+    for name, run in cases:
+        print(f"{name:<22}{best_of(run):>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 600)
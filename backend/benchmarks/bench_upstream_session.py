@@ -0,0 +1,121 @@
+"""
+Per-request latency and TLS handshakes: a session per call vs the shared pool.
+
+A yf.Ticker built without a session makes its own curl session, so each
+call set up a new connection; services/yahoo_client shares one keep-alive
+session instead. Both are timed over the same requests, counting those that
+needed a TLS handshake (libcurl reports an APPCONNECT_TIME of 0 for a reused
+connection).
+
+Without a URL the requests go to a local HTTPS server with a throwaway
+self-signed certificate, so no network access is needed; pass a URL (e.g.
+https://query2.finance.yahoo.com/v8/finance/chart/SPY) to measure Yahoo.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upstream_session [n_requests] [url]
+"""
+import datetime
+import json
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from curl_cffi import CurlInfo
+from curl_cffi import requests as curl_requests
+
+from services import yahoo_client
+
+INFOS = [CurlInfo.APPCONNECT_TIME]
+BODY = json.dumps({"chart": {"result": [{"meta": {"symbol": "SPY"}}], "error": None}}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+    
+    def log_message(self, *args):
+        pass
+
+
+def write_self_signed(directory: str):
+    """(cert path, key path) of a localhost certificate valid for a day"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def local_server(directory: str) -> ThreadingHTTPServer:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*write_self_signed(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(get, n_requests: int):
+    """(latencies in ms, requests that made a TLS handshake)"""
+    latencies, handshakes = [], 0
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        response = get()
+        latencies.append((time.perf_counter() - start) * 1e3)
+        handshakes += response.infos[CurlInfo.APPCONNECT_TIME] > 0
+    return np.array(latencies), handshakes
+
+
+def main(n_requests: int = 200, url: str = None):
+    verify = url is not None
+    server = None
+    if url is None:
+        server = local_server(tempfile.mkdtemp())
+        url = f"https://localhost:{server.server_address[1]}/v8/finance/chart/SPY"
+    
+    def per_call():
+        with curl_requests.Session(impersonate="chrome", curl_infos=INFOS) as session:
+            return session.get(url, verify=verify)
+    
+    shared = yahoo_client.session()
+    shared.curl_infos = INFOS
+    
+    print(f"{n_requests} requests to {url}")
+    print(f"{'':<20}{'median':>10}{'p95':>10}{'handshakes':>12}")
+    for name, get in (("session per call", per_call),
+                      ("shared session", lambda: shared.get(url, verify=verify))):
+        latencies, handshakes = run(get, n_requests)
+        print(f"{name:<20}{np.median(latencies):>7.2f} ms{np.percentile(latencies, 95):>7.2f} ms"
+              f"{handshakes:>12}")
+    
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,48 @@
+"""
+Synthetic option chains for offline benchmarks (no network access needed)
+"""
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from services.chain import Chain
+
+
+def make_chain_frames(n_strikes: int = 2000, spot: float = 5000.0, step: float = 2.5,
+                      T: float = 7 / 365, r: float = 0.045, seed: int = 0):
+    """Build Yahoo-shaped calls/puts DataFrames priced off a smile"""
+    rng = np.random.default_rng(seed)
+    strikes = spot + (np.arange(n_strikes) - n_strikes // 2) * step
+    moneyness = np.log(strikes / spot)
+    iv = 0.16 - 0.25 * moneyness + 1.5 * moneyness ** 2 + rng.normal(0, 0.002, n_strikes)
+    iv = np.clip(iv, 0.05, 2.0)
+    
+    d1 = (np.log(spot / strikes) + (r + iv ** 2 / 2) * T) / (iv * np.sqrt(T))
+    d2 = d1 - iv * np.sqrt(T)
+    frames = {}
+    for option_type in ('call', 'put'):
+        if option_type == 'call':
+            price = spot * norm.cdf(d1) - strikes * np.exp(-r * T) * norm.cdf(d2)
+        else:
+            price = strikes * np.exp(-r * T) * norm.cdf(-d2) - spot * norm.cdf(-d1)
+        price = np.maximum(price, 0.0)
+        half_spread = np.maximum(0.05, price * 0.01)
+        frames[option_type] = pd.DataFrame({
+            'strike': strikes,
+            'lastPrice': np.round(price, 2),
+            'bid': np.round(np.maximum(price - half_spread, 0), 2),
+            'ask': np.round(price + half_spread, 2),
+            'change': rng.normal(0, 1, n_strikes),
+            'percentChange': rng.normal(0, 5, n_strikes),
+            'volume': rng.integers(0, 1000, n_strikes).astype(float),
+            'openInterest': rng.integers(0, 5000, n_strikes).astype(float),
+            'impliedVolatility': iv,
+            'inTheMoney': strikes < spot if option_type == 'call' else strikes > spot,
+        })
+    return frames['call'], frames['put']
+
+
+def make_chain(n_strikes: int = 2000, spot: float = 5000.0, T: float = 7 / 365,
+               expiration: str = "2099-01-01", seed: int = 0, **kwargs) -> Chain:
+    calls, puts = make_chain_frames(n_strikes, spot, T=T, seed=seed, **kwargs)
+    return Chain("BENCH", expiration, calls, puts, spot, T, 0.045)
@@ -3,6 +3,13 @@ from .schemas import (
     OptionContract, OptionsChain, OptionsExpirations, CreditSpread, CreditSpreadsResponse,
     IronCondor, IronCondorsResponse, IronButterfly, IronButterfliesResponse,
     Straddle, Strangle, StraddlesResponse, StranglesResponse,
-    CalendarSpread, CalendarSpreadsResponse
+    CalendarSpread, CalendarSpreadsResponse, TermCalendarSpread, TermCalendarsResponse,
+    PayoffRequest, PayoffCurve, PayoffResponse,
+    BacktestRequest, BacktestTrade, BacktestSummary, BacktestResponse,
+    SweepResult, SweepResponse
+)
+from .position import (
+    PositionLeg, PositionCreate, Position, PositionWithPnL, PortfolioSummary,
+    GreekExposure, PortfolioGreeks, PositionScenarios, PortfolioScenarios,
+    PositionRisk, RiskConcentration, PortfolioRisk, VaRLevel, PortfolioVaR
 )
-from .position import PositionLeg, PositionCreate, Position, PositionWithPnL, PortfolioSummary
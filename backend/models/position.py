@@ -54,3 +54,84 @@ class PortfolioSummary(BaseModel):
     total_unrealized_pnl: float
     total_realized_pnl: float
     positions: List[PositionWithPnL]
+
+
+class GreekExposure(BaseModel):
+    key: str  # Symbol, "symbol expiration", strategy type or position id
+    positions: int
+    delta: float  # Share-equivalent delta
+    gamma: float  # Change in delta per 1 point move
+    theta: float  # Dollars per day
+    vega: float  # Dollars per 1 vol point
+    delta_dollars: float  # Delta x underlying price
+
+
+class PortfolioGreeks(BaseModel):
+    total: GreekExposure
+    by_symbol: List[GreekExposure]
+    by_expiration: List[GreekExposure]
+    by_strategy: List[GreekExposure]
+    positions: List[GreekExposure]
+    unpriced_positions: List[str] = []  # Position ids whose chain could not be loaded
+    timestamp: str
+
+
+class PositionScenarios(BaseModel):
+    key: str  # Position id
+    pnl: List[List[List[float]]]  # [spot shock][iv shock][day offset]
+
+
+class PortfolioScenarios(BaseModel):
+    spot_shocks: List[float]  # Percent moves of every underlying
+    iv_shocks: List[float]  # Vol points added to every leg's IV
+    days: List[int]  # Calendar days forward
+    total: List[List[List[float]]]  # P/L change vs current model value, [spot][iv][day]
+    positions: List[PositionScenarios]
+    unpriced_positions: List[str] = []
+    timestamp: str
+
+
+class PositionRisk(BaseModel):
+    id: str
+    symbol: str
+    strategy_type: str
+    strategy_name: str
+    max_profit: Optional[float] = None  # Dollars at expiration; None when unlimited
+    max_loss: Optional[float] = None  # Dollars at expiration (positive); None when unlimited
+    breakevens: List[float] = []
+    exact: bool = True  # False when legs expire on different dates (evaluated on a price grid)
+
+
+class RiskConcentration(BaseModel):
+    key: str
+    positions: int
+    risk: float  # Capital at risk (sum of bounded max losses)
+    percent: float
+
+
+class PortfolioRisk(BaseModel):
+    total_capital_at_risk: float
+    capital_at_risk_percent: Optional[float] = None  # Of trading_capital, when given
+    unlimited_risk_positions: List[str] = []
+    by_symbol: List[RiskConcentration]
+    by_strategy: List[RiskConcentration]
+    positions: List[PositionRisk]
+    unpriced_positions: List[str] = []
+    timestamp: str
+
+
+class VaRLevel(BaseModel):
+    confidence: float  # e.g. 0.95
+    var: float  # Loss in dollars not exceeded with this confidence (positive = loss)
+    expected_shortfall: float  # Average loss beyond the VaR
+
+
+class PortfolioVaR(BaseModel):
+    mode: str  # 'historical', 'parametric' or 'monte_carlo'
+    horizon_days: int
+    scenarios: int  # Historical days or Monte Carlo paths; 0 for parametric
+    positions: int
+    levels: List[VaRLevel]
+    unpriced_positions: List[str] = []
+    as_of: str  # Trading day the scenarios belong to
+    timestamp: str
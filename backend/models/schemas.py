@@ -1,8 +1,10 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timezone
 
+from .position import PositionLeg
+
 
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -31,6 +33,7 @@ class SPXQuote(BaseModel):
     fifty_two_week_low: float
     timestamp: str
     market_state: Optional[str] = None  # REGULAR, PRE, POST, CLOSED
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class HistoricalDataPoint(BaseModel):
@@ -46,6 +49,7 @@ class SPXHistory(BaseModel):
     symbol: str
     period: str
     data: List[HistoricalDataPoint]
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class OptionContract(BaseModel):
@@ -70,6 +74,7 @@ class OptionsChain(BaseModel):
     expirationDate: str
     calls: List[OptionContract]
     puts: List[OptionContract]
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class OptionsExpirations(BaseModel):
@@ -89,8 +94,12 @@ class CreditSpread(BaseModel):
     breakeven: float
     risk_reward_ratio: float
     probability_otm: Optional[float] = None
+    probability_profit: Optional[float] = None
     sell_delta: Optional[float] = None
     buy_delta: Optional[float] = None
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
 
 
 class CreditSpreadsResponse(BaseModel):
@@ -100,6 +109,8 @@ class CreditSpreadsResponse(BaseModel):
     spread_width: int
     bull_put_spreads: List[CreditSpread]
     bear_call_spreads: List[CreditSpread]
+    as_of: Optional[str] = None  # When the chain snapshot behind the results was fetched
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class IronCondor(BaseModel):
@@ -118,6 +129,9 @@ class IronCondor(BaseModel):
     profit_zone_pct: float
     risk_reward_ratio: float
     probability_profit: Optional[float] = None
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
 
 
 class IronCondorsResponse(BaseModel):
@@ -126,6 +140,8 @@ class IronCondorsResponse(BaseModel):
     current_price: float
     spread_width: int
     iron_condors: List[IronCondor]
+    as_of: Optional[str] = None  # When the chain snapshot behind the results was fetched
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class IronButterfly(BaseModel):
@@ -144,14 +160,19 @@ class IronButterfly(BaseModel):
     risk_reward_ratio: float
     probability_profit: Optional[float] = None
     distance_from_spot: float
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
 
 
 class IronButterfliesResponse(BaseModel):
     symbol: str
     expiration: str
     current_price: float
-    wing_width: int
+    wing_width: float
+    wing_widths: List[float] = []
     iron_butterflies: List[IronButterfly]
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class Straddle(BaseModel):
@@ -166,6 +187,10 @@ class Straddle(BaseModel):
     call_iv: float
     put_iv: float
     avg_iv: float
+    probability_profit: Optional[float] = None
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
 
 
 class Strangle(BaseModel):
@@ -181,6 +206,12 @@ class Strangle(BaseModel):
     call_iv: float
     put_iv: float
     avg_iv: float
+    call_delta: Optional[float] = None
+    put_delta: Optional[float] = None
+    probability_profit: Optional[float] = None
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
 
 
 class StraddlesResponse(BaseModel):
@@ -188,6 +219,8 @@ class StraddlesResponse(BaseModel):
     expiration: str
     current_price: float
     straddles: List[Straddle]
+    as_of: Optional[str] = None  # When the chain snapshot behind the results was fetched
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class StranglesResponse(BaseModel):
@@ -195,6 +228,7 @@ class StranglesResponse(BaseModel):
     expiration: str
     current_price: float
     strangles: List[Strangle]
+    stale: bool = False  # Served from cache because upstream was unavailable
 
 
 class CalendarSpread(BaseModel):
@@ -212,6 +246,10 @@ class CalendarSpread(BaseModel):
     far_theta: Optional[float] = None
     theta_edge: Optional[float] = None
     distance_from_spot: float
+    probability_profit: Optional[float] = None
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
 
 
 class CalendarSpreadsResponse(BaseModel):
@@ -220,3 +258,140 @@ class CalendarSpreadsResponse(BaseModel):
     far_expiration: str
     current_price: float
     calendar_spreads: List[CalendarSpread]
+    stale: bool = False  # Served from cache because upstream was unavailable
+
+
+class TermCalendarSpread(BaseModel):
+    """Calendar (equal strikes) or diagonal between any two expirations"""
+    near_expiration: str
+    far_expiration: str
+    option_type: str
+    near_strike: float
+    far_strike: float
+    near_price: float
+    far_price: float
+    net_debit: float
+    near_iv: float
+    far_iv: float
+    iv_difference: float
+    near_theta: Optional[float] = None
+    far_theta: Optional[float] = None
+    theta_edge: Optional[float] = None
+    distance_from_spot: float
+    probability_profit: Optional[float] = None
+    expected_value: Optional[float] = None
+    pop_weighted_ror: Optional[float] = None
+    kelly_fraction: Optional[float] = None
+
+
+class TermCalendarsResponse(BaseModel):
+    symbol: str
+    current_price: float
+    expirations: List[str]
+    strike_offsets: List[float]
+    order_by: str
+    candidates: int
+    spreads: List[TermCalendarSpread]
+    stale: bool = False  # Served from cache because upstream was unavailable
+
+
+class PayoffRequest(BaseModel):
+    symbol: str = "^SPX"
+    expiration: Optional[str] = None  # Default expiration for legs without their own
+    legs: List[PositionLeg]  # price = fill price per share
+    quantity: int = 1
+    price_low: Optional[float] = None  # Defaults to spot -15%
+    price_high: Optional[float] = None  # Defaults to spot +15%
+    points: int = 101
+    dates: List[str] = []  # YYYY-MM-DD dates for T+n curves; defaults to today
+
+
+class PayoffCurve(BaseModel):
+    label: str  # 'T+n' or 'expiration'
+    date: str
+    pl: List[float]
+
+
+class PayoffResponse(BaseModel):
+    symbol: str
+    current_price: float
+    prices: List[float]
+    curves: List[PayoffCurve]
+
+
+class BacktestRequest(BaseModel):
+    symbol: str = "^SPX"
+    strategy: str = "iron_condor"  # 'bull_put', 'bear_call' or 'iron_condor'
+    short_deltas: List[float] = [0.16]  # Target |delta| of the short strikes
+    widths: List[float] = [5]  # Spread widths in points
+    take_profit_pct: List[float] = [80]  # Auto-close panel defaults
+    stop_loss_pct: List[float] = [80]
+    entry_time: str = "10:00"  # HH:MM market time
+    dte: int = 0  # Minimum calendar days to expiration at entry
+    close_before_expiry_hours: float = 0.5
+    start_date: Optional[str] = None  # YYYY-MM-DD
+    end_date: Optional[str] = None
+    include_trades: bool = False
+
+
+class BacktestTrade(BaseModel):
+    short_delta: float
+    width: float
+    take_profit_pct: float
+    stop_loss_pct: float
+    expiration: str
+    entry_time: str
+    exit_time: str
+    legs: List[PositionLeg]
+    entry_credit: float  # Per share
+    exit_price: float  # Per share paid to close (intrinsic value if settled)
+    pnl: float  # Dollars per contract
+    reason: str  # 'take_profit', 'stop_loss', 'expiry_close' or 'settled'
+
+
+class BacktestSummary(BaseModel):
+    short_delta: float
+    width: float
+    take_profit_pct: float
+    stop_loss_pct: float
+    trades: int
+    wins: int
+    win_rate: float  # Percent
+    total_pnl: float  # Dollars per contract
+    average_pnl: float
+    max_drawdown: float  # Largest peak-to-trough fall of cumulative P/L
+    profit_factor: Optional[float] = None  # Gross profit / gross loss; None without losses
+    average_hours_held: float
+    exits: Dict[str, int]  # Trade count per exit reason
+
+
+class BacktestResponse(BaseModel):
+    symbol: str
+    strategy: str
+    entry_time: str
+    dte: int
+    snapshots: int
+    entries: int
+    unsettled_trades: int  # Trades whose expiration has no recorded settlement yet
+    results: List[BacktestSummary]  # Best total P/L first
+    trades: Optional[List[BacktestTrade]] = None
+
+
+class SweepResult(BaseModel):
+    value: float  # Width or wing the candidates were built with
+    candidates: int  # Candidates found before ranking
+    # Best candidates for this value; only the strategy's list is set
+    credit_spreads: Optional[List[CreditSpread]] = None
+    iron_condors: Optional[List[IronCondor]] = None
+    iron_butterflies: Optional[List[IronButterfly]] = None
+    strangles: Optional[List[Strangle]] = None
+
+
+class SweepResponse(BaseModel):
+    symbol: str
+    expiration: str
+    current_price: float
+    strategy: str
+    parameter: str  # 'width' or 'wing'
+    results: List[SweepResult]
+    stale: bool = False  # Served from cache because upstream was unavailable
@@ -2,3 +2,4 @@ from .quotes import router as quotes_router
 from .options import router as options_router
 from .strategies import router as strategies_router
 from .portfolio import router as portfolio_router
+from .analytics import router as analytics_router
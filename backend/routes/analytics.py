@@ -0,0 +1,122 @@
+from fastapi import APIRouter, HTTPException
+from datetime import date, datetime
+import numpy as np
+import logging
+
+from models.schemas import PayoffRequest, PayoffCurve, PayoffResponse, BacktestRequest, BacktestResponse
+from services.yahoo_finance import YahooFinanceService
+from services.payoff import value_surface
+from services import backtest, snapshots
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+MAX_PAYOFF_POINTS = 1001
+DEFAULT_PRICE_RANGE = 0.15  # +/- 15% of spot, as the frontend charts use
+
+
+def _parse_date(value: str, field: str) -> date:
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field} '{value}', expected YYYY-MM-DD")
+
+
+@router.post("/payoff", response_model=PayoffResponse)
+def get_payoff(request: PayoffRequest):
+    """P/L curves at expiration and at T+n dates for an arbitrary leg list
+    
+    The expiration curve is taken at the first leg expiration; legs that
+    expire later are valued with Black-Scholes for the time they have left.
+    """
+    if not request.legs:
+        raise HTTPException(status_code=400, detail="At least one leg is required")
+    if not 2 <= request.points <= MAX_PAYOFF_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be between 2 and {MAX_PAYOFF_POINTS}")
+    
+    expirations = [leg.expiration or request.expiration for leg in request.legs]
+    if not all(expirations):
+        raise HTTPException(status_code=400, detail="Every leg needs an expiration")
+    expirations = [exp[:10] for exp in expirations]
+    exp_dates = np.array([_parse_date(exp, "expiration") for exp in expirations])
+    eval_dates = [_parse_date(d, "date") for d in request.dates] or [date.today()]
+    
+    try:
+        chains = {exp: YahooFinanceService.get_chain(request.symbol, exp) for exp in set(expirations)}
+        horizon = min(exp_dates)
+        horizon_chain = chains[horizon.isoformat()]
+        spot = horizon_chain.spot
+        
+        option_types = np.array([leg.option_type for leg in request.legs])
+        strikes = np.array([leg.strike for leg in request.legs], dtype=float)
+        weight = np.array([(1 if leg.action == "buy" else -1) * leg.quantity for leg in request.legs], dtype=float)
+        iv = np.array([
+            chains[exp].leg_ivs([leg.option_type], [leg.strike])[0]
+            for exp, leg in zip(expirations, request.legs)
+        ])
+        premium = -float(np.dot(weight, [leg.price for leg in request.legs]))
+        
+        low = request.price_low if request.price_low is not None else spot * (1 - DEFAULT_PRICE_RANGE)
+        high = request.price_high if request.price_high is not None else spot * (1 + DEFAULT_PRICE_RANGE)
+        if not 0 < low < high:
+            raise HTTPException(status_code=400, detail="price_low must be positive and below price_high")
+        prices = np.linspace(low, high, request.points)
+        
+        # Years each leg has left at every curve date; the last row is the horizon
+        curve_dates = eval_dates + [horizon]
+        days_left = np.array([[(exp - d).days for exp in exp_dates] for d in curve_dates])
+        T = np.maximum(days_left, 0) / 365.0
+        
+        surface = value_surface(
+            strikes, option_types == "call", weight, premium, iv, T, prices, horizon_chain.r
+        ) * 100 * request.quantity
+        
+        today = date.today()
+        labels = [f"T+{(d - today).days}" for d in eval_dates] + ["expiration"]
+        curves = [
+            PayoffCurve(label=label, date=d.isoformat(), pl=np.round(row, 2).tolist())
+            for label, d, row in zip(labels, curve_dates, surface)
+        ]
+        
+        logger.info(f"Payoff computed for {request.symbol}: {len(request.legs)} legs, {len(curves)} curves")
+        
+        return PayoffResponse(
+            symbol=request.symbol,
+            current_price=round(spot, 2),
+            prices=np.round(prices, 2).tolist(),
+            curves=curves
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing payoff for {request.symbol}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute payoff for {request.symbol}: {str(e)}")
+
+
+@router.post("/backtest", response_model=BacktestResponse)
+def run_backtest(request: BacktestRequest):
+    """Replay recorded chain snapshots for a grid of strategy settings
+    
+    Declared sync so FastAPI runs the (long) replay in its threadpool.
+    """
+    if not snapshots.SNAPSHOT_DIR:
+        raise HTTPException(status_code=503, detail="Snapshot recording is not configured (CHAIN_SNAPSHOT_DIR)")
+    if request.dte < 0:
+        raise HTTPException(status_code=400, detail="dte must be >= 0")
+    backtest.validate(request.strategy, request.short_deltas, request.widths,
+                      request.take_profit_pct, request.stop_loss_pct)
+    
+    try:
+        return backtest.run_backtest(
+            request.symbol, request.strategy, request.short_deltas, request.widths,
+            request.take_profit_pct, request.stop_loss_pct, request.entry_time, request.dte,
+            request.close_before_expiry_hours, request.start_date, request.end_date,
+            request.include_trades,
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running backtest for {request.symbol}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to run backtest for {request.symbol}: {str(e)}")
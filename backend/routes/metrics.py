@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+import logging
+
+from services.yahoo_finance import YahooFinanceService
+from services import exposure, metrics, payoff, probability, result_cache, snapshots, upstream, value_at_risk, yahoo_client
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# In-process LRU caches reported by name
+CACHES = {
+    "history": YahooFinanceService._history_cache,
+    "info": YahooFinanceService._info_cache,
+    "tickers": yahoo_client._tickers,
+    "snapshot_files": snapshots._file_cache,
+    "pop": probability._pop_cache,
+    "pop_samples": probability._sample_cache,
+    "payoff_surface": payoff._surface_cache,
+    "exposure_greeks": exposure._greeks_cache,
+    "var_scenarios": value_at_risk._scenario_cache,
+    "var_pnl": value_at_risk._pnl_cache,
+}
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+
+def cache_lines():
+    """Hits, misses, hit ratio and size of every cache"""
+    counts = {name: (cache.hits, cache.misses, len(cache)) for name, cache in CACHES.items()}
+    results = result_cache.stats()
+    counts["scanner_results"] = (results["hits"], results["misses"], results["size"])
+    
+    yield from metrics.samples("cache_hits_total", "Cache lookups that found an entry", "counter", ("cache",),
+                               {(name,): hits for name, (hits, _, _) in counts.items()})
+    yield from metrics.samples("cache_misses_total", "Cache lookups that missed", "counter", ("cache",),
+                               {(name,): misses for name, (_, misses, _) in counts.items()})
+    yield from metrics.samples("cache_hit_ratio", "Hits over lookups since start", "gauge", ("cache",),
+                               {(name,): hits / (hits + misses) if hits + misses else float("nan")
+                                for name, (hits, misses, _) in counts.items()})
+    yield from metrics.samples("cache_entries", "Entries currently cached", "gauge", ("cache",),
+                               {(name,): size for name, (_, _, size) in counts.items()})
+    yield from metrics.samples("scanner_results_invalidated_total", "Scanner results dropped for a newer chain",
+                               "counter", (), {(): results["invalidated"]})
+
+
+def upstream_lines():
+    stats = upstream.stats()
+    events = ("calls", "retries", "failures", "rejected", "stale_served")
+    yield from metrics.samples("upstream_events_total", "Upstream calls, retries, failures, breaker rejections "
+                               "and stale fallbacks", "counter", ("event",), {(event,): stats[event] for event in events})
+    yield from metrics.samples("upstream_circuit_state", "1 for the circuit breaker's current state", "gauge",
+                               ("state",), {(state,): int(stats["circuit"] == state) for state in CIRCUIT_STATES})
+    yield from metrics.samples("upstream_stale_keys", "Data currently served from expired cache entries", "gauge",
+                               (), {(): stats["stale_keys"]})
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of latency histograms, cache and upstream stats"""
+    try:
+        body = metrics.render([*cache_lines(), *upstream_lines()])
+        return PlainTextResponse(body, media_type=metrics.CONTENT_TYPE)
+    
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to render metrics: {str(e)}")
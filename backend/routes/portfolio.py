@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
-import yfinance as yf
 import logging
 
 from models.position import (
-    PositionCreate, Position, PositionWithPnL, PortfolioSummary
+    PositionCreate, Position, PositionWithPnL, PortfolioSummary, PortfolioGreeks,
+    PortfolioScenarios, PortfolioRisk, PortfolioVaR
 )
+from services.yahoo_finance import YahooFinanceService
+from services import exposure, risk, scenarios, upstream, value_at_risk, yahoo_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -20,6 +23,29 @@ def set_database(database):
     db = database
 
 
+def _mark_position(pos: dict):
+    """Mark an open position against the current chain snapshots
+    
+    Returns (underlying price, net value per contract) where net value is
+    long leg marks minus short leg marks, so P/L = (entry_price + value).
+    Returns a None value if any leg has no usable quote.
+    """
+    underlying = None
+    net_value = 0.0
+    for leg in pos["legs"]:
+        expiration = (leg.get("expiration") or pos["expiration"])[:10]
+        chain = YahooFinanceService.get_chain(pos["symbol"], expiration)
+        underlying = chain.spot
+        
+        mark = chain.leg_marks([leg["option_type"]], [leg["strike"]])[0]
+        if mark != mark:
+            return underlying, None
+        
+        sign = 1 if leg["action"] == "buy" else -1
+        net_value += sign * float(mark) * leg.get("quantity", 1)
+    return underlying, net_value
+
+
 @router.post("/positions", response_model=Position)
 async def create_position(position: PositionCreate):
     """Create a new paper trading position"""
@@ -61,6 +87,11 @@ async def get_positions(symbol: str = None, status: str = None):
             query["status"] = status
             
         positions = await db.positions.find(query, {"_id": 0}).to_list(1000)
+        # Quote and chain fetches block, so they run on the threadpool to let concurrent requests batch
+        await run_in_threadpool(YahooFinanceService.prefetch_quotes, [
+            (pos["symbol"], (leg.get("expiration") or pos["expiration"])[:10])
+            for pos in positions if pos["status"] == "open" for leg in pos["legs"]
+        ])
         
         positions_with_pnl = []
         for pos in positions:
@@ -68,20 +99,13 @@ async def get_positions(symbol: str = None, status: str = None):
             
             if pos["status"] == "open":
                 try:
-                    ticker = yf.Ticker(pos["symbol"])
-                    hist = ticker.history(period="1d")
-                    if not hist.empty:
-                        current_underlying = float(hist['Close'].iloc[-1])
-                        
+                    current_underlying, net_value = await run_in_threadpool(_mark_position, pos)
+                    pos_with_pnl.current_price = current_underlying
+                    
+                    if net_value is not None:
                         entry_value = pos["entry_price"] * pos["quantity"] * 100
+                        pos_with_pnl.unrealized_pnl = round((pos["entry_price"] + net_value) * pos["quantity"] * 100, 2)
                         
-                        if pos["strategy_type"] in ['bull_put', 'bear_call', 'iron_condor', 'iron_butterfly']:
-                            pos_with_pnl.current_price = current_underlying
-                            pos_with_pnl.unrealized_pnl = entry_value * 0.5
-                        else:
-                            pos_with_pnl.current_price = current_underlying
-                            pos_with_pnl.unrealized_pnl = 0
-                            
                         if entry_value != 0:
                             pos_with_pnl.pnl_percent = (pos_with_pnl.unrealized_pnl / abs(entry_value)) * 100
                 except Exception as e:
@@ -242,20 +266,21 @@ async def expire_positions():
                     symbol = pos["symbol"]
                     
                     # Get closing price on expiration date
-                    ticker = yf.Ticker(symbol)
+                    ticker = YahooFinanceService.get_ticker(symbol)
                     
                     # Try to get historical data around expiration date
-                    hist = ticker.history(start=exp_date.isoformat(), end=(exp_date + timedelta(days=5)).isoformat())
+                    hist = upstream.call(f"history({symbol})", ticker.history,
+                                         start=exp_date.isoformat(), end=(exp_date + timedelta(days=5)).isoformat())
                     
                     if hist.empty:
                         # Fallback to recent price
-                        hist = ticker.history(period="5d")
+                        hist = upstream.call(f"history({symbol})", ticker.history, period="5d")
                     
                     if not hist.empty:
                         closing_price = float(hist['Close'].iloc[0])
                     else:
                         logger.warning(f"Could not get closing price for {symbol}, using current price")
-                        info = ticker.info
+                        info = upstream.call(f"info({symbol})", lambda: yahoo_client.fresh_ticker(symbol).info)
                         closing_price = info.get('regularMarketPrice', info.get('previousClose', 0))
                     
                     # Calculate P/L based on option expiration values
@@ -353,3 +378,74 @@ async def get_portfolio_summary():
     except Exception as e:
         logger.error(f"Error fetching portfolio summary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch portfolio summary: {str(e)}")
+
+
+@router.get("/portfolio/greeks", response_model=PortfolioGreeks)
+async def get_portfolio_greeks():
+    """Net delta, gamma, theta and vega of open positions by symbol, expiration and strategy"""
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        positions = await db.positions.find({"status": "open"}, {"_id": 0}).to_list(1000)
+        return exposure.portfolio_greeks(positions)
+    
+    except Exception as e:
+        logger.error(f"Error computing portfolio greeks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute portfolio greeks: {str(e)}")
+
+
+@router.get("/portfolio/scenarios", response_model=PortfolioScenarios)
+async def get_portfolio_scenarios(
+    spot_shocks: List[float] = Query([-10, -5, -3, -1, 0, 1, 3, 5, 10]),
+    iv_shocks: List[float] = Query([-5, 0, 5]),
+    days: List[int] = Query([0])
+):
+    """P/L change of open positions over a grid of spot % shocks x IV point shocks x days forward"""
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    if len(spot_shocks) * len(iv_shocks) * len(days) > scenarios.MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {scenarios.MAX_SCENARIOS} scenarios per request")
+    if any(shock <= -100 for shock in spot_shocks) or any(day < 0 for day in days):
+        raise HTTPException(status_code=400, detail="Spot shocks must be above -100% and days non-negative")
+    
+    try:
+        positions = await db.positions.find({"status": "open"}, {"_id": 0}).to_list(1000)
+        return scenarios.portfolio_scenarios(positions, spot_shocks, iv_shocks, days)
+    
+    except Exception as e:
+        logger.error(f"Error computing portfolio scenarios: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute portfolio scenarios: {str(e)}")
+
+
+@router.get("/portfolio/risk", response_model=PortfolioRisk)
+async def get_portfolio_risk(trading_capital: float = None):
+    """Exact max loss, max profit and breakevens of open positions with capital-at-risk concentration"""
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        positions = await db.positions.find({"status": "open"}, {"_id": 0}).to_list(1000)
+        return risk.portfolio_risk(positions, trading_capital)
+    
+    except Exception as e:
+        logger.error(f"Error computing portfolio risk: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute portfolio risk: {str(e)}")
+
+
+@router.get("/portfolio/var", response_model=PortfolioVaR)
+async def get_portfolio_var(mode: str = "historical"):
+    """1-day 95% / 99% Value-at-Risk and expected shortfall of open positions"""
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    value_at_risk.validate_mode(mode)
+    
+    try:
+        positions = await db.positions.find({"status": "open"}, {"_id": 0}).to_list(1000)
+        return value_at_risk.portfolio_var(positions, mode)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing portfolio VaR: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute portfolio VaR: {str(e)}")
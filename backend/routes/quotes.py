@@ -44,30 +44,33 @@ async def get_status_checks():
 
 
 @router.get("/quote", response_model=SPXQuote)
-async def get_quote(symbol: str = "^GSPC"):
+def get_quote(symbol: str = "^GSPC"):
     """Get current quote for any stock/index from Yahoo Finance"""
     return YahooFinanceService.fetch_quote(symbol)
 
 
 @router.get("/spx/quote", response_model=SPXQuote)
-async def get_spx_quote():
+def get_spx_quote():
     """Get current SPX (S&P 500) quote - backwards compatible endpoint"""
-    return await get_quote("^GSPC")
+    return get_quote("^GSPC")
 
 
 @router.get("/history", response_model=SPXHistory)
-async def get_history(symbol: str = "^GSPC", period: str = "1mo", interval: str = None):
+def get_history(symbol: str = "^GSPC", period: str = "1mo", interval: str = None,
+                      max_points: int = None, downsample: str = "lttb"):
     """Get historical data for any stock/index
     
     Args:
         symbol: Stock/index symbol (default: ^GSPC)
         period: Time period - 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max
         interval: Data interval - 1m, 5m, 15m, 1h, 1d (auto-selected if not provided)
+        max_points: Downsample to at most this many bars (e.g. the chart's pixel width)
+        downsample: lttb (keeps line shape) or ohlc (bucketed candles)
     """
-    return YahooFinanceService.fetch_history(symbol, period, interval)
+    return YahooFinanceService.fetch_history(symbol, period, interval, max_points, downsample)
 
 
 @router.get("/spx/history", response_model=SPXHistory)
-async def get_spx_history(period: str = "1mo"):
+def get_spx_history(period: str = "1mo"):
     """Get historical SPX data - backwards compatible endpoint"""
-    return await get_history("^GSPC", period)
+    return get_history("^GSPC", period)
@@ -1,181 +1,58 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime
-import yfinance as yf
-import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import List, Optional
+import numpy as np
 import logging
 
 from models.schemas import (
     IronCondor, IronCondorsResponse, IronButterfly, IronButterfliesResponse,
     Straddle, Strangle, StraddlesResponse, StranglesResponse,
-    CalendarSpread, CalendarSpreadsResponse
+    CalendarSpread, CalendarSpreadsResponse, TermCalendarSpread, TermCalendarsResponse,
+    CreditSpread, SweepResult, SweepResponse
 )
 from services.yahoo_finance import YahooFinanceService
-from services.greeks import calculate_greeks, calculate_probability_between
+from services import result_cache, scanners
+from services.scanners import records_to_models
+from services.probability import validate_mode
+from services.scoring import ORDER_BY_FIELDS, validate_order_by
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+MAX_SWEEP_VALUES = 50
+MAX_SWEEP_LIMIT = 100
+MAX_TERM_EXPIRATIONS = 12
+DEFAULT_TERM_EXPIRATIONS = 6
+MAX_STRIKE_OFFSETS = 10
+# Cheap ranking fields: only the best `limit` calendars are scored
+TERM_ORDER_BY = ("theta_edge", "iv_difference")
+
+# Strategy -> (SweepResult field, model, decimals, default sort field, highest first, constants);
+# default sorts match the single-value endpoints
+_SWEEP_OUTPUT = {
+    "bull_put": ("credit_spreads", CreditSpread, scanners.VERTICAL_DECIMALS, "net_credit", True, {"spread_type": "Bull Put"}),
+    "bear_call": ("credit_spreads", CreditSpread, scanners.VERTICAL_DECIMALS, "net_credit", True, {"spread_type": "Bear Call"}),
+    "iron_condor": ("iron_condors", IronCondor, scanners.IRON_CONDOR_DECIMALS, "net_credit", True, {}),
+    "iron_butterfly": ("iron_butterflies", IronButterfly, scanners.IRON_BUTTERFLY_DECIMALS, "net_credit", True, {}),
+    "strangle": ("strangles", Strangle, scanners.STRANGLE_DECIMALS, "total_cost", False, {}),
+}
+
 
 @router.get("/iron-condors", response_model=IronCondorsResponse)
-async def get_iron_condors(symbol: str = "^SPX", expiration: str = None, spread: int = 5):
+def get_iron_condors(request: Request, response: Response, symbol: str = "^SPX", expiration: str = None, spread: int = 5, pop_mode: str = "closed_form", order_by: str = None):
     """Get Iron Condor opportunities for a specific expiration date"""
     if not expiration:
         raise HTTPException(status_code=400, detail="Expiration date is required")
+    validate_mode(pop_mode)
+    validate_order_by(order_by)
     
     try:
-        ticker = yf.Ticker(symbol)
-        
-        if expiration not in ticker.options:
-            raise HTTPException(status_code=400, detail=f"Invalid expiration date for {symbol}")
-        
-        opt_chain = ticker.option_chain(expiration)
-        current_price = YahooFinanceService.get_current_price(symbol)
-        T = YahooFinanceService.calculate_time_to_expiration(expiration)
-        r = YahooFinanceService.RISK_FREE_RATE
-        
-        # Process puts for Bull Put Spreads
-        puts_df = opt_chain.puts.copy()
-        puts_df = puts_df.sort_values('strike')
-        
-        bull_puts = []
-        for _, sell_row in puts_df.iterrows():
-            sell_strike = float(sell_row['strike'])
-            buy_strike = sell_strike - spread
-            
-            buy_rows = puts_df[puts_df['strike'] == buy_strike]
-            if buy_rows.empty:
-                continue
-                
-            buy_row = buy_rows.iloc[0]
-            sell_bid = float(sell_row['bid']) if not pd.isna(sell_row['bid']) else 0
-            buy_ask = float(buy_row['ask']) if not pd.isna(buy_row['ask']) else 0
-            
-            if sell_bid <= 0 or buy_ask <= 0:
-                continue
-            
-            net_credit = sell_bid - buy_ask
-            if net_credit <= 0:
-                continue
-            
-            sell_iv = float(sell_row['impliedVolatility']) if not pd.isna(sell_row['impliedVolatility']) else 0.3
-            sell_delta, _, _, _ = calculate_greeks(current_price, sell_strike, T, r, sell_iv, 'put')
-            
-            bull_puts.append({
-                'sell_strike': sell_strike,
-                'buy_strike': buy_strike,
-                'credit': net_credit,
-                'sell_delta': sell_delta,
-                'sell_iv': sell_iv
-            })
-        
-        # Process calls for Bear Call Spreads
-        calls_df = opt_chain.calls.copy()
-        calls_df = calls_df.sort_values('strike')
-        
-        bear_calls = []
-        for _, sell_row in calls_df.iterrows():
-            sell_strike = float(sell_row['strike'])
-            buy_strike = sell_strike + spread
-            
-            buy_rows = calls_df[calls_df['strike'] == buy_strike]
-            if buy_rows.empty:
-                continue
-                
-            buy_row = buy_rows.iloc[0]
-            sell_bid = float(sell_row['bid']) if not pd.isna(sell_row['bid']) else 0
-            buy_ask = float(buy_row['ask']) if not pd.isna(buy_row['ask']) else 0
-            
-            if sell_bid <= 0 or buy_ask <= 0:
-                continue
-            
-            net_credit = sell_bid - buy_ask
-            if net_credit <= 0:
-                continue
-            
-            sell_iv = float(sell_row['impliedVolatility']) if not pd.isna(sell_row['impliedVolatility']) else 0.3
-            sell_delta, _, _, _ = calculate_greeks(current_price, sell_strike, T, r, sell_iv, 'call')
-            
-            bear_calls.append({
-                'sell_strike': sell_strike,
-                'buy_strike': buy_strike,
-                'credit': net_credit,
-                'sell_delta': sell_delta,
-                'sell_iv': sell_iv
-            })
-        
-        # Combine into Iron Condors
-        iron_condors = []
-        for bp in bull_puts:
-            for bc in bear_calls:
-                # Valid Iron Condor: short call strike must be higher than short put strike
-                if bc['sell_strike'] <= bp['sell_strike']:
-                    continue
-                
-                net_credit = bp['credit'] + bc['credit']
-                max_profit = net_credit * 100
-                max_loss = (spread - net_credit) * 100
-                
-                lower_breakeven = bp['sell_strike'] - net_credit
-                upper_breakeven = bc['sell_strike'] + net_credit
-                profit_zone_width = upper_breakeven - lower_breakeven
-                profit_zone_pct = (profit_zone_width / current_price) * 100
-                
-                risk_reward = max_loss / max_profit if max_profit > 0 else 999
-                
-                # More accurate P(Profit) calculation using breakeven points
-                # Use average IV from both legs for the probability calculation
-                avg_iv = (bp['sell_iv'] + bc['sell_iv']) / 2
-                
-                # Calculate probability that price stays between breakevens at expiration
-                prob_profit = calculate_probability_between(
-                    S=current_price,
-                    lower=lower_breakeven,
-                    upper=upper_breakeven,
-                    T=T,
-                    r=r,
-                    sigma=avg_iv
-                )
-                
-                # Convert to percentage, fallback to delta-based if calculation fails
-                if prob_profit is not None:
-                    prob_profit_pct = prob_profit * 100
-                else:
-                    # Fallback to simple delta-based calculation
-                    put_prob = (1 - abs(bp['sell_delta'])) if bp['sell_delta'] else 0.5
-                    call_prob = (1 - abs(bc['sell_delta'])) if bc['sell_delta'] else 0.5
-                    prob_profit_pct = put_prob * call_prob * 100
-                
-                iron_condors.append(IronCondor(
-                    put_sell_strike=bp['sell_strike'],
-                    put_buy_strike=bp['buy_strike'],
-                    put_credit=round(bp['credit'], 2),
-                    call_sell_strike=bc['sell_strike'],
-                    call_buy_strike=bc['buy_strike'],
-                    call_credit=round(bc['credit'], 2),
-                    net_credit=round(net_credit, 2),
-                    max_profit=round(max_profit, 2),
-                    max_loss=round(max_loss, 2),
-                    lower_breakeven=round(lower_breakeven, 2),
-                    upper_breakeven=round(upper_breakeven, 2),
-                    profit_zone_width=round(profit_zone_width, 2),
-                    profit_zone_pct=round(profit_zone_pct, 2),
-                    risk_reward_ratio=round(risk_reward, 2),
-                    probability_profit=round(prob_profit_pct, 1)
-                ))
-        
-        # Sort by net credit (highest first)
-        iron_condors.sort(key=lambda x: x.net_credit, reverse=True)
-        
-        logger.info(f"Iron Condors fetched for {symbol}: {len(iron_condors)} combinations")
-        
-        return IronCondorsResponse(
-            symbol=symbol,
-            expiration=expiration,
-            current_price=round(current_price, 2),
-            spread_width=spread,
-            iron_condors=iron_condors[:200]
+        entry = result_cache.serve(
+            result_cache.view_key("iron_condors", symbol, expiration, spread=spread, pop_mode=pop_mode, order_by=order_by),
+            lambda: YahooFinanceService.get_chain(symbol, expiration),
+            lambda chain: build_iron_condors(chain, spread, pop_mode, order_by)
         )
-        
+        return result_cache.respond(request, response, entry)
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -183,108 +60,64 @@ async def get_iron_condors(symbol: str = "^SPX", expiration: str = None, spread:
         raise HTTPException(status_code=500, detail=f"Failed to fetch iron condors for {symbol}: {str(e)}")
 
 
+def build_iron_condors(chain, spread: int = 5, pop_mode: str = "closed_form", order_by: str = None) -> IronCondorsResponse:
+    """Build the iron condors response from a chain snapshot"""
+    candidates = scanners.iron_condors(chain, spread, pop_mode)
+    
+    # Sort by net credit (highest first) unless order_by picks a score
+    best = scanners.rank(candidates, 200, order_by, np.round(candidates['net_credit'], 2), descending=True)
+    
+    logger.info(f"Iron Condors fetched for {chain.symbol}: {len(candidates)} combinations")
+    
+    return IronCondorsResponse(
+        symbol=chain.symbol,
+        expiration=chain.expiration,
+        current_price=round(chain.spot, 2),
+        spread_width=spread,
+        iron_condors=records_to_models(best, IronCondor, scanners.IRON_CONDOR_DECIMALS),
+        as_of=chain.as_of
+    )
+
+
 @router.get("/spx/iron-condors", response_model=IronCondorsResponse)
-async def get_spx_iron_condors(expiration: str, spread: int = 5):
+def get_spx_iron_condors(request: Request, response: Response, expiration: str, spread: int = 5):
     """Get SPX Iron Condors - backwards compatible endpoint"""
-    return await get_iron_condors("^SPX", expiration, spread)
+    return get_iron_condors(request, response, "^SPX", expiration, spread)
 
 
 @router.get("/iron-butterflies", response_model=IronButterfliesResponse)
-async def get_iron_butterflies(symbol: str = "^SPX", expiration: str = None, wing: int = 25):
-    """Get Iron Butterfly opportunities for a specific expiration date"""
+def get_iron_butterflies(
+    request: Request,
+    response: Response,
+    symbol: str = "^SPX",
+    expiration: str = None,
+    wing: int = 25,
+    pop_mode: str = "closed_form",
+    order_by: str = None,
+    wings: Optional[List[float]] = Query(None),
+):
+    """Get Iron Butterfly opportunities for a specific expiration date
+    
+    Pass several `wings` (e.g. wings=10&wings=25&wings=50) to scan them all
+    in one pass and rank the butterflies of every wing together; `wing` is
+    used otherwise.
+    """
     if not expiration:
         raise HTTPException(status_code=400, detail="Expiration date is required")
+    if wings is not None and (not wings or len(wings) > MAX_SWEEP_VALUES or min(wings) <= 0):
+        raise HTTPException(status_code=400, detail=f"wings must be 1-{MAX_SWEEP_VALUES} positive widths")
+    validate_mode(pop_mode)
+    validate_order_by(order_by)
     
     try:
-        ticker = yf.Ticker(symbol)
-        
-        if expiration not in ticker.options:
-            raise HTTPException(status_code=400, detail=f"Invalid expiration date for {symbol}")
-        
-        opt_chain = ticker.option_chain(expiration)
-        current_price = YahooFinanceService.get_current_price(symbol)
-        
-        calls_df = opt_chain.calls.copy()
-        puts_df = opt_chain.puts.copy()
-        
-        iron_butterflies = []
-        
-        for _, call_row in calls_df.iterrows():
-            center_strike = float(call_row['strike'])
-            
-            upper_strike = center_strike + wing
-            lower_strike = center_strike - wing
-            
-            center_puts = puts_df[puts_df['strike'] == center_strike]
-            if center_puts.empty:
-                continue
-            put_row = center_puts.iloc[0]
-            
-            upper_calls = calls_df[calls_df['strike'] == upper_strike]
-            lower_puts = puts_df[puts_df['strike'] == lower_strike]
-            
-            if upper_calls.empty or lower_puts.empty:
-                continue
-            
-            upper_call = upper_calls.iloc[0]
-            lower_put = lower_puts.iloc[0]
-            
-            center_call_bid = float(call_row['bid']) if not pd.isna(call_row['bid']) else 0
-            center_put_bid = float(put_row['bid']) if not pd.isna(put_row['bid']) else 0
-            upper_call_ask = float(upper_call['ask']) if not pd.isna(upper_call['ask']) else 0
-            lower_put_ask = float(lower_put['ask']) if not pd.isna(lower_put['ask']) else 0
-            
-            if center_call_bid <= 0 or center_put_bid <= 0 or upper_call_ask <= 0 or lower_put_ask <= 0:
-                continue
-            
-            net_credit = center_call_bid + center_put_bid - upper_call_ask - lower_put_ask
-            
-            if net_credit <= 0:
-                continue
-            
-            max_profit = net_credit * 100
-            max_loss = (wing - net_credit) * 100
-            
-            lower_breakeven = center_strike - net_credit
-            upper_breakeven = center_strike + net_credit
-            
-            risk_reward = max_loss / max_profit if max_profit > 0 else 999
-            distance_from_spot = ((center_strike - current_price) / current_price) * 100
-            
-            breakeven_range = upper_breakeven - lower_breakeven
-            prob_profit = min(90, max(20, (breakeven_range / current_price) * 1000))
-            
-            iron_butterflies.append(IronButterfly(
-                center_strike=center_strike,
-                call_premium=round(center_call_bid, 2),
-                put_premium=round(center_put_bid, 2),
-                upper_strike=upper_strike,
-                lower_strike=lower_strike,
-                upper_cost=round(upper_call_ask, 2),
-                lower_cost=round(lower_put_ask, 2),
-                net_credit=round(net_credit, 2),
-                max_profit=round(max_profit, 2),
-                max_loss=round(max_loss, 2),
-                lower_breakeven=round(lower_breakeven, 2),
-                upper_breakeven=round(upper_breakeven, 2),
-                risk_reward_ratio=round(risk_reward, 2),
-                probability_profit=round(prob_profit, 1),
-                distance_from_spot=round(distance_from_spot, 2)
-            ))
-        
-        # Sort by net credit (highest first)
-        iron_butterflies.sort(key=lambda x: x.net_credit, reverse=True)
-        
-        logger.info(f"Iron Butterflies fetched for {symbol}: {len(iron_butterflies)} combinations")
-        
-        return IronButterfliesResponse(
-            symbol=symbol,
-            expiration=expiration,
-            current_price=round(current_price, 2),
-            wing_width=wing,
-            iron_butterflies=iron_butterflies[:100]
+        entry = result_cache.serve(
+            result_cache.view_key("iron_butterflies", symbol, expiration, wings=tuple(wings or [wing]),
+                                  pop_mode=pop_mode, order_by=order_by),
+            lambda: YahooFinanceService.get_chain(symbol, expiration),
+            lambda chain: build_iron_butterflies(chain, wings or [wing], pop_mode, order_by)
         )
-        
+        return result_cache.respond(request, response, entry)
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -292,84 +125,47 @@ async def get_iron_butterflies(symbol: str = "^SPX", expiration: str = None, win
         raise HTTPException(status_code=500, detail=f"Failed to fetch iron butterflies for {symbol}: {str(e)}")
 
 
+def build_iron_butterflies(chain, wings: List[float], pop_mode: str = "closed_form", order_by: str = None) -> IronButterfliesResponse:
+    """Build the iron butterflies response from a chain snapshot"""
+    candidates = scanners.iron_butterflies(chain, wings, pop_mode)
+    
+    # Sort by net credit (highest first) unless order_by picks a score
+    best = scanners.rank(candidates, 100, order_by, np.round(candidates['net_credit'], 2), descending=True)
+    
+    logger.info(f"Iron Butterflies fetched for {chain.symbol}: {len(candidates)} combinations")
+    
+    return IronButterfliesResponse(
+        symbol=chain.symbol,
+        expiration=chain.expiration,
+        current_price=round(chain.spot, 2),
+        wing_width=wings[0],
+        wing_widths=wings,
+        iron_butterflies=records_to_models(best, IronButterfly, scanners.IRON_BUTTERFLY_DECIMALS)
+    )
+
+
 @router.get("/spx/iron-butterflies", response_model=IronButterfliesResponse)
-async def get_spx_iron_butterflies(expiration: str, wing: int = 25):
+def get_spx_iron_butterflies(request: Request, response: Response, expiration: str, wing: int = 25):
     """Get SPX Iron Butterflies - backwards compatible endpoint"""
-    return await get_iron_butterflies("^SPX", expiration, wing)
+    return get_iron_butterflies(request, response, "^SPX", expiration, wing, wings=None)
 
 
 @router.get("/straddles", response_model=StraddlesResponse)
-async def get_straddles(symbol: str = "^SPX", expiration: str = None):
+def get_straddles(request: Request, response: Response, symbol: str = "^SPX", expiration: str = None, pop_mode: str = "closed_form", order_by: str = None):
     """Get Straddle opportunities - buy call + put at same strike"""
     if not expiration:
         raise HTTPException(status_code=400, detail="Expiration date is required")
+    validate_mode(pop_mode)
+    validate_order_by(order_by)
     
     try:
-        ticker = yf.Ticker(symbol)
-        
-        if expiration not in ticker.options:
-            raise HTTPException(status_code=400, detail=f"Invalid expiration date for {symbol}")
-        
-        opt_chain = ticker.option_chain(expiration)
-        current_price = YahooFinanceService.get_current_price(symbol)
-        
-        calls_df = opt_chain.calls.copy()
-        puts_df = opt_chain.puts.copy()
-        
-        straddles = []
-        
-        for _, call_row in calls_df.iterrows():
-            strike = float(call_row['strike'])
-            
-            matching_puts = puts_df[puts_df['strike'] == strike]
-            if matching_puts.empty:
-                continue
-            
-            put_row = matching_puts.iloc[0]
-            
-            call_ask = float(call_row['ask']) if not pd.isna(call_row['ask']) else 0
-            put_ask = float(put_row['ask']) if not pd.isna(put_row['ask']) else 0
-            
-            if call_ask <= 0 or put_ask <= 0:
-                continue
-            
-            total_cost = call_ask + put_ask
-            lower_breakeven = strike - total_cost
-            upper_breakeven = strike + total_cost
-            
-            breakeven_move_pct = (total_cost / strike) * 100
-            distance_from_spot = ((strike - current_price) / current_price) * 100
-            
-            call_iv = float(call_row['impliedVolatility']) * 100 if not pd.isna(call_row['impliedVolatility']) else 0
-            put_iv = float(put_row['impliedVolatility']) * 100 if not pd.isna(put_row['impliedVolatility']) else 0
-            avg_iv = (call_iv + put_iv) / 2
-            
-            straddles.append(Straddle(
-                strike=strike,
-                call_price=round(call_ask, 2),
-                put_price=round(put_ask, 2),
-                total_cost=round(total_cost, 2),
-                lower_breakeven=round(lower_breakeven, 2),
-                upper_breakeven=round(upper_breakeven, 2),
-                breakeven_move_pct=round(breakeven_move_pct, 2),
-                distance_from_spot=round(distance_from_spot, 2),
-                call_iv=round(call_iv, 1),
-                put_iv=round(put_iv, 1),
-                avg_iv=round(avg_iv, 1)
-            ))
-        
-        # Sort by distance from spot (closest first)
-        straddles.sort(key=lambda x: abs(x.distance_from_spot))
-        
-        logger.info(f"Straddles fetched for {symbol}: {len(straddles)}")
-        
-        return StraddlesResponse(
-            symbol=symbol,
-            expiration=expiration,
-            current_price=round(current_price, 2),
-            straddles=straddles[:100]
+        entry = result_cache.serve(
+            result_cache.view_key("straddles", symbol, expiration, pop_mode=pop_mode, order_by=order_by),
+            lambda: YahooFinanceService.get_chain(symbol, expiration),
+            lambda chain: build_straddles(chain, pop_mode, order_by)
         )
-        
+        return result_cache.respond(request, response, entry)
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -377,107 +173,77 @@ async def get_straddles(symbol: str = "^SPX", expiration: str = None):
         raise HTTPException(status_code=500, detail=f"Failed to fetch straddles for {symbol}: {str(e)}")
 
 
+def build_straddles(chain, pop_mode: str = "closed_form", order_by: str = None) -> StraddlesResponse:
+    """Build the straddles response from a chain snapshot"""
+    candidates = scanners.straddles(chain, pop_mode)
+    
+    # Sort by distance from spot (closest first) unless order_by picks a score
+    best = scanners.rank(candidates, 100, order_by, np.abs(np.round(candidates['distance_from_spot'], 2)))
+    
+    logger.info(f"Straddles fetched for {chain.symbol}: {len(candidates)}")
+    
+    return StraddlesResponse(
+        symbol=chain.symbol,
+        expiration=chain.expiration,
+        current_price=round(chain.spot, 2),
+        straddles=records_to_models(best, Straddle, scanners.STRADDLE_DECIMALS),
+        as_of=chain.as_of
+    )
+
+
 @router.get("/spx/straddles", response_model=StraddlesResponse)
-async def get_spx_straddles(expiration: str):
+def get_spx_straddles(request: Request, response: Response, expiration: str):
     """Get SPX Straddles - backwards compatible endpoint"""
-    return await get_straddles("^SPX", expiration)
+    return get_straddles(request, response, "^SPX", expiration)
+
+
+# Views the precompute scheduler can keep warm: name -> (build function(chain, **params), default params)
+SCAN_VIEWS = {
+    "iron_condors": (build_iron_condors, {"spread": 5, "pop_mode": "closed_form", "order_by": None}),
+    "straddles": (build_straddles, {"pop_mode": "closed_form", "order_by": None}),
+}
 
 
 @router.get("/strangles", response_model=StranglesResponse)
-async def get_strangles(symbol: str = "^SPX", expiration: str = None, width: int = 50):
-    """Get Strangle opportunities - buy OTM call + OTM put at different strikes"""
+def get_strangles(
+    request: Request,
+    response: Response,
+    symbol: str = "^SPX",
+    expiration: str = None,
+    width: int = 50,
+    pop_mode: str = "closed_form",
+    order_by: str = None,
+    call_deltas: Optional[List[float]] = Query(None),
+    put_deltas: Optional[List[float]] = Query(None),
+):
+    """Get Strangle opportunities - buy OTM call + OTM put at different strikes
+    
+    By default every call is paired with the put `width` below it. Passing
+    call_deltas and put_deltas instead pairs the legs closest to each
+    (call_deltas[i], put_deltas[i]) absolute delta target, e.g.
+    call_deltas=0.1&put_deltas=0.1&call_deltas=0.2&put_deltas=0.2.
+    """
     if not expiration:
         raise HTTPException(status_code=400, detail="Expiration date is required")
+    if call_deltas or put_deltas:
+        if not call_deltas or not put_deltas or len(call_deltas) != len(put_deltas) or len(call_deltas) > MAX_SWEEP_VALUES:
+            raise HTTPException(status_code=400, detail=f"call_deltas and put_deltas must be paired lists of at most {MAX_SWEEP_VALUES} targets")
+        if not all(0 < delta < 1 for delta in call_deltas + put_deltas):
+            raise HTTPException(status_code=400, detail="Delta targets must be between 0 and 1")
+    validate_mode(pop_mode)
+    validate_order_by(order_by)
+    
+    # Delta targets replace the fixed width
+    params = {"deltas": tuple(zip(call_deltas, put_deltas))} if call_deltas else {"width": width}
     
     try:
-        ticker = yf.Ticker(symbol)
-        
-        if expiration not in ticker.options:
-            raise HTTPException(status_code=400, detail=f"Invalid expiration date for {symbol}")
-        
-        opt_chain = ticker.option_chain(expiration)
-        current_price = YahooFinanceService.get_current_price(symbol)
-        
-        calls_df = opt_chain.calls.copy()
-        puts_df = opt_chain.puts.copy()
-        
-        strangles = []
-        
-        # Generate strangles from all call/put combinations
-        for _, call_row in calls_df.iterrows():
-            call_strike = float(call_row['strike'])
-            put_strike = call_strike - width
-            
-            matching_puts = puts_df[puts_df['strike'] == put_strike]
-            if matching_puts.empty:
-                # Find closest put strike
-                closest_puts = puts_df.iloc[(puts_df['strike'] - put_strike).abs().argsort()[:1]]
-                if closest_puts.empty:
-                    continue
-                put_row = closest_puts.iloc[0]
-                put_strike = float(put_row['strike'])
-            else:
-                put_row = matching_puts.iloc[0]
-            
-            # For a valid strangle, call strike should be higher than put strike
-            if call_strike <= put_strike:
-                continue
-            
-            call_ask = float(call_row['ask']) if not pd.isna(call_row['ask']) else 0
-            put_ask = float(put_row['ask']) if not pd.isna(put_row['ask']) else 0
-            
-            if call_ask <= 0 or put_ask <= 0:
-                continue
-            
-            total_cost = call_ask + put_ask
-            lower_breakeven = put_strike - total_cost
-            upper_breakeven = call_strike + total_cost
-            
-            move_to_upper = ((upper_breakeven - current_price) / current_price) * 100
-            move_to_lower = ((current_price - lower_breakeven) / current_price) * 100
-            breakeven_move_pct = min(move_to_upper, move_to_lower)
-            
-            actual_width = call_strike - put_strike
-            
-            call_iv = float(call_row['impliedVolatility']) * 100 if not pd.isna(call_row['impliedVolatility']) else 0
-            put_iv = float(put_row['impliedVolatility']) * 100 if not pd.isna(put_row['impliedVolatility']) else 0
-            avg_iv = (call_iv + put_iv) / 2
-            
-            strangles.append(Strangle(
-                call_strike=call_strike,
-                put_strike=put_strike,
-                call_price=round(call_ask, 2),
-                put_price=round(put_ask, 2),
-                total_cost=round(total_cost, 2),
-                lower_breakeven=round(lower_breakeven, 2),
-                upper_breakeven=round(upper_breakeven, 2),
-                breakeven_move_pct=round(breakeven_move_pct, 2),
-                width=actual_width,
-                call_iv=round(call_iv, 1),
-                put_iv=round(put_iv, 1),
-                avg_iv=round(avg_iv, 1)
-            ))
-        
-        # Sort by total cost (lowest first)
-        strangles.sort(key=lambda x: x.total_cost)
-        
-        seen = set()
-        unique_strangles = []
-        for s in strangles:
-            key = (s.call_strike, s.put_strike)
-            if key not in seen:
-                seen.add(key)
-                unique_strangles.append(s)
-        
-        logger.info(f"Strangles fetched for {symbol}: {len(unique_strangles)}")
-        
-        return StranglesResponse(
-            symbol=symbol,
-            expiration=expiration,
-            current_price=round(current_price, 2),
-            strangles=unique_strangles[:100]
+        entry = result_cache.serve(
+            result_cache.view_key("strangles", symbol, expiration, pop_mode=pop_mode, order_by=order_by, **params),
+            lambda: YahooFinanceService.get_chain(symbol, expiration),
+            lambda chain: build_strangles(chain, width, pop_mode, order_by, call_deltas, put_deltas)
         )
-        
+        return result_cache.respond(request, response, entry)
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -485,155 +251,50 @@ async def get_strangles(symbol: str = "^SPX", expiration: str = None, width: int
         raise HTTPException(status_code=500, detail=f"Failed to fetch strangles for {symbol}: {str(e)}")
 
 
+def build_strangles(chain, width: int = 50, pop_mode: str = "closed_form", order_by: str = None,
+                    call_deltas: List[float] = None, put_deltas: List[float] = None) -> StranglesResponse:
+    """Build the strangles response from a chain snapshot"""
+    # One candidate per call strike (or per distinct delta-matched pair), so pairs are unique
+    if call_deltas:
+        candidates = scanners.delta_strangles(chain, call_deltas, put_deltas, pop_mode)[0]
+    else:
+        candidates = scanners.strangles(chain, width, pop_mode)
+    
+    # Sort by total cost (lowest first) unless order_by picks a score
+    best = scanners.rank(candidates, 100, order_by, np.round(candidates['total_cost'], 2))
+    
+    logger.info(f"Strangles fetched for {chain.symbol}: {len(candidates)}")
+    
+    return StranglesResponse(
+        symbol=chain.symbol,
+        expiration=chain.expiration,
+        current_price=round(chain.spot, 2),
+        strangles=records_to_models(best, Strangle, scanners.STRANGLE_DECIMALS)
+    )
+
+
 @router.get("/spx/strangles", response_model=StranglesResponse)
-async def get_spx_strangles(expiration: str, width: int = 50):
+def get_spx_strangles(request: Request, response: Response, expiration: str, width: int = 50):
     """Get SPX Strangles - backwards compatible endpoint"""
-    return await get_strangles("^SPX", expiration, width)
+    return get_strangles(request, response, "^SPX", expiration, width, call_deltas=None, put_deltas=None)
 
 
 @router.get("/calendar-spreads", response_model=CalendarSpreadsResponse)
-async def get_calendar_spreads(symbol: str = "^SPX", near_exp: str = None, far_exp: str = None):
+def get_calendar_spreads(request: Request, response: Response, symbol: str = "^SPX", near_exp: str = None, far_exp: str = None, pop_mode: str = "closed_form", order_by: str = None):
     """Get Calendar Spread opportunities - sell near-term, buy far-term at same strike"""
     if not near_exp or not far_exp:
         raise HTTPException(status_code=400, detail="Both near_exp and far_exp are required")
+    validate_mode(pop_mode)
+    validate_order_by(order_by)
     
     try:
-        ticker = yf.Ticker(symbol)
-        
-        if near_exp not in ticker.options:
-            raise HTTPException(status_code=400, detail=f"Invalid near expiration date for {symbol}")
-        if far_exp not in ticker.options:
-            raise HTTPException(status_code=400, detail=f"Invalid far expiration date for {symbol}")
-        
-        current_price = YahooFinanceService.get_current_price(symbol)
-        
-        near_chain = ticker.option_chain(near_exp)
-        far_chain = ticker.option_chain(far_exp)
-        
-        near_date = datetime.strptime(near_exp, "%Y-%m-%d")
-        far_date = datetime.strptime(far_exp, "%Y-%m-%d")
-        today = datetime.now()
-        near_T = max((near_date - today).days / 365.0, 1/365.0)
-        far_T = max((far_date - today).days / 365.0, 1/365.0)
-        r = YahooFinanceService.RISK_FREE_RATE
-        
-        calendar_spreads = []
-        
-        # Process calls
-        for _, near_row in near_chain.calls.iterrows():
-            strike = float(near_row['strike'])
-            
-            far_calls = far_chain.calls[far_chain.calls['strike'] == strike]
-            if far_calls.empty:
-                continue
-            
-            far_row = far_calls.iloc[0]
-            
-            near_bid = float(near_row['bid']) if not pd.isna(near_row['bid']) else 0
-            far_ask = float(far_row['ask']) if not pd.isna(far_row['ask']) else 0
-            
-            if near_bid <= 0 or far_ask <= 0:
-                continue
-            
-            net_debit = far_ask - near_bid
-            
-            if net_debit <= 0:
-                continue
-            
-            near_iv = float(near_row['impliedVolatility']) * 100 if not pd.isna(near_row['impliedVolatility']) else 0
-            far_iv = float(far_row['impliedVolatility']) * 100 if not pd.isna(far_row['impliedVolatility']) else 0
-            iv_diff = near_iv - far_iv
-            
-            near_sigma = near_iv / 100 if near_iv > 0 else 0.3
-            far_sigma = far_iv / 100 if far_iv > 0 else 0.3
-            _, _, near_theta, _ = calculate_greeks(current_price, strike, near_T, r, near_sigma, 'call')
-            _, _, far_theta, _ = calculate_greeks(current_price, strike, far_T, r, far_sigma, 'call')
-            
-            theta_edge = abs(near_theta or 0) - abs(far_theta or 0) if near_theta and far_theta else None
-            
-            distance_from_spot = ((strike - current_price) / current_price) * 100
-            
-            calendar_spreads.append(CalendarSpread(
-                strike=strike,
-                option_type='call',
-                near_expiration=near_exp,
-                far_expiration=far_exp,
-                near_price=round(near_bid, 2),
-                far_price=round(far_ask, 2),
-                net_debit=round(net_debit, 2),
-                near_iv=round(near_iv, 1),
-                far_iv=round(far_iv, 1),
-                iv_difference=round(iv_diff, 1),
-                near_theta=near_theta,
-                far_theta=far_theta,
-                theta_edge=round(theta_edge, 4) if theta_edge else None,
-                distance_from_spot=round(distance_from_spot, 2)
-            ))
-        
-        # Process puts
-        for _, near_row in near_chain.puts.iterrows():
-            strike = float(near_row['strike'])
-            
-            far_puts = far_chain.puts[far_chain.puts['strike'] == strike]
-            if far_puts.empty:
-                continue
-            
-            far_row = far_puts.iloc[0]
-            
-            near_bid = float(near_row['bid']) if not pd.isna(near_row['bid']) else 0
-            far_ask = float(far_row['ask']) if not pd.isna(far_row['ask']) else 0
-            
-            if near_bid <= 0 or far_ask <= 0:
-                continue
-            
-            net_debit = far_ask - near_bid
-            
-            if net_debit <= 0:
-                continue
-            
-            near_iv = float(near_row['impliedVolatility']) * 100 if not pd.isna(near_row['impliedVolatility']) else 0
-            far_iv = float(far_row['impliedVolatility']) * 100 if not pd.isna(far_row['impliedVolatility']) else 0
-            iv_diff = near_iv - far_iv
-            
-            near_sigma = near_iv / 100 if near_iv > 0 else 0.3
-            far_sigma = far_iv / 100 if far_iv > 0 else 0.3
-            _, _, near_theta, _ = calculate_greeks(current_price, strike, near_T, r, near_sigma, 'put')
-            _, _, far_theta, _ = calculate_greeks(current_price, strike, far_T, r, far_sigma, 'put')
-            
-            theta_edge = abs(near_theta or 0) - abs(far_theta or 0) if near_theta and far_theta else None
-            
-            distance_from_spot = ((strike - current_price) / current_price) * 100
-            
-            calendar_spreads.append(CalendarSpread(
-                strike=strike,
-                option_type='put',
-                near_expiration=near_exp,
-                far_expiration=far_exp,
-                near_price=round(near_bid, 2),
-                far_price=round(far_ask, 2),
-                net_debit=round(net_debit, 2),
-                near_iv=round(near_iv, 1),
-                far_iv=round(far_iv, 1),
-                iv_difference=round(iv_diff, 1),
-                near_theta=near_theta,
-                far_theta=far_theta,
-                theta_edge=round(theta_edge, 4) if theta_edge else None,
-                distance_from_spot=round(distance_from_spot, 2)
-            ))
-        
-        # Sort by distance from spot (closest first)
-        calendar_spreads.sort(key=lambda x: abs(x.distance_from_spot))
-        
-        logger.info(f"Calendar spreads fetched for {symbol}: {len(calendar_spreads)}")
-        
-        return CalendarSpreadsResponse(
-            symbol=symbol,
-            near_expiration=near_exp,
-            far_expiration=far_exp,
-            current_price=round(current_price, 2),
-            calendar_spreads=calendar_spreads[:100]
+        entry = result_cache.serve(
+            result_cache.view_key("calendar_spreads", symbol, (near_exp, far_exp), pop_mode=pop_mode, order_by=order_by),
+            lambda: [YahooFinanceService.get_chain(symbol, near_exp), YahooFinanceService.get_chain(symbol, far_exp)],
+            lambda chains: build_calendar_spreads(*chains, pop_mode, order_by)
         )
-        
+        return result_cache.respond(request, response, entry)
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -641,7 +302,169 @@ async def get_calendar_spreads(symbol: str = "^SPX", near_exp: str = None, far_e
         raise HTTPException(status_code=500, detail=f"Failed to fetch calendar spreads for {symbol}: {str(e)}")
 
 
+def build_calendar_spreads(near_chain, far_chain, pop_mode: str = "closed_form", order_by: str = None) -> CalendarSpreadsResponse:
+    """Build the calendar spreads response from the near and far chain snapshots"""
+    near_exp, far_exp = near_chain.expiration, far_chain.expiration
+    candidates = scanners.calendar_spreads(near_chain, far_chain, pop_mode)
+    
+    # Sort by distance from spot (closest first) unless order_by picks a score
+    best = scanners.rank(candidates, 100, order_by, np.abs(np.round(candidates['distance_from_spot'], 2)))
+    
+    logger.info(f"Calendar spreads fetched for {near_chain.symbol}: {len(candidates)}")
+    
+    return CalendarSpreadsResponse(
+        symbol=near_chain.symbol,
+        near_expiration=near_exp,
+        far_expiration=far_exp,
+        current_price=round(near_chain.spot, 2),
+        calendar_spreads=records_to_models(
+            best, CalendarSpread, scanners.CALENDAR_DECIMALS,
+            near_expiration=near_exp, far_expiration=far_exp
+        )
+    )
+
+
 @router.get("/spx/calendar-spreads", response_model=CalendarSpreadsResponse)
-async def get_spx_calendar_spreads(near_exp: str, far_exp: str):
+def get_spx_calendar_spreads(request: Request, response: Response, near_exp: str, far_exp: str):
     """Get SPX Calendar Spreads - backwards compatible endpoint"""
-    return await get_calendar_spreads("^SPX", near_exp, far_exp)
+    return get_calendar_spreads(request, response, "^SPX", near_exp, far_exp)
+
+
+@router.get("/calendar-scan", response_model=TermCalendarsResponse)
+def get_calendar_scan(
+    request: Request,
+    response: Response,
+    symbol: str = "^SPX",
+    expirations: Optional[List[str]] = Query(None),
+    strike_offsets: List[float] = Query([0.0]),
+    order_by: str = "theta_edge",
+    limit: int = 100,
+    pop_mode: str = "closed_form",
+):
+    """Calendars and diagonals across every pair of `expirations`, ranked together
+    
+    Args:
+        expirations: Expirations to pair (default: the next 6 listed)
+        strike_offsets: Far strike minus near strike; 0 gives calendars,
+            other values diagonals (e.g. strike_offsets=0&strike_offsets=25)
+        order_by: theta_edge or iv_difference (highest first), or any score
+    """
+    if order_by not in TERM_ORDER_BY + ORDER_BY_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Invalid order_by. Valid options: {', '.join(TERM_ORDER_BY + ORDER_BY_FIELDS)}")
+    if expirations is not None and not 2 <= len(set(expirations)) <= MAX_TERM_EXPIRATIONS:
+        raise HTTPException(status_code=400, detail=f"expirations must list 2-{MAX_TERM_EXPIRATIONS} dates")
+    if not strike_offsets or len(strike_offsets) > MAX_STRIKE_OFFSETS:
+        raise HTTPException(status_code=400, detail=f"strike_offsets must have 1-{MAX_STRIKE_OFFSETS} values")
+    if not 1 <= limit <= MAX_SWEEP_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SWEEP_LIMIT}")
+    validate_mode(pop_mode)
+    
+    try:
+        if expirations is None:
+            expirations = YahooFinanceService.fetch_expirations(symbol).expirations[:DEFAULT_TERM_EXPIRATIONS]
+        expirations = sorted(set(expirations))
+        
+        entry = result_cache.serve(
+            result_cache.view_key("calendar_scan", symbol, tuple(expirations), strike_offsets=tuple(strike_offsets),
+                                  order_by=order_by, limit=limit, pop_mode=pop_mode),
+            lambda: YahooFinanceService.get_chains(symbol, expirations),
+            lambda chains: build_calendar_scan(chains, strike_offsets, order_by, limit, pop_mode)
+        )
+        return result_cache.respond(request, response, entry)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error scanning calendar spreads for {symbol}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to scan calendar spreads for {symbol}: {str(e)}")
+
+
+def build_calendar_scan(chains, strike_offsets: List[float], order_by: str = "theta_edge", limit: int = 100,
+                        pop_mode: str = "closed_form") -> TermCalendarsResponse:
+    """Build the calendar scan response from the chain snapshots of each expiration"""
+    if order_by in TERM_ORDER_BY:
+        best, candidates = scanners.term_calendars(chains, strike_offsets, pop_mode, rank_by=order_by, limit=limit)
+    else:
+        records, candidates = scanners.term_calendars(chains, strike_offsets, pop_mode)
+        best = scanners.rank(records, limit, order_by, records['theta_edge'])
+    
+    logger.info(f"Calendar scan for {chains[0].symbol}: {len(chains)} expirations, {candidates} combinations")
+    
+    return TermCalendarsResponse(
+        symbol=chains[0].symbol,
+        current_price=round(chains[0].spot, 2),
+        expirations=[chain.expiration for chain in chains],
+        strike_offsets=strike_offsets,
+        order_by=order_by,
+        candidates=candidates,
+        spreads=records_to_models(best, TermCalendarSpread, scanners.TERM_CALENDAR_DECIMALS)
+    )
+
+
+@router.get("/sweep", response_model=SweepResponse)
+def get_sweep(
+    request: Request,
+    response: Response,
+    symbol: str = "^SPX",
+    expiration: str = None,
+    strategy: str = "iron_condor",
+    values: List[float] = Query([5, 10, 15, 20, 25, 30, 35, 40, 45, 50]),
+    limit: int = 10,
+    pop_mode: str = "closed_form",
+    order_by: str = None,
+):
+    """Best candidates for each width/wing in `values`, from one chain snapshot and one scanner pass"""
+    if not expiration:
+        raise HTTPException(status_code=400, detail="Expiration date is required")
+    if strategy not in _SWEEP_OUTPUT:
+        raise HTTPException(status_code=400, detail=f"Invalid strategy. Valid options: {', '.join(_SWEEP_OUTPUT)}")
+    if not values or len(values) > MAX_SWEEP_VALUES or min(values) <= 0:
+        raise HTTPException(status_code=400, detail=f"values must be 1-{MAX_SWEEP_VALUES} positive widths")
+    if not 1 <= limit <= MAX_SWEEP_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SWEEP_LIMIT}")
+    validate_mode(pop_mode)
+    validate_order_by(order_by)
+    
+    try:
+        entry = result_cache.serve(
+            result_cache.view_key("sweep", symbol, expiration, strategy=strategy, values=tuple(values),
+                                  limit=limit, pop_mode=pop_mode, order_by=order_by),
+            lambda: YahooFinanceService.get_chain(symbol, expiration),
+            lambda chain: build_sweep(chain, strategy, values, limit, pop_mode, order_by)
+        )
+        return result_cache.respond(request, response, entry)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running sweep for {symbol}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to run sweep for {symbol}: {str(e)}")
+
+
+def build_sweep(chain, strategy: str, values: List[float], limit: int = 10, pop_mode: str = "closed_form",
+                order_by: str = None) -> SweepResponse:
+    """Build the sweep response from a chain snapshot"""
+    field, model, decimals, sort_field, descending, constants = _SWEEP_OUTPUT[strategy]
+    
+    candidates, which = scanners.sweep(chain, strategy, values, pop_mode)
+    
+    results = []
+    for i, value in enumerate(values):
+        group = candidates[which == i]
+        best = scanners.rank(group, limit, order_by, np.round(group[sort_field], 2), descending=descending)
+        results.append(SweepResult(
+            value=value,
+            candidates=len(group),
+            **{field: records_to_models(best, model, decimals, **constants)}
+        ))
+    
+    logger.info(f"Sweep fetched for {chain.symbol} {strategy}: {len(values)} values, {len(candidates)} candidates")
+    
+    return SweepResponse(
+        symbol=chain.symbol,
+        expiration=chain.expiration,
+        current_price=round(chain.spot, 2),
+        strategy=strategy,
+        parameter=scanners.SWEEP_PARAMETERS[strategy],
+        results=results,
+    )
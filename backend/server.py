@@ -8,6 +8,7 @@ from fastapi.responses import FileResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -46,6 +47,8 @@ from routes.quotes import router as quotes_router, set_database as set_quotes_db
 from routes.options import router as options_router
 from routes.strategies import router as strategies_router
 from routes.portfolio import router as portfolio_router, set_database as set_portfolio_db
+from routes.analytics import router as analytics_router
+from routes.metrics import router as metrics_router
 
 # Inject database into routes that need it
 if db is not None:
@@ -57,6 +60,8 @@ app.include_router(quotes_router, prefix="/api", tags=["quotes"])
 app.include_router(options_router, prefix="/api", tags=["options"])
 app.include_router(strategies_router, prefix="/api", tags=["strategies"])
 app.include_router(portfolio_router, prefix="/api", tags=["portfolio"])
+app.include_router(analytics_router, prefix="/api", tags=["analytics"])
+app.include_router(metrics_router, tags=["metrics"])  # /metrics, where Prometheus scrapes by default
 
 # CORS middleware
 app.add_middleware(
@@ -67,9 +72,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETags, Cache-Control and compression for /api responses (wraps CORS, so its headers are kept)
+from services.http_cache import HTTPCacheMiddleware
+
+app.add_middleware(HTTPCacheMiddleware, minimum_size=1024)
+
+# Request latency per route (outermost, so it includes compression)
+from services.metrics import MetricsMiddleware
+
+app.add_middleware(MetricsMiddleware)
+
+# Background precomputation of popular scanner views
+from routes.options import SCAN_VIEWS as OPTIONS_SCAN_VIEWS
+from routes.strategies import SCAN_VIEWS as STRATEGY_SCAN_VIEWS
+from services import metrics, precompute
+
+PRECOMPUTE_VIEWS = {**OPTIONS_SCAN_VIEWS, **STRATEGY_SCAN_VIEWS}
+precompute_task = None
+loop_lag_task = None
+
+
+@app.on_event("startup")
+async def start_precompute():
+    global precompute_task
+    jobs = precompute.load_jobs(PRECOMPUTE_VIEWS) if precompute.PRECOMPUTE_ENABLED else []
+    if jobs:
+        precompute_task = asyncio.create_task(precompute.run_forever(jobs, PRECOMPUTE_VIEWS))
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    global loop_lag_task
+    loop_lag_task = asyncio.create_task(metrics.monitor_loop_lag())
+
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if precompute_task:
+        precompute_task.cancel()
+    if loop_lag_task:
+        loop_lag_task.cancel()
     if client:
         client.close()
 
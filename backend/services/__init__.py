@@ -1,2 +1,3 @@
-from .greeks import calculate_greeks
+from .greeks import calculate_greeks, calculate_greeks_array
+from .chain import Chain, ChainSide
 from .yahoo_finance import YahooFinanceService
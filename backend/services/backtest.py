@@ -0,0 +1,349 @@
+"""
+Offline strategy backtester over recorded chain snapshots.
+
+Entries: on every trading day, the first snapshot at or after `entry_time`
+(market time) of the first expiration at least `dte` days out. Strikes come
+from the live scanner (scanners.vertical_spreads): for each target short
+delta the spread whose short |delta| is closest is taken, filled at the
+scanner's natural net credit. Iron condors pair the put and call picks.
+
+Exits follow the auto-close panel (useAutoClose) on each later snapshot of
+the expiration, marking legs like open positions (mid, else last):
+    1. within close_before_expiry_hours of the 16:00 expiry -> close
+    2. P/L% >= take profit                                  -> close
+    3. P/L% <= -stop loss                                   -> close
+Snapshots where a leg has no mark are skipped, as the panel skips them.
+Anything still open is settled at intrinsic value against the last spot
+recorded on the expiration date, like expire_positions.
+
+All trades of one expiration (every entry x short delta x width) are marked
+together as a (snapshots, trades) matrix, and every take-profit/stop-loss
+pair is evaluated against it in one broadcast, so a sweep costs one scanner
+pass per (entry, width) and one marking pass per expiration.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, time, timedelta
+from typing import List, Optional, Sequence
+from fastapi import HTTPException
+
+from models.position import PositionLeg
+from models.schemas import BacktestSummary, BacktestTrade, BacktestResponse
+from services import scanners, snapshots
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("bull_put", "bear_call", "iron_condor")
+EXIT_REASONS = ("take_profit", "stop_loss", "expiry_close", "settled")
+EXPIRY_TIME = time(16, 0)  # Hours to expiry are measured to the 16:00 close
+MAX_CONFIGS = 5000
+MAX_TRADES = 5000  # Trade rows returned with include_trades
+LEG_SLOTS = 4
+
+_TAKE_PROFIT, _STOP_LOSS, _EXPIRY_CLOSE, _SETTLED = range(len(EXIT_REASONS))
+
+
+def _epoch_ns(values) -> np.ndarray:
+    """Nanoseconds since the epoch of tz-aware timestamps (whatever their stored unit)"""
+    return pd.DatetimeIndex(values).as_unit("ns").asi8
+
+
+def parse_entry_time(value: str) -> time:
+    try:
+        return datetime.strptime(value, "%H:%M").time()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid entry_time '{value}', expected HH:MM")
+
+
+def validate(strategy: str, short_deltas: Sequence[float], widths: Sequence[float],
+             take_profits: Sequence[float], stop_losses: Sequence[float]):
+    """Reject unknown strategies and empty, out-of-range or oversized grids with a 400"""
+    if strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Invalid strategy. Valid options: {', '.join(STRATEGIES)}")
+    grids = {
+        "short_deltas": (short_deltas, lambda v: 0 < v < 1),
+        "widths": (widths, lambda v: v > 0),
+        "take_profit_pct": (take_profits, lambda v: v > 0),
+        "stop_loss_pct": (stop_losses, lambda v: v > 0),
+    }
+    for name, (values, ok) in grids.items():
+        if not values or not all(ok(v) for v in values):
+            raise HTTPException(status_code=400, detail=f"{name} must be a non-empty list of valid values")
+    size = len(short_deltas) * len(widths) * len(take_profits) * len(stop_losses)
+    if size > MAX_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"Too many configurations ({size}); maximum is {MAX_CONFIGS}")
+
+
+def entry_snapshots(snaps: pd.DataFrame, entry_time: time, dte: int) -> pd.DataFrame:
+    """One entry snapshot per trading day
+    
+    The target expiration is the first one recorded that day at least `dte`
+    calendar days out; the entry is its first snapshot at or after entry_time.
+    """
+    snaps = snaps.assign(day=snaps["local"].dt.date, exp_date=pd.to_datetime(snaps["expiration"]).dt.date)
+    snaps = snaps[snaps["local"].dt.time >= entry_time]
+    snaps = snaps[snaps["exp_date"] >= snaps["day"] + timedelta(days=dte)]
+    target = snaps.groupby("day")["exp_date"].transform("min")
+    return snaps[snaps["exp_date"] == target].groupby("day", sort=True).head(1).reset_index(drop=True)
+
+
+def _picks(chain, side, offset: float, width: float, short_deltas: np.ndarray) -> Optional[np.ndarray]:
+    """Scanner spread whose short |delta| is closest to each target, or None"""
+    spreads = scanners.vertical_spreads(chain, side, offset, width)
+    if len(spreads) == 0:
+        return None
+    distance = np.abs(np.abs(spreads['sell_delta'])[None, :] - short_deltas[:, None])
+    return spreads[np.argmin(distance, axis=1)]
+
+
+def select_trades(chain, strategy: str, width: float, short_deltas: np.ndarray):
+    """Legs and entry credit for each target delta
+    
+    Returns:
+        (is_call, strike, weight, price) arrays of shape (deltas, LEG_SLOTS)
+        padded with zero-weight legs, and the (deltas,) credit per share (NaN
+        where no spread qualified). `price` is each leg's fill.
+    """
+    n = len(short_deltas)
+    is_call = np.zeros((n, LEG_SLOTS), dtype=bool)
+    strike = np.zeros((n, LEG_SLOTS))
+    weight = np.zeros((n, LEG_SLOTS))
+    price = np.zeros((n, LEG_SLOTS))
+    credit = np.zeros(n)
+    
+    slot = 0
+    if strategy in ("bull_put", "iron_condor"):
+        puts = _picks(chain, chain.puts, -width, width, short_deltas)
+        if puts is None:
+            return is_call, strike, weight, price, np.full(n, np.nan)
+        strike[:, 0], strike[:, 1] = puts['buy_strike'], puts['sell_strike']
+        price[:, 0], price[:, 1] = puts['buy_premium'], puts['sell_premium']
+        weight[:, 0], weight[:, 1] = 1, -1
+        credit += puts['net_credit']
+        slot = 2
+    if strategy in ("bear_call", "iron_condor"):
+        calls = _picks(chain, chain.calls, width, width, short_deltas)
+        if calls is None:
+            return is_call, strike, weight, price, np.full(n, np.nan)
+        strike[:, slot], strike[:, slot + 1] = calls['sell_strike'], calls['buy_strike']
+        price[:, slot], price[:, slot + 1] = calls['sell_premium'], calls['buy_premium']
+        weight[:, slot], weight[:, slot + 1] = -1, 1
+        is_call[:, slot:slot + 2] = True
+        credit += calls['net_credit']
+        if strategy == "iron_condor":
+            # Short call must sit above the short put, as in scanners.iron_condors
+            credit = np.where(strike[:, 2] > strike[:, 1], credit, np.nan)
+    return is_call, strike, weight, price, credit
+
+
+def _intrinsic(is_call: np.ndarray, strike: np.ndarray, price: float) -> np.ndarray:
+    return np.where(is_call, np.maximum(price - strike, 0.0), np.maximum(strike - price, 0.0))
+
+
+def replay(trades: pd.DataFrame, is_call: np.ndarray, strike: np.ndarray, weight: np.ndarray,
+           snaps: pd.DataFrame, expiry: pd.Timestamp, settle_spot: Optional[float],
+           take_profits: np.ndarray, stop_losses: np.ndarray, close_before_expiry_hours: float):
+    """Exit of every trade of one expiration under every take-profit/stop-loss pair
+    
+    Args:
+        trades: Rows with `entry` (market-time Timestamp) and `credit` per share
+        is_call, strike, weight: (trades, LEG_SLOTS) legs
+        snaps: Snapshots of the expiration, sorted by time
+        expiry: Expiration close as a market-time Timestamp
+        settle_spot: Underlying price to settle at; None if not recorded yet
+        take_profits, stop_losses: (C,) P/L% thresholds, paired element-wise
+    
+    Returns:
+        (exit price per share, exit snapshot index or -1, reason code), each
+        shaped (trades, C); exit price is NaN for trades still unsettled
+    """
+    paths = snaps["path"].to_numpy()
+    option_types = np.where(is_call, "call", "put").ravel()
+    marks = np.stack([snapshots.leg_marks(path, option_types, strike.ravel()) for path in paths])
+    marks = np.where(weight.ravel() != 0, marks, 0.0).reshape(len(paths), *strike.shape)
+    
+    # Cost to buy back the credit position: short marks minus long marks
+    close_price = -(marks * weight).sum(axis=2)
+    credit = trades["credit"].to_numpy()
+    pl_pct = (credit - close_price) / credit * 100
+    
+    taken_ns = _epoch_ns(snaps["taken_at"])
+    hours_left = (expiry.value - taken_ns) / 3.6e12
+    after_entry = taken_ns[:, None] > _epoch_ns(trades["entry"])[None, :]
+    live = after_entry & np.isfinite(pl_pct) & (hours_left > 0)[:, None]
+    expiry_close = live & (hours_left <= close_before_expiry_hours)[:, None]
+    
+    pl = pl_pct[:, :, None]
+    take_profit = live[:, :, None] & (pl >= take_profits)
+    stop_loss = live[:, :, None] & (pl <= -stop_losses)
+    hit = expiry_close[:, :, None] | take_profit | stop_loss
+    
+    first = hit.argmax(axis=0)
+    closed = hit.any(axis=0)
+    cols = np.arange(len(trades))[:, None]
+    reason = np.where(expiry_close[first, cols], _EXPIRY_CLOSE,
+                      np.where(take_profit[first, cols, np.arange(len(take_profits))], _TAKE_PROFIT, _STOP_LOSS))
+    
+    if settle_spot is None:
+        settled = np.full(len(trades), np.nan)
+    else:
+        settled = -(_intrinsic(is_call, strike, settle_spot) * weight).sum(axis=1)
+    exit_price = np.where(closed, close_price[first, cols], settled[:, None])
+    return exit_price, np.where(closed, first, -1), np.where(closed, reason, _SETTLED)
+
+
+def _settlement_spot(snaps: pd.DataFrame, expiry: pd.Timestamp, now: pd.Timestamp = None) -> Optional[float]:
+    """Last spot recorded on the expiration date (any expiration's snapshot)
+    
+    None until the expiration has closed, so trades still open on an
+    expiration day stay unsettled instead of settling at an intraday spot.
+    """
+    now = pd.Timestamp.now(tz=expiry.tz) if now is None else now
+    if now < expiry and not (snaps["taken_at"] >= expiry).any():
+        return None
+    on_day = snaps[snaps["local"].dt.date == expiry.date()]
+    return snapshots.spot(on_day["path"].iloc[-1]) if len(on_day) else None
+
+
+def _summaries(frame: pd.DataFrame) -> List[BacktestSummary]:
+    """Per-configuration statistics from settled trades"""
+    keys = ["short_delta", "width", "take_profit_pct", "stop_loss_pct"]
+    frame = frame.sort_values(keys + ["exit_time"], kind="stable")
+    frame = frame.assign(equity=frame.groupby(keys, sort=False)["pnl"].cumsum())
+    frame["drawdown"] = frame.groupby(keys, sort=False)["equity"].cummax() - frame["equity"]
+    
+    summaries = []
+    for key, group in frame.groupby(keys, sort=False):
+        pnl = group["pnl"].to_numpy()
+        gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+        counts = group["reason"].value_counts()
+        summaries.append(BacktestSummary(
+            **dict(zip(keys, map(float, key))),
+            trades=len(pnl),
+            wins=int((pnl > 0).sum()),
+            win_rate=round(float((pnl > 0).mean() * 100), 2),
+            total_pnl=round(float(pnl.sum()), 2),
+            average_pnl=round(float(pnl.mean()), 2),
+            max_drawdown=round(float(max(group["drawdown"].max(), 0.0)), 2),
+            profit_factor=round(float(gains / losses), 4) if losses > 0 else None,
+            average_hours_held=round(float(group["hours_held"].mean()), 2),
+            exits={reason: int(counts.get(reason, 0)) for reason in EXIT_REASONS},
+        ))
+    return sorted(summaries, key=lambda s: s.total_pnl, reverse=True)
+
+
+def _trade_models(frame: pd.DataFrame) -> List[BacktestTrade]:
+    out = []
+    for row in frame.head(MAX_TRADES).itertuples(index=False):
+        legs = [
+            PositionLeg(option_type="call" if c else "put", strike=float(k), price=round(float(p), 2),
+                        action="buy" if w > 0 else "sell", expiration=row.expiration)
+            for c, k, w, p in zip(row.is_call, row.strike, row.weight, row.price) if w != 0
+        ]
+        out.append(BacktestTrade(
+            short_delta=row.short_delta, width=row.width,
+            take_profit_pct=row.take_profit_pct, stop_loss_pct=row.stop_loss_pct,
+            expiration=row.expiration, entry_time=row.entry.isoformat(),
+            exit_time=row.exit_time.isoformat(), legs=legs,
+            entry_credit=round(float(row.credit), 2), exit_price=round(float(row.exit_price), 2),
+            pnl=round(float(row.pnl), 2), reason=row.reason,
+        ))
+    return out
+
+
+def run_backtest(symbol: str, strategy: str, short_deltas: Sequence[float], widths: Sequence[float],
+                 take_profits: Sequence[float], stop_losses: Sequence[float], entry_time: str = "10:00",
+                 dte: int = 0, close_before_expiry_hours: float = 0.5, start_date: str = None,
+                 end_date: str = None, include_trades: bool = False, root: str = None) -> BacktestResponse:
+    """Replay recorded snapshots for every configuration in the parameter grid"""
+    validate(strategy, short_deltas, widths, take_profits, stop_losses)
+    entry_at = parse_entry_time(entry_time)
+    snaps = snapshots.index(symbol, root)
+    if len(snaps) == 0:
+        raise HTTPException(status_code=404, detail=f"No recorded snapshots for {symbol}")
+    
+    short_deltas = np.asarray(short_deltas, dtype=float)
+    # Every (take profit, stop loss) pair, evaluated together per expiration
+    take_profits, stop_losses = (g.ravel() for g in np.meshgrid(take_profits, stop_losses, indexing='ij'))
+    
+    entries = entry_snapshots(snaps, entry_at, dte)
+    if start_date:
+        entries = entries[entries["day"] >= pd.Timestamp(start_date).date()]
+    if end_date:
+        entries = entries[entries["day"] <= pd.Timestamp(end_date).date()]
+    
+    # Scanner pass: one per (entry snapshot, width), all deltas at once
+    rows, leg_blocks = [], []
+    for entry in entries.itertuples(index=False):
+        chain = snapshots.load_chain(symbol, entry.expiration, entry.path)
+        for width in widths:
+            is_call, strike, weight, price, credit = select_trades(chain, strategy, float(width), short_deltas)
+            for i, delta in enumerate(short_deltas):
+                if np.isfinite(credit[i]) and credit[i] > 0:
+                    rows.append((entry.expiration, entry.local, float(delta), float(width), credit[i]))
+                    leg_blocks.append((is_call[i], strike[i], weight[i], price[i]))
+    trades = pd.DataFrame(rows, columns=["expiration", "entry", "short_delta", "width", "credit"])
+    
+    # Marking pass: one per expiration, all trades and exit rules at once
+    results = []
+    for expiration, group in trades.groupby("expiration", sort=True):
+        idx = group.index.to_numpy()
+        is_call, strike, weight = (np.array([leg_blocks[i][j] for i in idx]) for j in range(3))
+        expiry = pd.Timestamp.combine(pd.Timestamp(expiration).date(), EXPIRY_TIME).tz_localize(snapshots.MARKET_TZ)
+        exp_snaps = snaps[snaps["expiration"] == expiration]
+        exit_price, exit_index, reason = replay(
+            group, is_call, strike, weight, exp_snaps, expiry, _settlement_spot(snaps, expiry),
+            take_profits, stop_losses, close_before_expiry_hours,
+        )
+        taken_ns = _epoch_ns(exp_snaps["taken_at"])
+        exit_ns = np.where(exit_index >= 0, taken_ns[np.maximum(exit_index, 0)], expiry.value)
+        n, c = exit_price.shape
+        results.append(pd.DataFrame({
+            "trade": np.repeat(idx, c),
+            "take_profit_pct": np.tile(take_profits, n),
+            "stop_loss_pct": np.tile(stop_losses, n),
+            "exit_price": exit_price.ravel(),
+            "exit_ns": exit_ns.ravel(),
+            "reason": np.array(EXIT_REASONS)[reason.ravel()],
+        }))
+    
+    if results:
+        frame = pd.concat(results, ignore_index=True)
+        frame = frame.join(trades, on="trade")
+        frame["exit_time"] = pd.to_datetime(frame.pop("exit_ns"), utc=True).dt.tz_convert(snapshots.MARKET_TZ)
+    else:
+        # No trade qualified; typed columns keep the arithmetic below valid on an empty frame
+        timestamps = pd.DatetimeTZDtype(tz=snapshots.MARKET_TZ)
+        frame = pd.DataFrame({
+            "short_delta": pd.Series(dtype=float), "width": pd.Series(dtype=float),
+            "take_profit_pct": pd.Series(dtype=float), "stop_loss_pct": pd.Series(dtype=float),
+            "exit_price": pd.Series(dtype=float), "exit_time": pd.Series(dtype=timestamps),
+            "reason": pd.Series(dtype=object), "trade": pd.Series(dtype=int),
+            "expiration": pd.Series(dtype=object), "entry": pd.Series(dtype=timestamps),
+            "credit": pd.Series(dtype=float),
+        })
+    unsettled = frame["exit_price"].isna()
+    frame = frame[~unsettled].copy()
+    frame["pnl"] = (frame["credit"] - frame["exit_price"]) * 100
+    frame["hours_held"] = (frame["exit_time"] - frame["entry"]).dt.total_seconds() / 3600
+    
+    trade_models = None
+    if include_trades:
+        legs = pd.DataFrame(leg_blocks, columns=["is_call", "strike", "weight", "price"])
+        trade_models = _trade_models(frame.join(legs, on="trade").sort_values("entry", kind="stable"))
+    
+    logger.info(f"Backtest {symbol} {strategy}: {len(entries)} entries, {len(trades)} trades x "
+                f"{len(take_profits)} exit rules")
+    
+    return BacktestResponse(
+        symbol=symbol,
+        strategy=strategy,
+        entry_time=entry_time,
+        dte=dte,
+        snapshots=len(snaps),
+        entries=len(entries),
+        unsettled_trades=int(unsettled.sum()),
+        results=_summaries(frame),
+        trades=trade_models,
+    )
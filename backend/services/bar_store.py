@@ -0,0 +1,232 @@
+"""
+Persistent OHLCV bar store for /history.
+
+One store per (symbol, interval) keeps every bar fetched so far as parallel
+arrays, persisted to BAR_STORE_DIR as an .npz file. A request for a period
+the store already covers only fetches the tail (from the last stored
+session onwards, at most as often as ttl_policy allows) and is served by slicing
+the arrays; only the first request for a longer period than ever fetched
+downloads the whole period.
+
+Stored prices are as Yahoo returned them (split/dividend adjusted at fetch
+time); the tail refetch replaces the last session, so an in-progress bar is
+always brought up to date. When upstream is unavailable the stored bars are
+served as they are and flagged stale in `upstream`.
+"""
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+from services import market_hours, ttl_policy, upstream
+
+logger = logging.getLogger(__name__)
+
+BAR_STORE_DIR = os.environ.get(
+    'BAR_STORE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'options-scanner', 'bars')
+)
+INTRADAY_INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+
+_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+_ALL_HISTORY = np.iinfo(np.int64).min  # covered_from once period=max was fetched
+
+
+def _offset(period: str):
+    """Calendar offset of a month/year period ('3mo', '2y'); None otherwise"""
+    if period.endswith("mo"):
+        return pd.DateOffset(months=int(period[:-2]))
+    if period.endswith("y") and period != "ytd":
+        return pd.DateOffset(years=int(period[:-1]))
+    return None
+
+
+class BarStore:
+    """All bars fetched so far for one (symbol, interval), sorted by time
+    
+    `ts` holds UTC epoch nanoseconds; `tz` is the exchange timezone the bars
+    are labelled in. `covered_from` is the earliest time from which the
+    store is known to be complete.
+    """
+    
+    __slots__ = (
+        'symbol', 'interval', 'tz', 'ts', 'open', 'high', 'low', 'close', 'volume',
+        'covered_from', 'refreshed_at', 'version', 'lock'
+    )
+    
+    def __init__(self, symbol: str, interval: str):
+        self.symbol = symbol
+        self.interval = interval
+        self.tz = "America/New_York"
+        self.ts = np.empty(0, dtype=np.int64)
+        for name in _FIELDS:
+            setattr(self, name, np.empty(0))
+        self.covered_from = None
+        self.refreshed_at = 0.0
+        self.version = 0
+        self.lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.ts)
+    
+    @property
+    def path(self) -> Path:
+        return Path(BAR_STORE_DIR) / f"{self.symbol}_{self.interval}.npz"
+    
+    @property
+    def intraday(self) -> bool:
+        return self.interval in INTRADAY_INTERVALS
+    
+    def load(self):
+        """Read the persisted bars, if any; a corrupt file is ignored"""
+        try:
+            with np.load(self.path) as data:
+                self.tz = str(data['tz'])
+                self.ts = data['ts']
+                for name in _FIELDS:
+                    setattr(self, name, data[name])
+                self.covered_from = int(data['covered_from'])
+            self.version += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable bar store {self.path}: {e}")
+    
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.path.with_suffix('.partial.npz')
+            np.savez(partial, tz=self.tz, ts=self.ts, covered_from=self.covered_from,
+                     **{name: getattr(self, name) for name in _FIELDS})
+            os.replace(partial, self.path)
+        except Exception as e:
+            logger.warning(f"Could not persist bar store {self.path}: {e}")
+    
+    def merge(self, hist: pd.DataFrame, covered_from: int = None):
+        """Replace stored bars from the first fetched bar onwards with `hist`"""
+        if hist.empty:
+            return
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is not None:
+            self.tz = str(index.tz)
+            index = index.tz_convert("UTC")
+        ts = index.as_unit("ns").asi8
+        keep = self.ts < ts[0]
+        self.ts = np.concatenate([self.ts[keep], ts])
+        for name, column in zip(_FIELDS, _COLUMNS):
+            values = hist[column].to_numpy(dtype=float)
+            setattr(self, name, np.concatenate([getattr(self, name)[keep], values]))
+        if covered_from is not None:
+            self.covered_from = covered_from if self.covered_from is None else min(self.covered_from, covered_from)
+        self.version += 1
+        self.save()
+    
+    def local_dates(self) -> np.ndarray:
+        """Exchange-local date of every bar as datetime64[D]"""
+        local = pd.DatetimeIndex(self.ts, tz="UTC").tz_convert(self.tz).tz_localize(None)
+        return local.to_numpy().astype("datetime64[D]")
+    
+    def period_start(self, period: str) -> int:
+        """Epoch ns of the first bar `period` includes"""
+        if period == "max":
+            return _ALL_HISTORY
+        now = pd.Timestamp.now(tz=self.tz)
+        if period == "ytd":
+            return pd.Timestamp(year=now.year, month=1, day=1, tz=self.tz).value
+        offset = _offset(period)
+        if offset is not None:
+            return (now.normalize() - offset).value
+        # '1d' / '5d': the last N market sessions that have opened, whether stored or not
+        first_session = market_hours.recent_sessions(int(period[:-1]))[0]
+        return pd.Timestamp(first_session).tz_localize(self.tz).value
+    
+    def is_behind(self) -> bool:
+        """True when the last stored session is older than the latest completed one"""
+        return len(self) == 0 or self.local_dates()[-1] < np.datetime64(market_hours.last_closed_session())
+    
+    def covers(self, period: str) -> bool:
+        return self.covered_from is not None and self.covered_from <= self.period_start(period)
+    
+    def window(self, period: str) -> slice:
+        return slice(int(np.searchsorted(self.ts, self.period_start(period), side='left')), len(self.ts))
+
+
+_stores: Dict[Tuple[str, str], BarStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(symbol: str, interval: str) -> BarStore:
+    with _stores_lock:
+        store = _stores.get((symbol, interval))
+        if store is None:
+            store = _stores[(symbol, interval)] = BarStore(symbol, interval)
+            store.load()
+        return store
+
+
+def bars(symbol: str, period: str, interval: str, fetch: Callable[..., pd.DataFrame]) -> Tuple[int, str, Dict[str, np.ndarray]]:
+    """`period` of bars, fetching from upstream only what the store is missing
+    
+    `fetch` is ticker.history: called with (period, interval) for a first or
+    longer-than-ever download and with (start, interval) for tail updates.
+    
+    Returns:
+        (store version, exchange timezone, {'ts', 'open', ..., 'volume'}
+        arrays); the arrays are a consistent snapshot even if the store is
+        updated afterwards
+    """
+    store = get_store(symbol, interval)
+    with store.lock:
+        try:
+            _refresh(store, symbol, period, interval, fetch)
+            upstream.mark_fresh(("history", symbol, interval))
+        except upstream.UpstreamUnavailable as e:
+            if not len(store):
+                raise
+            logger.warning(f"Bar store {symbol} {interval}: serving stored bars, {e}")
+            upstream.mark_stale(("history", symbol, interval))
+        
+        window = store.window(period) if len(store) else slice(0, 0)
+        # Merges replace the arrays rather than writing into them, so views stay valid
+        columns = {name: getattr(store, name)[window] for name in ('ts',) + _FIELDS}
+        return store.version, store.tz, columns
+
+
+def _refresh(store: BarStore, symbol: str, period: str, interval: str, fetch: Callable[..., pd.DataFrame]):
+    """Fetch the stale tail and whatever part of `period` the store does not cover
+    
+    A store left behind by more than the tail fetch can bridge (Yahoo rejects
+    1m starts older than about a week) gets an empty or failed tail; it then
+    loses its coverage so the full period is fetched again.
+    """
+    tail_kind = "history_intraday" if store.intraday else "history_daily"
+    if len(store) and not ttl_policy.is_fresh(tail_kind, store.refreshed_at):
+        last_session = store.local_dates()[-1]
+        try:
+            tail = fetch(start=str(last_session), interval=interval)
+        except upstream.UpstreamUnavailable:
+            raise
+        except Exception as e:
+            if not store.is_behind():
+                raise
+            logger.warning(f"Bar store {symbol} {interval}: tail fetch from {last_session} failed: {e}")
+            tail = None
+        if tail is not None and not tail.empty:
+            store.merge(tail)
+        if (tail is None or tail.empty) and store.is_behind():
+            store.covered_from = None
+        else:
+            store.refreshed_at = time.time()
+    
+    if not store.covers(period):
+        hist = fetch(period=period, interval=interval)
+        if not hist.empty:
+            first = pd.DatetimeIndex(hist.index)
+            first = (first.tz_convert("UTC") if first.tz is not None else first).as_unit("ns").asi8[0]
+            store.merge(hist, covered_from=min(store.period_start(period), first))
+            store.refreshed_at = time.time()
+            logger.info(f"Bar store {symbol} {interval}: fetched full {period}, {len(store)} bars stored")
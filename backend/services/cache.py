@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping with hit/miss counters"""
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+    
+    def items(self) -> list:
+        """Snapshot of the (key, value) pairs, least recently used first"""
+        with self._lock:
+            return list(self._data.items())
+    
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        sentinel = self._data  # never a valid cached value
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value)
+        return value
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def array_digest(*arrays) -> str:
+    """Content hash of a sequence of arrays (values, dtypes and shapes) for cache keys"""
+    h = hashlib.blake2b(digest_size=16)
+    for values in arrays:
+        values = np.asarray(values)
+        h.update(np.ascontiguousarray(values).tobytes())
+        h.update(str((values.dtype.str, values.shape)).encode())
+    return h.hexdigest()
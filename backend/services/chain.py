@@ -0,0 +1,222 @@
+import itertools
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from services.greeks import calculate_greeks_array
+
+DEFAULT_IV = 0.3  # Fallback volatility when Yahoo has no implied volatility
+
+_snapshot_versions = itertools.count(1)
+
+
+def _readonly(values: np.ndarray) -> np.ndarray:
+    """Return the array as contiguous and non-writeable"""
+    values = np.ascontiguousarray(values)
+    values.flags.writeable = False
+    return values
+
+
+def nearest_index(sorted_values: np.ndarray, targets) -> np.ndarray:
+    """Index of the closest entry of an ascending array for every target (lower one on ties)"""
+    targets = np.asarray(targets, dtype=float)
+    if len(sorted_values) == 1:
+        return np.zeros(targets.shape, dtype=np.intp)
+    right = np.clip(np.searchsorted(sorted_values, targets), 1, len(sorted_values) - 1)
+    left = right - 1
+    take_left = targets - sorted_values[left] <= sorted_values[right] - targets
+    return np.where(take_left, left, right)
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Extract a numeric column as float64 (NaN for missing values/columns)"""
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+class ChainSide:
+    """
+    Array-backed view of one side (calls or puts) of an options chain.
+    
+    Rows are sorted by strike and de-duplicated. All arrays are contiguous
+    float64 and read-only; missing values stay NaN and the *_valid masks
+    say which quotes are usable.
+    """
+    
+    __slots__ = (
+        'option_type', 'strike', 'last', 'bid', 'ask', 'mid', 'change', 'percent_change',
+        'volume', 'open_interest', 'iv', 'iv_or_default', 'in_the_money',
+        'delta', 'gamma', 'theta', 'vega',
+        'bid_valid', 'ask_valid', 'mid_valid', 'iv_valid'
+    )
+    
+    def __init__(self, df: Optional[pd.DataFrame], spot: float, T: float, r: float, option_type: str):
+        if df is None:
+            df = pd.DataFrame({'strike': []})
+        
+        strike = _column(df, 'strike')
+        keep = np.isfinite(strike)
+        # Sort by strike and keep the first row of any duplicated strike
+        order = np.argsort(strike[keep], kind='stable')
+        rows = np.flatnonzero(keep)[order]
+        strike = strike[rows]
+        first = np.ones(len(strike), dtype=bool)
+        first[1:] = strike[1:] != strike[:-1]
+        rows = rows[first]
+        strike = strike[first]
+        
+        def col(name):
+            return _column(df, name)[rows]
+        
+        self.option_type = option_type
+        self.strike = _readonly(strike)
+        self.last = _readonly(col('lastPrice'))
+        self.bid = _readonly(col('bid'))
+        self.ask = _readonly(col('ask'))
+        self.change = _readonly(col('change'))
+        self.percent_change = _readonly(col('percentChange'))
+        self.volume = _readonly(col('volume'))
+        self.open_interest = _readonly(col('openInterest'))
+        self.iv = _readonly(col('impliedVolatility'))
+        
+        if 'inTheMoney' in df.columns:
+            itm = df['inTheMoney'].to_numpy()[rows]
+            self.in_the_money = _readonly(pd.notna(itm) & (itm == True))  # noqa: E712
+        else:
+            self.in_the_money = _readonly(np.zeros(len(rows), dtype=bool))
+        
+        self.bid_valid = _readonly(np.isfinite(self.bid) & (self.bid > 0))
+        self.ask_valid = _readonly(np.isfinite(self.ask) & (self.ask > 0))
+        self.mid_valid = _readonly(self.bid_valid & self.ask_valid)
+        self.iv_valid = _readonly(np.isfinite(self.iv))
+        self.iv_or_default = _readonly(np.where(self.iv_valid, self.iv, DEFAULT_IV))
+        self.mid = _readonly(np.where(self.mid_valid, (self.bid + self.ask) / 2, np.nan))
+        
+        delta, gamma, theta, vega = calculate_greeks_array(
+            spot, self.strike, T, r, self.iv_or_default, option_type
+        )
+        self.delta = _readonly(delta)
+        self.gamma = _readonly(gamma)
+        self.theta = _readonly(theta)
+        self.vega = _readonly(vega)
+    
+    def __len__(self) -> int:
+        return len(self.strike)
+    
+    def lookup(self, strikes) -> np.ndarray:
+        """Vectorized exact strike lookup; -1 where a strike is not listed"""
+        strikes = np.asarray(strikes, dtype=float)
+        if len(self.strike) == 0:
+            return np.full(strikes.shape, -1, dtype=np.intp)
+        pos = np.searchsorted(self.strike, strikes)
+        pos_clipped = np.minimum(pos, len(self.strike) - 1)
+        found = (pos < len(self.strike)) & (self.strike[pos_clipped] == strikes)
+        return np.where(found, pos_clipped, -1)
+    
+    def nearest(self, strikes) -> np.ndarray:
+        """Vectorized closest-listed-strike lookup (the lower strike when equidistant)"""
+        return nearest_index(self.strike, strikes)
+    
+    def bid_or_zero(self) -> np.ndarray:
+        return np.where(self.bid_valid, self.bid, 0.0)
+    
+    def ask_or_zero(self) -> np.ndarray:
+        return np.where(self.ask_valid, self.ask, 0.0)
+    
+    def mark(self) -> np.ndarray:
+        """Best available price per contract: mid when quoted, else last trade"""
+        return np.where(self.mid_valid, self.mid, np.where(np.isfinite(self.last), self.last, np.nan))
+
+
+class Chain:
+    """
+    Immutable snapshot of an options chain for one (symbol, expiration).
+    
+    Built once per upstream fetch and shared by the chain endpoint, every
+    scanner and the portfolio valuer. `strikes` is the sorted union of call
+    and put strikes; `call_idx`/`put_idx` map each union strike to its row on
+    each side (-1 if that side does not list it), so calls and puts can be
+    joined on strike without any DataFrame work.
+    """
+    
+    __slots__ = (
+        'symbol', 'expiration', 'spot', 'T', 'r', 'fetched_at', 'version',
+        'calls', 'puts', 'strikes', 'call_idx', 'put_idx'
+    )
+    
+    def __init__(self, symbol: str, expiration: str, calls_df: Optional[pd.DataFrame],
+                 puts_df: Optional[pd.DataFrame], spot: float, T: float, r: float):
+        self.symbol = symbol
+        self.expiration = expiration
+        self.spot = float(spot)
+        self.T = float(T)
+        self.r = float(r)
+        self.fetched_at = time.time()
+        self.version = next(_snapshot_versions)
+        
+        self.calls = ChainSide(calls_df, self.spot, self.T, self.r, 'call')
+        self.puts = ChainSide(puts_df, self.spot, self.T, self.r, 'put')
+        
+        self.strikes = _readonly(np.union1d(self.calls.strike, self.puts.strike))
+        self.call_idx = _readonly(self.calls.lookup(self.strikes))
+        self.put_idx = _readonly(self.puts.lookup(self.strikes))
+    
+    def side(self, option_type: str) -> ChainSide:
+        return self.calls if option_type == 'call' else self.puts
+    
+    def strike_index(self, strikes) -> np.ndarray:
+        """Position of each strike in the union `strikes` grid; -1 where neither side lists it"""
+        strikes = np.asarray(strikes, dtype=float)
+        if len(self.strikes) == 0:
+            return np.full(strikes.shape, -1, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(self.strikes, strikes), len(self.strikes) - 1)
+        return np.where(self.strikes[pos] == strikes, pos, -1)
+    
+    def side_rows(self, positions: np.ndarray, option_type: str) -> np.ndarray:
+        """Row on one side for each union position (-1 positions stay -1)"""
+        idx = self.call_idx if option_type == 'call' else self.put_idx
+        return np.where(positions >= 0, idx[np.maximum(positions, 0)], -1) if len(idx) else positions
+    
+    def paired(self) -> np.ndarray:
+        """Union positions of the strikes listed on both sides"""
+        return np.flatnonzero((self.call_idx >= 0) & (self.put_idx >= 0))
+    
+    @property
+    def age(self) -> float:
+        """Seconds since this snapshot was fetched"""
+        return time.time() - self.fetched_at
+    
+    @property
+    def as_of(self) -> str:
+        """ISO UTC time this snapshot was fetched"""
+        return datetime.fromtimestamp(self.fetched_at, timezone.utc).isoformat()
+    
+    def leg_marks(self, option_types, strikes) -> np.ndarray:
+        """Current mark for each (option_type, strike) leg; NaN if unlisted"""
+        option_types = np.asarray(option_types)
+        strikes = np.asarray(strikes, dtype=float)
+        marks = np.full(strikes.shape, np.nan)
+        for side in (self.calls, self.puts):
+            sel = option_types == side.option_type
+            if not sel.any():
+                continue
+            idx = side.lookup(strikes[sel])
+            side_marks = side.mark()
+            marks[sel] = np.where(idx >= 0, side_marks[np.maximum(idx, 0)] if len(side) else np.nan, np.nan)
+        return marks
+    
+    def leg_ivs(self, option_types, strikes) -> np.ndarray:
+        """Implied volatility for each (option_type, strike) leg; DEFAULT_IV if unlisted"""
+        option_types = np.asarray(option_types)
+        strikes = np.asarray(strikes, dtype=float)
+        ivs = np.full(strikes.shape, DEFAULT_IV)
+        for side in (self.calls, self.puts):
+            sel = option_types == side.option_type
+            if not sel.any() or len(side) == 0:
+                continue
+            idx = side.lookup(strikes[sel])
+            ivs[sel] = np.where(idx >= 0, side.iv_or_default[np.maximum(idx, 0)], DEFAULT_IV)
+        return ivs
@@ -0,0 +1,138 @@
+"""
+Portfolio exposure engine.
+
+Open positions are flattened into one table of legs. Legs are grouped by
+(symbol, expiration) so each group needs a single chain snapshot and a single
+vectorized greeks call. Per-leg greeks are cached per snapshot version, so
+repeated requests against unchanged chains only redo the aggregation.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+
+from models.position import GreekExposure, PortfolioGreeks
+from services.cache import LRUCache, array_digest
+from services.chain import Chain
+from services.greeks import calculate_greeks_array
+from services.yahoo_finance import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_MULTIPLIER = 100
+GREEKS = ('delta', 'gamma', 'theta', 'vega')
+
+_greeks_cache = LRUCache(maxsize=256)
+
+
+def open_legs(positions: List[dict]) -> pd.DataFrame:
+    """One row per leg of every open position
+    
+    `contracts` is signed: positive long, negative short, and already
+    multiplied by the position quantity.
+    """
+    rows = []
+    for pos in positions:
+        if pos.get("status", "open") != "open":
+            continue
+        for leg in pos["legs"]:
+            sign = 1 if leg["action"] == "buy" else -1
+            rows.append((
+                pos["id"], pos["symbol"], (leg.get("expiration") or pos["expiration"])[:10],
+                pos["strategy_type"], leg["option_type"], float(leg["strike"]),
+                sign * leg.get("quantity", 1) * pos["quantity"], float(leg.get("price", 0.0)),
+            ))
+    return pd.DataFrame(rows, columns=[
+        "position_id", "symbol", "expiration", "strategy_type",
+        "option_type", "strike", "contracts", "price",
+    ])
+
+
+def chain_groups(legs: pd.DataFrame) -> Iterator[Tuple[np.ndarray, Chain]]:
+    """(row positions, chain snapshot) for each (symbol, expiration) group
+    
+    Groups whose chain cannot be loaded (e.g. an expiration Yahoo no longer
+    lists) are logged and skipped.
+    """
+    groups = legs.groupby(["symbol", "expiration"], sort=False).indices
+    YahooFinanceService.prefetch_quotes(groups.keys())
+    for (symbol, expiration), rows in groups.items():
+        try:
+            chain = YahooFinanceService.get_chain(symbol, expiration)
+        except Exception as e:
+            logger.warning(f"No chain for {symbol} {expiration}: {e}")
+            continue
+        yield rows, chain
+
+
+def leg_greeks(chain: Chain, option_types: np.ndarray, strikes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-share greeks of the given legs against one snapshot (cached)"""
+    key = (chain.symbol, chain.expiration, chain.version, array_digest(option_types.astype('U4'), strikes))
+    
+    def compute():
+        ivs = chain.leg_ivs(option_types, strikes)
+        values = calculate_greeks_array(chain.spot, strikes, chain.T, chain.r, ivs, option_types)
+        return {name: np.nan_to_num(value) for name, value in zip(GREEKS, values)}
+    
+    return _greeks_cache.get_or_compute(key, compute)
+
+
+def position_greeks(legs: pd.DataFrame) -> pd.DataFrame:
+    """Leg table with dollar greeks per leg and a `priced` flag"""
+    legs = legs.copy()
+    for name in GREEKS + ("spot",):
+        legs[name] = 0.0
+    legs["priced"] = False
+    
+    for rows, chain in chain_groups(legs):
+        greeks = leg_greeks(chain, legs["option_type"].to_numpy()[rows], legs["strike"].to_numpy()[rows])
+        scale = legs["contracts"].to_numpy()[rows] * CONTRACT_MULTIPLIER
+        for name in GREEKS:
+            legs.iloc[rows, legs.columns.get_loc(name)] = greeks[name] * scale
+        legs.iloc[rows, legs.columns.get_loc("spot")] = chain.spot
+        legs.iloc[rows, legs.columns.get_loc("priced")] = True
+    
+    legs["delta_dollars"] = legs["delta"] * legs["spot"]
+    return legs
+
+
+def _exposures(legs: pd.DataFrame, by) -> List[GreekExposure]:
+    grouped = legs.groupby(by, sort=True)
+    sums = grouped[list(GREEKS) + ["delta_dollars"]].sum()
+    counts = grouped["position_id"].nunique()
+    out = []
+    for key, row in sums.iterrows():
+        label = " ".join(key) if isinstance(key, tuple) else str(key)
+        out.append(_exposure(label, int(counts[key]), row))
+    return out
+
+
+def _exposure(key: str, positions: int, totals) -> GreekExposure:
+    return GreekExposure(
+        key=key,
+        positions=positions,
+        delta=round(float(totals["delta"]), 2),
+        gamma=round(float(totals["gamma"]), 4),
+        theta=round(float(totals["theta"]), 2),
+        vega=round(float(totals["vega"]), 2),
+        delta_dollars=round(float(totals["delta_dollars"]), 2),
+    )
+
+
+def portfolio_greeks(positions: List[dict]) -> PortfolioGreeks:
+    """Net greeks of all open positions, in total and grouped"""
+    legs = position_greeks(open_legs(positions))
+    unpriced = sorted(set(legs.loc[~legs["priced"], "position_id"]))
+    priced = legs[~legs["position_id"].isin(unpriced)]
+    
+    totals = priced[list(GREEKS) + ["delta_dollars"]].sum()
+    return PortfolioGreeks(
+        total=_exposure("total", int(priced["position_id"].nunique()), totals),
+        by_symbol=_exposures(priced, "symbol"),
+        by_expiration=_exposures(priced, ["symbol", "expiration"]),
+        by_strategy=_exposures(priced, "strategy_type"),
+        positions=_exposures(priced, "position_id"),
+        unpriced_positions=unpriced,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
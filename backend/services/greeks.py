@@ -1,5 +1,7 @@
 import math
+import numpy as np
 from scipy.stats import norm
+from scipy.special import ndtr
 from typing import Tuple, Optional
 
 
@@ -52,6 +54,89 @@ def calculate_greeks(
         return None, None, None, None
 
 
+def calculate_greeks_array(
+    S, K, T, r: float, sigma, option_type='call'
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized Black-Scholes Greeks over arrays of strikes/volatilities.
+    
+    Same formulas and rounding as calculate_greeks, evaluated for a whole
+    chain in one pass. Inputs broadcast against each other; option_type may be
+    a single 'call'/'put' or an array of them.
+    
+    Returns:
+        Tuple of float arrays (delta, gamma, theta, vega). Entries with
+        T <= 0 or sigma <= 0 are NaN (calculate_greeks returns None there).
+    """
+    S, K, T, sigma = np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(sigma, dtype=float)
+    )
+    is_call = np.asarray(option_type) == 'call'
+    valid = (T > 0) & (sigma > 0) & (K > 0) & (S > 0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_T = np.sqrt(np.where(valid, T, 1.0))
+        vol = np.where(valid, sigma, 1.0)
+        strike = np.where(valid, K, 1.0)
+        spot = np.where(valid, S, 1.0)
+        
+        d1 = (np.log(spot / strike) + (r + 0.5 * vol ** 2) * T) / (vol * sqrt_T)
+        d2 = d1 - vol * sqrt_T
+        pdf_d1 = norm.pdf(d1)
+        discounted_K = r * strike * np.exp(-r * T)
+        
+        delta = np.where(is_call, norm.cdf(d1), norm.cdf(d1) - 1)
+        gamma = pdf_d1 / (spot * vol * sqrt_T)
+        decay = -(spot * pdf_d1 * vol) / (2 * sqrt_T)
+        theta = np.where(
+            is_call,
+            decay - discounted_K * norm.cdf(d2),
+            decay + discounted_K * norm.cdf(-d2)
+        ) / 365
+        vega = spot * pdf_d1 * sqrt_T / 100
+    
+    nan = np.nan
+    return (
+        np.where(valid, np.round(delta, 4), nan),
+        np.where(valid, np.round(gamma, 6), nan),
+        np.where(valid, np.round(theta, 4), nan),
+        np.where(valid, np.round(vega, 4), nan),
+    )
+
+
+def black_scholes_price(S, K, T, r, sigma, option_type='call') -> np.ndarray:
+    """
+    Vectorized Black-Scholes option value.
+    
+    Inputs (including r) broadcast against each other; option_type may be
+    a single 'call'/'put' or an array of them. Where T <= 0 or sigma <= 0 the
+    option is worth its intrinsic value.
+    """
+    # Inputs are masked at their own shapes and only broadcast inside the
+    # formula, so grids built from small axes (e.g. legs x shocks x days)
+    # never materialize full-size copies of every input
+    S, K, T, sigma = (np.asarray(x, dtype=float) for x in (S, K, T, sigma))
+    is_call = np.asarray(option_type) == 'call'
+    live = (T > 0) & (sigma > 0) & (K > 0) & (S > 0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(T > 0, T, 1.0)
+        vol_sqrt_T = np.where(sigma > 0, sigma, 1.0) * np.sqrt(t)
+        spot = np.where(S > 0, S, 1.0)
+        strike = np.where(K > 0, K, 1.0)
+        d1 = (np.log(spot / strike) + (r + 0.5 * sigma ** 2) * t) / vol_sqrt_T
+        d2 = d1 - vol_sqrt_T
+        discounted_K = strike * np.exp(-r * t)
+        # Price calls only and get puts from put-call parity: two CDF
+        # evaluations per point instead of four
+        call = spot * ndtr(d1) - discounted_K * ndtr(d2)
+        value = np.where(is_call, call, call - spot + discounted_K)
+    
+    intrinsic = np.maximum(np.where(is_call, S - K, K - S), 0.0)
+    return np.where(live, value, intrinsic)
+
+
 def calculate_probability_between(
     S: float, lower: float, upper: float, T: float, r: float, sigma: float
 ) -> Optional[float]:
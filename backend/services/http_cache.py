@@ -0,0 +1,137 @@
+"""
+Conditional requests, Cache-Control and compression for /api responses.
+
+HTTPCacheMiddleware buffers each /api response and then:
+    - gives it a content-hash ETag unless the handler set one (scanner views
+      tag their responses with the chain snapshot, see result_cache)
+    - answers a GET whose If-None-Match matches with an empty 304
+    - sets Cache-Control: market data may be reused for as long as
+      ttl_policy keeps its kind fresh (seconds in the regular session, up
+      to CLIENT_MAX_AGE outside it); positions and portfolio views are
+      always revalidated
+    - compresses bodies of at least `minimum_size` bytes with brotli (when
+      the optional `brotli` package is installed and the client accepts it)
+      or gzip; the ETag of a compressed body is made weak
+"""
+import gzip
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+
+from services import ttl_policy
+from services.bar_store import INTRADAY_INTERVALS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+API_PREFIX = "/api/"
+# Longest client-side max-age, in case the calendar misses an unscheduled session change
+CLIENT_MAX_AGE = 3600
+# Path -> ttl_policy kind; other market data follows the chain it is built from
+PATH_KINDS = {
+    "/api/quote": "quote",
+    "/api/spx/quote": "quote",
+    "/api/options/expirations": "expirations",
+    "/api/spx/options/expirations": "expirations",
+    "/api/history": "history",
+    "/api/spx/history": "history",
+}
+# User data changes on every write; clients must revalidate it
+REVALIDATE_PREFIXES = ("/api/positions", "/api/portfolio", "/api/status")
+
+
+def content_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match header"""
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def cache_control(path: str, query: dict) -> str:
+    if path.startswith(REVALIDATE_PREFIXES):
+        return "no-cache"
+    kind = PATH_KINDS.get(path, "chain")
+    if kind == "history":
+        # Without an interval, fetch_history picks intraday bars for these periods
+        interval = query.get("interval")
+        intraday = interval in INTRADAY_INTERVALS if interval else query.get("period", "1mo") in ("1d", "5d")
+        kind = "history_intraday" if intraday else "history_daily"
+    return f"max-age={int(min(ttl_policy.seconds_left(kind), CLIENT_MAX_AGE))}"
+
+
+def choose_encoding(accept_encoding: str):
+    """'br', 'gzip' or None, from an Accept-Encoding header"""
+    accepted = {coding.split(";")[0].strip() for coding in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, compresslevel: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=compresslevel)
+    return gzip.compress(body, compresslevel=compresslevel)
+
+
+class HTTPCacheMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(API_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        
+        start = None
+        chunks = []
+        
+        async def buffer(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                await self.finish(scope, start, b"".join(chunks), send)
+        
+        await self.app(scope, receive, buffer)
+    
+    async def finish(self, scope, start: dict, body: bytes, send):
+        request_headers = Headers(scope=scope)
+        status = start["status"]
+        headers = MutableHeaders(raw=list(start["headers"]))
+        
+        if scope["method"] == "GET" and status in (200, 304):
+            headers["Cache-Control"] = cache_control(scope["path"], QueryParams(scope["query_string"]))
+            if status == 200:
+                if "etag" not in headers:
+                    headers["ETag"] = content_etag(body)
+                if_none_match = request_headers.get("if-none-match")
+                if if_none_match is not None and etag_matches(if_none_match, headers["etag"]):
+                    status, body = 304, b""
+            if status == 304:
+                for header in ("content-length", "content-type"):
+                    if header in headers:
+                        del headers[header]
+        
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding and status == 200 and len(body) >= self.minimum_size and "content-encoding" not in headers:
+            body = compress(body, encoding, self.compresslevel)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                headers["ETag"] = "W/" + headers["etag"]
+        if status == 200:
+            headers.add_vary_header("Accept-Encoding")
+        
+        await send({"type": "http.response.start", "status": status, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,183 @@
+"""
+US equity/index options trading calendar (New York time).
+
+Sessions follow the NYSE calendar: weekends and exchange holidays are
+closed, and the sessions before Independence Day, after Thanksgiving and
+on Christmas Eve close at 13:00. Market states match Yahoo's marketState:
+PRE (4:00 to the open), REGULAR, POST (the close to 20:00) and CLOSED.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+PRE_MARKET_OPEN = time(4, 0)
+SESSION_OPEN = time(9, 30)
+SESSION_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+POST_MARKET_CLOSE = time(20, 0)
+
+PRE, REGULAR, POST, CLOSED = "PRE", "REGULAR", "POST", "CLOSED"
+
+# Far enough ahead to cross any run of weekends and holidays
+_SEARCH_DAYS = 10
+
+
+def now() -> datetime:
+    return datetime.now(MARKET_TZ)
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The nth (1-based; -1 = last) given weekday of a month"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=16)
+def holidays(year: int) -> FrozenSet[date]:
+    """NYSE full-day closures of a year"""
+    days = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # New Year's Day falling on a Saturday is not observed on the prior Friday
+    if date(year, 1, 1).weekday() != 5:
+        days.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(days)
+
+
+@lru_cache(maxsize=16)
+def early_closes(year: int) -> FrozenSet[date]:
+    """Sessions closing at 13:00"""
+    days = {
+        date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),  # Day after Thanksgiving
+        date(year, 12, 24),
+    }
+    return frozenset(day for day in days if is_trading_day(day))
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+
+def session(day: date) -> Optional[Tuple[datetime, datetime]]:
+    """(open, close) of a day's regular session, or None if the market is closed all day"""
+    if not is_trading_day(day):
+        return None
+    close = EARLY_CLOSE if day in early_closes(day.year) else SESSION_CLOSE
+    return (datetime.combine(day, SESSION_OPEN, MARKET_TZ), datetime.combine(day, close, MARKET_TZ))
+
+
+def _boundaries(day: date):
+    """(state, start, end) of the PRE, REGULAR and POST periods of a trading day"""
+    bounds = session(day)
+    if bounds is None:
+        return []
+    open_, close = bounds
+    return [
+        (PRE, datetime.combine(day, PRE_MARKET_OPEN, MARKET_TZ), open_),
+        (REGULAR, open_, close),
+        (POST, close, datetime.combine(day, POST_MARKET_CLOSE, MARKET_TZ)),
+    ]
+
+
+def market_state(at: datetime = None) -> str:
+    """PRE, REGULAR, POST or CLOSED at a time (default: now)"""
+    at = (at or now()).astimezone(MARKET_TZ)
+    for state, start, end in _boundaries(at.date()):
+        if start <= at < end:
+            return state
+    return CLOSED
+
+
+def is_regular_session(at: datetime = None) -> bool:
+    """True during a regular trading session"""
+    return market_state(at) == REGULAR
+
+
+def next_change(at: datetime = None) -> datetime:
+    """When the market state next changes after `at`"""
+    at = (at or now()).astimezone(MARKET_TZ)
+    for offset in range(_SEARCH_DAYS):
+        for _, start, end in _boundaries(at.date() + timedelta(days=offset)):
+            for boundary in (start, end):
+                if boundary > at:
+                    return boundary
+    raise ValueError(f"No market session within {_SEARCH_DAYS} days of {at}")
+
+
+def next_open(at: datetime = None) -> datetime:
+    """Start of the next regular session after `at`"""
+    return _next_session_time(at, 0)
+
+
+def next_close(at: datetime = None) -> datetime:
+    """End of the current or next regular session after `at`"""
+    return _next_session_time(at, 1)
+
+
+def recent_sessions(n: int, at: datetime = None) -> List[date]:
+    """The last n trading days whose regular session has opened by `at`, oldest first"""
+    at = (at or now()).astimezone(MARKET_TZ)
+    day, days = at.date(), []
+    while len(days) < n:
+        bounds = session(day)
+        if bounds is not None and bounds[0] <= at:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def last_closed_session(at: datetime = None) -> date:
+    """The latest trading day whose regular session had closed by `at`"""
+    at = (at or now()).astimezone(MARKET_TZ)
+    day = at.date()
+    while True:
+        bounds = session(day)
+        if bounds is not None and bounds[1] <= at:
+            return day
+        day -= timedelta(days=1)
+
+
+def _next_session_time(at: Optional[datetime], which: int) -> datetime:
+    at = (at or now()).astimezone(MARKET_TZ)
+    for offset in range(_SEARCH_DAYS):
+        bounds = session(at.date() + timedelta(days=offset))
+        if bounds is not None and bounds[which] > at:
+            return bounds[which]
+    raise ValueError(f"No market session within {_SEARCH_DAYS} days of {at}")
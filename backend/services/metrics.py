@@ -0,0 +1,227 @@
+"""
+Latency histograms and counters in the Prometheus text format.
+
+    - http_request_duration_seconds{method, route, status}: MetricsMiddleware
+      times every request, labelled with the route's path template
+    - upstream_request_duration_seconds{method, outcome}: each attempt of a
+      Yahoo call (see upstream.call); outcome is "ok" or the exception type
+    - scanner_stage_duration_seconds{view, stage}: time spent in each stage
+      of building a scanner view: fetch (chain lookup and download), prepare
+      (Chain arrays and greeks), generate (candidate legs), score
+      (probabilities, scores and ranking) and serialize (response models)
+    - event_loop_lag_seconds: how late the event loop wakes up a sleeper
+
+Stage timers measure self time: a stage entered inside another (scoring
+during generation, preparing a chain during its fetch) is subtracted from
+the outer one, so the stages of a view add up to its build time. They only
+record while a view is being built (`scanning`), and cost a couple of
+perf_counter calls. Chains that multi-expiration views fetch on the pool
+threads are timed as part of fetch.
+"""
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LAG_INTERVAL_SECONDS = 0.5
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value == value else "NaN"
+
+
+class Histogram:
+    __slots__ = ('name', 'help', 'label_names', 'buckets', '_series', '_lock')
+    
+    def __init__(self, name: str, help: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}"
+            labels = _labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_number(values[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def samples(name: str, help: str, kind: str, label_names: Sequence[str],
+            values: Dict[tuple, float]) -> Iterable[str]:
+    """Exposition lines of a counter or gauge from {label values: value}"""
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+    for label_values, value in sorted(values.items()):
+        yield f"{name}{_labels(label_names, label_values)} {_number(value)}"
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route template",
+                            ("method", "route", "status"), REQUEST_BUCKETS)
+UPSTREAM_SECONDS = Histogram("upstream_request_duration_seconds", "Latency of each Yahoo call attempt",
+                             ("method", "outcome"), UPSTREAM_BUCKETS)
+STAGE_SECONDS = Histogram("scanner_stage_duration_seconds", "Self time of each stage of building a scanner view",
+                          ("view", "stage"), STAGE_BUCKETS)
+LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "Delay of the event loop in waking a sleeping task",
+                             (), LAG_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, UPSTREAM_SECONDS, STAGE_SECONDS, LOOP_LAG_SECONDS)
+
+
+class _Frame:
+    __slots__ = ('view', 'stage', 'child')
+    
+    def __init__(self, view: str, stage: Optional[str]):
+        self.view = view
+        self.stage = stage
+        self.child = 0.0  # Seconds spent in nested stages
+
+
+_frame: ContextVar[Optional[_Frame]] = ContextVar("scanner_stage", default=None)
+
+
+class scanning:
+    """Attribute stage timings in this block to a scanner view"""
+    __slots__ = ('view', 'token')
+    
+    def __init__(self, view: str):
+        self.view = view
+    
+    def __enter__(self):
+        self.token = _frame.set(_Frame(self.view, None))
+        return self
+    
+    def __exit__(self, *exc):
+        _frame.reset(self.token)
+        return False
+
+
+class stage:
+    """Time a block as one stage of the view being built (no-op outside `scanning`)"""
+    __slots__ = ('name', 'parent', 'frame', 'token', 'start')
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self):
+        self.parent = _frame.get()
+        # Re-entering the stage already being timed adds nothing
+        if self.parent is None or self.parent.stage == self.name:
+            self.frame = None
+            return self
+        self.frame = _Frame(self.parent.view, self.name)
+        self.token = _frame.set(self.frame)
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        if self.frame is None:
+            return False
+        elapsed = time.perf_counter() - self.start
+        _frame.reset(self.token)
+        STAGE_SECONDS.observe(elapsed - self.frame.child, self.frame.view, self.name)
+        self.parent.child += elapsed
+        return False
+
+
+def timed(stage_name: str):
+    """Decorator form of `stage`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def monitor_loop_lag(interval: float = LAG_INTERVAL_SECONDS):
+    """Record how late each sleep of `interval` seconds wakes up, until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
+
+
+def _route_templates(app) -> Dict[object, str]:
+    return {route.endpoint: route.path for route in getattr(app, "routes", ()) if hasattr(route, "endpoint")}
+
+
+class MetricsMiddleware:
+    """Time each HTTP request into REQUEST_SECONDS, by method, route template and status"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.templates: Optional[Dict[object, str]] = None
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = 500
+        
+        async def record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, record)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], self.route(scope), str(status))
+    
+    def route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self.templates is None or endpoint not in self.templates:
+            self.templates = _route_templates(scope.get("app"))
+        return self.templates.get(endpoint, "unmatched")
+
+
+def render(extra: Iterable[str] = ()) -> str:
+    """Every histogram plus `extra` exposition lines"""
+    lines = [line for histogram in HISTOGRAMS for line in histogram.render()]
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
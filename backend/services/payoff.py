@@ -0,0 +1,251 @@
+"""
+Vectorized payoff evaluation for batches of multi-leg option positions.
+
+A batch holds n positions with k legs each (shorter positions are padded
+with zero-weight legs). Payoffs are per share, at the horizon (the first
+expiration), and include the net premium: credit positive, debit negative.
+"""
+import numpy as np
+from typing import Optional, Tuple
+
+from services.cache import LRUCache, array_digest
+from services.greeks import black_scholes_price
+
+_surface_cache = LRUCache(maxsize=128)
+
+
+class LegArrays:
+    """
+    Column arrays describing n positions of k legs each.
+    
+    Attributes:
+        strike: (n, k) strikes
+        is_call: (n, k) True for calls, False for puts
+        weight: (n, k) signed quantity, positive long / negative short
+        premium: (n,) net premium per share, positive for a credit
+        T_after: (n, k) years a leg still has to run after the horizon
+            (0 for legs expiring at the horizon, e.g. all legs but the far
+            leg of a calendar)
+        iv: (n, k) volatilities used to value legs with T_after > 0
+    """
+    
+    __slots__ = ('strike', 'is_call', 'weight', 'premium', 'T_after', 'iv')
+    
+    def __init__(self, strike, is_call, weight, premium, T_after=None, iv=None):
+        self.strike = np.atleast_2d(np.asarray(strike, dtype=float))
+        n, k = self.strike.shape
+        self.is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), (n, k))
+        self.weight = np.broadcast_to(np.asarray(weight, dtype=float), (n, k))
+        self.premium = np.broadcast_to(np.asarray(premium, dtype=float), (n,))
+        self.T_after = np.broadcast_to(
+            np.asarray(0.0 if T_after is None else T_after, dtype=float), (n, k)
+        )
+        self.iv = np.broadcast_to(np.asarray(0.0 if iv is None else iv, dtype=float), (n, k))
+    
+    def __len__(self) -> int:
+        return self.strike.shape[0]
+    
+    @property
+    def expires_at_horizon(self) -> bool:
+        """True when every leg expires at the horizon (payoff is piecewise linear)"""
+        return not np.any(self.T_after > 0)
+    
+    def digest(self) -> str:
+        """Content hash identifying this exact set of legs"""
+        return array_digest(self.strike, self.is_call, self.weight, self.premium, self.T_after, self.iv)
+    
+    def value_at(self, prices, r: float = 0.0) -> np.ndarray:
+        """Payoff per share of every position at the given horizon prices
+        
+        `prices` is (P,) shared by all positions or (n, P) per position;
+        returns (n, P).
+        """
+        prices = np.asarray(prices, dtype=float)
+        if prices.ndim == 1:
+            prices = np.broadcast_to(prices, (len(self), prices.shape[0]))
+        S = prices[:, :, None]
+        K = self.strike[:, None, :]
+        is_call = self.is_call[:, None, :]
+        if self.expires_at_horizon:
+            leg_values = np.where(is_call, np.maximum(S - K, 0.0), np.maximum(K - S, 0.0))
+        else:
+            leg_values = black_scholes_price(
+                S, K, self.T_after[:, None, :], r, self.iv[:, None, :],
+                np.where(is_call, 'call', 'put')
+            )
+        return self.premium[:, None] + np.einsum('npk,nk->np', leg_values, self.weight)
+    
+    def slopes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Expiry payoff slope below the lowest and above the highest strike"""
+        left = -np.sum(np.where(self.is_call, 0.0, self.weight), axis=1)
+        right = np.sum(np.where(self.is_call, self.weight, 0.0), axis=1)
+        return left, right
+
+
+def payoff_extremes(legs: LegArrays, r: float = 0.0,
+                    grid: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Best and worst payoff per share at the horizon
+    
+    Exact from the strike kinks when all legs expire at the horizon, with
+    +/-inf for payoffs that are unbounded above the highest strike. Legs
+    that outlive the horizon are evaluated on `grid` instead.
+    
+    Returns:
+        (max_payoff, min_payoff) arrays of shape (n,)
+    """
+    n = len(legs)
+    if not legs.expires_at_horizon:
+        if grid is None:
+            raise ValueError("A price grid is required when legs outlive the horizon")
+        values = legs.value_at(grid, r)
+        return values.max(axis=1), values.min(axis=1)
+    
+    points = np.concatenate([np.zeros((n, 1)), np.sort(legs.strike, axis=1)], axis=1)
+    values = legs.value_at(points, r)
+    _, slope = legs.slopes()
+    best = np.where(slope > 0, np.inf, values.max(axis=1))
+    worst = np.where(slope < 0, -np.inf, values.min(axis=1))
+    return best, worst
+
+
+def breakevens(legs: LegArrays, r: float = 0.0,
+               grid: Optional[np.ndarray] = None) -> np.ndarray:
+    """Every price where each position's horizon payoff crosses zero
+    
+    Exact from the strike kinks (plus the linear tail above the highest
+    strike) when all legs expire at the horizon; otherwise roots are
+    interpolated between the points of `grid`.
+    
+    Returns:
+        (n, m) array of sorted breakevens, NaN padded.
+    """
+    n = len(legs)
+    if legs.expires_at_horizon:
+        points = np.concatenate([np.zeros((n, 1)), np.sort(legs.strike, axis=1)], axis=1)
+        values = legs.value_at(points, r)
+    else:
+        if grid is None:
+            raise ValueError("A price grid is required when legs outlive the horizon")
+        points = np.broadcast_to(np.asarray(grid, dtype=float), (n, len(grid)))
+        values = legs.value_at(points[0], r)
+    
+    a, b = points[:, :-1], points[:, 1:]
+    va, vb = values[:, :-1], values[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roots = np.where((va > 0) != (vb > 0), a + (b - a) * va / (va - vb), np.nan)
+    
+    if legs.expires_at_horizon:
+        _, slope = legs.slopes()
+        last, v_last = points[:, -1], values[:, -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tail = np.where(((v_last > 0) != (slope > 0)) & (slope != 0), last - v_last / slope, np.nan)
+        roots = np.concatenate([roots, tail[:, None]], axis=1)
+    
+    # A payoff that only touches zero at a kink yields the same root twice
+    roots = np.sort(roots, axis=1)  # NaN sorts last
+    roots[:, 1:][roots[:, 1:] == roots[:, :-1]] = np.nan
+    return np.sort(roots, axis=1)
+
+
+def _segment_intervals(points: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sub-intervals of each linear segment [p_i, p_i+1] where the value is > 0
+    
+    Empty intervals come back with lo == hi.
+    """
+    a, b = points[:, :-1], points[:, 1:]
+    va, vb = values[:, :-1], values[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = a + (b - a) * va / (va - vb)
+    pos_a, pos_b = va > 0, vb > 0
+    lo = np.where(pos_a, a, np.where(pos_b, root, a))
+    hi = np.where(pos_a, np.where(pos_b, b, root), np.where(pos_b, b, a))
+    return lo, hi
+
+
+def profit_intervals(legs: LegArrays, r: float = 0.0,
+                     grid: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Price intervals at the horizon where each position makes money
+    
+    When all legs expire at the horizon the payoff is piecewise linear and
+    the intervals are exact, found from the payoff at its strike kinks. If
+    some legs run past the horizon, the payoff is evaluated on `grid` (a
+    sorted (P,) price array) and roots are interpolated between grid points.
+    
+    Returns:
+        (lo, hi) arrays of shape (n, m); hi may be +inf, empty intervals
+        have lo == hi.
+    """
+    n = len(legs)
+    if legs.expires_at_horizon:
+        kinks = np.sort(legs.strike, axis=1)
+        points = np.concatenate([np.zeros((n, 1)), kinks], axis=1)
+        values = legs.value_at(points, r)
+        lo, hi = _segment_intervals(points, values)
+        
+        # Beyond the highest strike the payoff is linear with the call slope
+        _, slope = legs.slopes()
+        last, v_last = points[:, -1], values[:, -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross = last - v_last / slope
+        tail_lo = np.where(v_last > 0, last, np.where(slope > 0, cross, last))
+        tail_hi = np.where(
+            v_last > 0,
+            np.where(slope >= 0, np.inf, cross),
+            np.where(slope > 0, np.inf, last)
+        )
+    else:
+        if grid is None:
+            raise ValueError("A price grid is required when legs outlive the horizon")
+        grid = np.asarray(grid, dtype=float)
+        points = np.broadcast_to(grid, (n, grid.shape[0]))
+        values = legs.value_at(grid, r)
+        lo, hi = _segment_intervals(points, values)
+        
+        # Outside the grid, extend the sign of the nearest grid value
+        tail_lo = points[:, -1]
+        tail_hi = np.where(values[:, -1] > 0, np.inf, points[:, -1])
+        head_lo = np.zeros(n)
+        head_hi = np.where(values[:, 0] > 0, points[:, 0], 0.0)
+        lo = np.concatenate([head_lo[:, None], lo], axis=1)
+        hi = np.concatenate([head_hi[:, None], hi], axis=1)
+    
+    return (
+        np.concatenate([lo, tail_lo[:, None]], axis=1),
+        np.concatenate([hi, tail_hi[:, None]], axis=1),
+    )
+
+
+def value_surface(strike, is_call, weight, premium: float, iv, T, prices, r: float = 0.0) -> np.ndarray:
+    """Payoff per share of a single position over a (date x price) grid
+    
+    Every leg is valued with Black-Scholes in one broadcast evaluation;
+    legs with no time left are worth their intrinsic value.
+    
+    Args:
+        strike, is_call, weight, iv: (k,) leg attributes
+        premium: Net premium per share, positive for a credit
+        T: (D, k) years each leg has left at each of the D dates
+        prices: (P,) underlying prices
+        r: Risk-free rate
+    
+    Returns:
+        (D, P) read-only array, cached per distinct set of inputs.
+    """
+    strike = np.asarray(strike, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+    weight = np.asarray(weight, dtype=float)
+    iv = np.asarray(iv, dtype=float)
+    T = np.atleast_2d(np.asarray(T, dtype=float))
+    prices = np.asarray(prices, dtype=float)
+    key = array_digest(strike, is_call, weight, iv, T, prices, np.array([premium, r], dtype=float))
+    
+    def compute():
+        leg_values = black_scholes_price(
+            prices[None, :, None], strike[None, None, :], T[:, None, :], r, iv[None, None, :],
+            np.where(is_call, 'call', 'put')[None, None, :]
+        )
+        surface = premium + leg_values @ weight
+        surface.flags.writeable = False
+        return surface
+    
+    return _surface_cache.get_or_compute(key, compute)
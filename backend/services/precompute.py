@@ -0,0 +1,139 @@
+"""
+Background precomputation of popular scanner views.
+
+Each job names a symbol, an expiration rule, a view and the view's
+parameters. On every tick the scheduler resolves each job's expiration,
+refetches the chain and builds the view's response, storing the response in
+result_cache so requests for that view are served without recomputing.
+
+Ticks are aligned to the wall clock: every SESSION_INTERVAL_SECONDS during
+the regular session and every CLOSED_INTERVAL_SECONDS outside it. A stored
+result is served for up to STALE_AFTER_TICKS intervals, so a failed refresh
+falls back to computing on request instead of serving old data indefinitely.
+
+Jobs come from the PRECOMPUTE_JOBS environment variable (a JSON list of
+{"symbol", "expiration", "view", "params"} objects) or DEFAULT_JOBS;
+PRECOMPUTE_ENABLED=0 turns the scheduler off.
+
+Expiration rules:
+    0dte, 1dte, ... - the Nth upcoming listed expiration (0dte = nearest)
+    YYYY-MM-DD      - that expiration
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services import market_hours, metrics, result_cache
+from services.yahoo_finance import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_ENABLED = os.environ.get('PRECOMPUTE_ENABLED', '1') != '0'
+SESSION_INTERVAL_SECONDS = 30
+CLOSED_INTERVAL_SECONDS = 600
+STALE_AFTER_TICKS = 2
+
+DEFAULT_JOBS = [
+    {"symbol": "^SPX", "expiration": rule, "view": view, "params": {}}
+    for rule in ("0dte", "1dte")
+    for view in ("iron_condors", "credit_spreads", "straddles")
+]
+
+_DTE_RULE = re.compile(r"^(\d+)dte$")
+_DATE_RULE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# View name -> (build function(chain, **params), default params)
+Views = Dict[str, Tuple[Callable, dict]]
+
+
+class Job:
+    __slots__ = ('symbol', 'expiration', 'view', 'params')
+    
+    def __init__(self, symbol: str, expiration: str, view: str, params: dict = None):
+        self.symbol = symbol
+        self.expiration = expiration
+        self.view = view
+        self.params = params or {}
+    
+    def __repr__(self) -> str:
+        return f"Job({self.symbol} {self.expiration} {self.view} {self.params})"
+
+
+def load_jobs(views: Views, config: Optional[str] = None) -> List[Job]:
+    """Parse the configured jobs, dropping (and logging) invalid ones"""
+    config = config if config is not None else os.environ.get('PRECOMPUTE_JOBS')
+    try:
+        specs = json.loads(config) if config else DEFAULT_JOBS
+    except ValueError as e:
+        logger.error(f"Ignoring invalid PRECOMPUTE_JOBS: {e}")
+        specs = DEFAULT_JOBS
+    
+    jobs = []
+    for spec in specs:
+        job = Job(spec.get("symbol", "^SPX"), str(spec.get("expiration", "0dte")), spec.get("view"), spec.get("params"))
+        if job.view not in views:
+            logger.warning(f"Skipping precompute job for unknown view: {job}")
+        elif not (_DTE_RULE.match(job.expiration) or _DATE_RULE.match(job.expiration)):
+            logger.warning(f"Skipping precompute job with invalid expiration rule: {job}")
+        elif set(job.params) - set(views[job.view][1]):
+            logger.warning(f"Skipping precompute job with unknown params: {job}")
+        else:
+            jobs.append(job)
+    return jobs
+
+
+def resolve_expiration(rule: str, expirations: List[str]) -> Optional[str]:
+    """The expiration a rule points at among upcoming listed expirations (sorted)"""
+    match = _DTE_RULE.match(rule)
+    if match:
+        n = int(match.group(1))
+        return expirations[n] if n < len(expirations) else None
+    return rule if rule in expirations else None
+
+
+def refresh_interval(at=None) -> int:
+    return SESSION_INTERVAL_SECONDS if market_hours.is_regular_session(at) else CLOSED_INTERVAL_SECONDS
+
+
+def run_job(job: Job, views: Views, max_age: float) -> Optional[tuple]:
+    """Refresh one job's view; returns its cache key, or None if it has no expiration today"""
+    build, defaults = views[job.view]
+    expirations = YahooFinanceService.fetch_expirations(job.symbol).expirations
+    expiration = resolve_expiration(job.expiration, expirations)
+    if expiration is None:
+        return None
+    
+    params = {**defaults, **job.params}
+    key = result_cache.view_key(job.view, job.symbol, expiration, **params)
+    with metrics.scanning(job.view):
+        with metrics.stage("fetch"):
+            chain = YahooFinanceService.get_chain(job.symbol, expiration)
+        result_cache.schedule(key, max_age)
+        result_cache.store(key, chain, build(chain, **params))
+    return key
+
+
+async def run_forever(jobs: List[Job], views: Views):
+    """Refresh every job once per tick until cancelled"""
+    logger.info(f"Precomputing {len(jobs)} views: {jobs}")
+    while True:
+        interval = refresh_interval()
+        started = time.time()
+        refreshed = 0
+        for job in jobs:
+            try:
+                # Scans block on upstream fetches and NumPy; keep the event loop free
+                if await asyncio.to_thread(run_job, job, views, interval * STALE_AFTER_TICKS):
+                    refreshed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Precompute of {job} failed: {e}")
+        logger.info(f"Precomputed {refreshed}/{len(jobs)} views in {time.time() - started:.1f}s")
+        
+        interval = refresh_interval()
+        await asyncio.sleep(interval - time.time() % interval)
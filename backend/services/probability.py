@@ -0,0 +1,257 @@
+"""
+Probability-of-profit engine shared by every strategy scanner.
+
+POP is the probability that a position's payoff at the horizon (its first
+expiration) is positive. The payoff's profitable price intervals come from
+services.payoff; this module measures them under one of two distributions:
+
+    closed_form  - lognormal terminal price with a per-position volatility
+    monte_carlo  - seeded terminal price samples, drawn from the chain's
+                   volatility smile (or lognormal when smile=False)
+
+expected_payoff measures the mean payoff under the same two distributions.
+Results are cached per (chain snapshot, legs, settings), so repeated scans of
+an unchanged chain do not recompute anything.
+"""
+import numpy as np
+from scipy.stats import norm
+from typing import Optional
+from fastapi import HTTPException
+
+from services import metrics
+from services.cache import LRUCache
+from services.chain import Chain
+from services.greeks import black_scholes_price
+from services.payoff import LegArrays, payoff_extremes, profit_intervals
+
+POP_MODES = ("closed_form", "monte_carlo")
+MC_PATHS = 20000
+MC_SEED = 0
+GRID_POINTS = 400  # Price grid for positions with legs that outlive the horizon
+GRID_STDEVS = 6.0  # Grid half-width in standard deviations of log price
+
+_pop_cache = LRUCache(maxsize=512)
+_sample_cache = LRUCache(maxsize=64)
+
+
+def validate_mode(mode: str) -> str:
+    """Reject unknown POP modes with a 400"""
+    if mode not in POP_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid pop_mode. Valid options: {', '.join(POP_MODES)}")
+    return mode
+
+
+def default_sigma(legs: LegArrays) -> np.ndarray:
+    """Average IV of a position's short legs (all legs if it has none)"""
+    short = legs.weight < 0
+    use = np.where(short.any(axis=1, keepdims=True), short, legs.weight != 0)
+    with np.errstate(invalid='ignore'):
+        return np.sum(np.where(use, legs.iv, 0.0), axis=1) / np.sum(use, axis=1)
+
+
+def lognormal_cdf(x, S: float, T: float, r: float, sigma) -> np.ndarray:
+    """P(S_T <= x) under Black-Scholes dynamics; valid for x in [0, inf]"""
+    x = np.asarray(x, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (np.log(x / S) - (r - 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
+    return norm.cdf(z)
+
+
+def smile_sampler_grid(chain: Chain, T: Optional[float] = None, points: int = 2000):
+    """Risk-neutral CDF of the terminal price implied by the chain's smile
+    
+    Calls are priced on a strike grid with IVs interpolated from OTM quotes
+    (puts below spot, calls above), and P(S_T <= K) = 1 + e^(rT) dC/dK.
+    
+    Returns:
+        (strike grid, cdf) arrays; the cdf is monotone and spans [0, 1].
+    """
+    T = chain.T if T is None else T
+    otm_puts = chain.puts.iv_valid & (chain.puts.iv > 0) & (chain.puts.strike < chain.spot)
+    otm_calls = chain.calls.iv_valid & (chain.calls.iv > 0) & (chain.calls.strike >= chain.spot)
+    strikes = np.concatenate([chain.puts.strike[otm_puts], chain.calls.strike[otm_calls]])
+    ivs = np.concatenate([chain.puts.iv[otm_puts], chain.calls.iv[otm_calls]])
+    if len(strikes) < 2:
+        return None
+    
+    atm_iv = float(np.interp(chain.spot, strikes, ivs))
+    half_width = GRID_STDEVS * atm_iv * np.sqrt(T)
+    grid = chain.spot * np.exp(np.linspace(-half_width, half_width, points))
+    grid_iv = np.interp(grid, strikes, ivs)  # flat extrapolation beyond quoted strikes
+    
+    calls = black_scholes_price(chain.spot, grid, T, chain.r, grid_iv, 'call')
+    cdf = 1 + np.exp(chain.r * T) * np.gradient(calls, grid)
+    cdf = np.maximum.accumulate(np.clip(cdf, 0.0, 1.0))
+    cdf[0], cdf[-1] = 0.0, 1.0
+    return grid, cdf
+
+
+def terminal_samples(chain: Chain, T: Optional[float] = None, smile: bool = True,
+                     paths: int = MC_PATHS, seed: int = MC_SEED,
+                     sigma: Optional[float] = None) -> np.ndarray:
+    """Sorted, seeded samples of the price at horizon T (cached per snapshot)"""
+    T = chain.T if T is None else T
+    key = (chain.version, round(T, 10), smile, paths, seed, sigma)
+    
+    def draw():
+        rng = np.random.default_rng(seed)
+        u = rng.random(paths)
+        smile_cdf = smile_sampler_grid(chain, T) if smile else None
+        if smile_cdf is not None:
+            grid, cdf = smile_cdf
+            samples = np.interp(u, cdf, grid)
+        else:
+            vol = sigma if sigma is not None else _atm_iv(chain)
+            z = norm.ppf(u)
+            samples = chain.spot * np.exp((chain.r - 0.5 * vol ** 2) * T + vol * np.sqrt(T) * z)
+        samples.sort()
+        samples.flags.writeable = False
+        return samples
+    
+    return _sample_cache.get_or_compute(key, draw)
+
+
+def _atm_iv(chain: Chain) -> float:
+    """IV of the listed call closest to spot"""
+    if len(chain.calls) == 0:
+        return 0.3
+    return float(chain.calls.iv_or_default[np.argmin(np.abs(chain.calls.strike - chain.spot))])
+
+
+def price_grid(chain: Chain, T: float, sigma: np.ndarray, points: int = GRID_POINTS) -> np.ndarray:
+    """Log-spaced price grid wide enough for every position's volatility"""
+    vol = float(np.nanmax(sigma)) if np.any(np.isfinite(sigma)) else _atm_iv(chain)
+    half_width = GRID_STDEVS * vol * np.sqrt(T)
+    return chain.spot * np.exp(np.linspace(-half_width, half_width, points))
+
+
+def _position_sigma(legs: LegArrays, sigma) -> np.ndarray:
+    if sigma is None:
+        return default_sigma(legs)
+    return np.broadcast_to(np.asarray(sigma, dtype=float), (len(legs),))
+
+
+@metrics.timed("score")
+def probability_of_profit(chain: Chain, legs: LegArrays, mode: str = "closed_form",
+                          sigma=None, T: Optional[float] = None, smile: bool = True,
+                          paths: int = MC_PATHS, seed: int = MC_SEED) -> np.ndarray:
+    """Probability (0-1) that each position's payoff at the horizon is positive
+    
+    Args:
+        chain: Snapshot supplying spot, rate, horizon and (for MC) the smile
+        legs: Positions to evaluate
+        mode: 'closed_form' or 'monte_carlo'
+        sigma: (n,) volatility per position for closed_form; defaults to
+            the average IV of each position's short legs
+        T: Horizon in years; defaults to the chain's time to expiration
+        smile: Sample from the smile-implied distribution in monte_carlo mode
+        paths, seed: Monte Carlo sample size and RNG seed
+    
+    Returns:
+        (n,) array of probabilities; NaN where they cannot be computed
+        (e.g. a non-positive volatility in closed_form mode).
+    """
+    validate_mode(mode)
+    T = chain.T if T is None else T
+    sigma = _position_sigma(legs, sigma)
+    if len(legs) == 0:
+        return np.empty(0)
+    
+    key = ('pop', chain.version, mode, legs.digest(), round(T, 10), smile, paths, seed,
+           sigma.tobytes() if mode == "closed_form" else None)
+    
+    def compute():
+        grid = None if legs.expires_at_horizon else price_grid(chain, T, sigma)
+        lo, hi = profit_intervals(legs, chain.r, grid)
+        
+        if mode == "closed_form":
+            vol = sigma[:, None]
+            prob = lognormal_cdf(hi, chain.spot, T, chain.r, vol) - lognormal_cdf(lo, chain.spot, T, chain.r, vol)
+            prob = np.sum(np.where(hi > lo, prob, 0.0), axis=1)
+            valid = np.isfinite(sigma) & (sigma > 0) & (T > 0)
+        else:
+            samples = terminal_samples(chain, T, smile, paths, seed)
+            inside = np.searchsorted(samples, hi, side='right') - np.searchsorted(samples, lo, side='right')
+            prob = np.sum(np.where(hi > lo, inside, 0), axis=1) / len(samples)
+            valid = np.ones(len(legs), dtype=bool)
+        
+        result = np.where(valid, np.clip(prob, 0.0, 1.0), np.nan)
+        result.flags.writeable = False
+        return result
+    
+    return _pop_cache.get_or_compute(key, compute)
+
+
+def _grid_weights(chain: Chain, grid: np.ndarray, T: float, mode: str, sigma: np.ndarray,
+                  smile: bool, paths: int, seed: int) -> np.ndarray:
+    """Probability mass at each grid price, (n, P) for closed_form, (P,) for MC
+    
+    Each grid point takes the mass between the midpoints to its neighbours;
+    the end points also take the tails beyond the grid.
+    """
+    edges = np.concatenate([[0.0], (grid[1:] + grid[:-1]) / 2, [np.inf]])
+    if mode == "closed_form":
+        cdf = lognormal_cdf(edges[None, :], chain.spot, T, chain.r, sigma[:, None])
+        cdf[:, 0], cdf[:, -1] = 0.0, 1.0
+    else:
+        samples = terminal_samples(chain, T, smile, paths, seed)
+        cdf = np.searchsorted(samples, edges, side='right') / len(samples)
+    return np.diff(cdf, axis=-1)
+
+
+def expected_payoff(chain: Chain, legs: LegArrays, mode: str = "closed_form",
+                    sigma=None, T: Optional[float] = None, smile: bool = True,
+                    paths: int = MC_PATHS, seed: int = MC_SEED) -> np.ndarray:
+    """Mean payoff per share at the horizon, net premium included
+    
+    Legs expiring at the horizon use exact partial expectations: the
+    undiscounted Black-Scholes price in closed_form mode, prefix sums over
+    the sorted samples in monte_carlo mode. Positions with longer-dated
+    legs are integrated over a price grid. Arguments match
+    probability_of_profit.
+    
+    Returns:
+        (n,) array of expected payoffs; NaN where they cannot be computed.
+    """
+    validate_mode(mode)
+    T = chain.T if T is None else T
+    sigma = _position_sigma(legs, sigma)
+    if len(legs) == 0:
+        return np.empty(0)
+    
+    key = ('ev', chain.version, mode, legs.digest(), round(T, 10), smile, paths, seed,
+           sigma.tobytes() if mode == "closed_form" else None)
+    
+    def compute():
+        if not legs.expires_at_horizon:
+            grid = price_grid(chain, T, sigma)
+            weights = _grid_weights(chain, grid, T, mode, sigma, smile, paths, seed)
+            ev = np.sum(legs.value_at(grid, chain.r) * weights, axis=1)
+        elif mode == "closed_form":
+            option_type = np.where(legs.is_call, 'call', 'put')
+            prices = black_scholes_price(chain.spot, legs.strike, T, chain.r, sigma[:, None], option_type)
+            ev = legs.premium + np.exp(chain.r * T) * np.sum(prices * legs.weight, axis=1)
+        else:
+            samples = terminal_samples(chain, T, smile, paths, seed)
+            N = len(samples)
+            cumsum = np.concatenate([[0.0], np.cumsum(samples)])
+            below = np.searchsorted(samples, legs.strike, side='right')
+            calls = (cumsum[-1] - cumsum[below] - legs.strike * (N - below)) / N
+            puts = (legs.strike * below - cumsum[below]) / N
+            ev = legs.premium + np.sum(np.where(legs.is_call, calls, puts) * legs.weight, axis=1)
+        
+        valid = np.isfinite(sigma) & (sigma > 0) & (T > 0) if mode == "closed_form" else np.ones(len(legs), dtype=bool)
+        result = np.where(valid, ev, np.nan)
+        result.flags.writeable = False
+        return result
+    
+    return _pop_cache.get_or_compute(key, compute)
+
+
+def payoff_range(chain: Chain, legs: LegArrays, sigma=None,
+                 T: Optional[float] = None) -> tuple:
+    """(max_payoff, min_payoff) per share at the horizon, see payoff_extremes"""
+    T = chain.T if T is None else T
+    grid = None if legs.expires_at_horizon else price_grid(chain, T, _position_sigma(legs, sigma))
+    return payoff_extremes(legs, chain.r, grid)
@@ -0,0 +1,181 @@
+"""
+Coalesced quote fetching.
+
+Quote requests for symbols without a fresh cached quote join the batch
+currently being collected; the first caller of a batch waits
+BATCH_WINDOW_SECONDS for others to join, then fetches every symbol in it
+with a single multi-symbol `yf.download` of recent daily bars. Callers
+asking for a symbol that is already being downloaded wait for that batch
+instead of starting another. Results are shared, for as long as
+ttl_policy keeps quotes fresh, by `fetch_quote`, `get_current_price`
+(scanner spots) and portfolio marking. If upstream is unavailable the last
+quotes are served instead and flagged stale in `upstream`.
+
+Callers block until their batch is downloaded, so only requests made on
+different threads can join one batch: call from sync route handlers (run on
+FastAPI's threadpool) or through run_in_threadpool, never on the event loop.
+"""
+import logging
+import threading
+import time
+import pandas as pd
+import yfinance as yf
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional
+
+from services import ttl_policy, upstream, yahoo_client
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW_SECONDS = 0.02
+BATCH_TIMEOUT_SECONDS = 30
+DOWNLOAD_PERIOD = "5d"  # Enough daily bars to always include the previous close
+
+
+class QuoteBar:
+    """Latest daily bar of a symbol plus the close before it"""
+    
+    __slots__ = ('symbol', 'price', 'previous_close', 'open', 'high', 'low', 'volume', 'fetched_at')
+    
+    def __init__(self, symbol: str, bars: pd.DataFrame, fetched_at: float):
+        last = bars.iloc[-1]
+        self.symbol = symbol
+        self.price = float(last['Close'])
+        self.previous_close = float(bars['Close'].iloc[-2]) if len(bars) > 1 else None
+        self.open = float(last['Open'])
+        self.high = float(last['High'])
+        self.low = float(last['Low'])
+        self.volume = float(last['Volume'])
+        self.fetched_at = fetched_at
+    
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class _Batch:
+    __slots__ = ('symbols', 'results', 'error', 'done')
+    
+    def __init__(self):
+        self.symbols = set()
+        self.results: Dict[str, QuoteBar] = {}
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+def download_bars(symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """Recent daily bars of every symbol from one yf.download call"""
+    frame = upstream.call("download", yf.download, symbols, period=DOWNLOAD_PERIOD, interval="1d",
+                          group_by="ticker", progress=False, threads=True, session=yahoo_client.session())
+    if frame is None or frame.empty:
+        return {}
+    out = {}
+    for symbol in symbols:
+        if isinstance(frame.columns, pd.MultiIndex):
+            if symbol not in frame.columns.get_level_values(0):
+                continue
+            bars = frame[symbol]
+        else:
+            bars = frame
+        bars = bars.dropna(subset=['Close'])
+        if not bars.empty:
+            out[symbol] = bars
+    return out
+
+
+class QuoteBatcher:
+    """Collects concurrent quote requests into shared multi-symbol downloads"""
+    
+    def __init__(self, download: Callable[[List[str]], Dict[str, pd.DataFrame]] = download_bars,
+                 is_fresh: Callable[[float], bool] = partial(ttl_policy.is_fresh, "quote"),
+                 window: float = BATCH_WINDOW_SECONDS):
+        self.download = download
+        self.is_fresh = is_fresh  # fetched_at -> still fresh?
+        self.window = window
+        self.batches = 0  # Upstream downloads made
+        self.requested = 0  # Symbols asked for, cached or not
+        self._quotes: Dict[str, QuoteBar] = {}
+        self._collecting: Optional[_Batch] = None
+        self._in_flight: Dict[str, _Batch] = {}
+        self._lock = threading.Lock()
+    
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, QuoteBar]:
+        """Fresh quotes for the symbols; symbols Yahoo returned no bars for are omitted"""
+        symbols = list(dict.fromkeys(symbols))
+        found: Dict[str, QuoteBar] = {}
+        waits = set()
+        lead = None
+        with self._lock:
+            self.requested += len(symbols)
+            for symbol in symbols:
+                quote = self._quotes.get(symbol)
+                if quote is not None and self.is_fresh(quote.fetched_at):
+                    found[symbol] = quote
+                elif symbol in self._in_flight:
+                    waits.add(self._in_flight[symbol])
+                else:
+                    if self._collecting is None:
+                        self._collecting = lead = _Batch()
+                    self._collecting.symbols.add(symbol)
+                    self._in_flight[symbol] = self._collecting
+                    waits.add(self._collecting)
+        
+        if lead is not None:
+            time.sleep(self.window)
+            with self._lock:
+                self._collecting = None
+            self._run(lead)
+        
+        for batch in waits:
+            if not batch.done.wait(BATCH_TIMEOUT_SECONDS):
+                raise TimeoutError("Timed out waiting for a quote batch")
+            if batch.error is not None:
+                raise batch.error
+            found.update((s, q) for s, q in batch.results.items() if s in symbols)
+        return {symbol: found[symbol] for symbol in symbols if symbol in found}
+    
+    def get(self, symbol: str) -> Optional[QuoteBar]:
+        return self.get_many([symbol]).get(symbol)
+    
+    def _run(self, batch: _Batch):
+        symbols = sorted(batch.symbols)
+        try:
+            bars = self.download(symbols)
+            fetched_at = time.time()
+            batch.results = {symbol: QuoteBar(symbol, frame, fetched_at) for symbol, frame in bars.items()}
+            for symbol in batch.results:
+                upstream.mark_fresh(("quote", symbol))
+            logger.info(f"Quote batch: {len(batch.results)}/{len(symbols)} symbols in one download")
+        except upstream.UpstreamUnavailable as e:
+            with self._lock:
+                batch.results = {symbol: self._quotes[symbol] for symbol in symbols if symbol in self._quotes}
+            for symbol in batch.results:
+                upstream.mark_stale(("quote", symbol))
+            if not batch.results:
+                batch.error = e
+            logger.warning(f"Quote batch failed, serving {len(batch.results)}/{len(symbols)} stale quotes: {e}")
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self.batches += 1
+                self._quotes.update(batch.results)
+                for symbol in symbols:
+                    if self._in_flight.get(symbol) is batch:
+                        del self._in_flight[symbol]
+            batch.done.set()
+    
+    def clear(self):
+        with self._lock:
+            self._quotes.clear()
+
+
+_batcher = QuoteBatcher()
+
+
+def get_many(symbols: Iterable[str]) -> Dict[str, QuoteBar]:
+    return _batcher.get_many(symbols)
+
+
+def get(symbol: str) -> Optional[QuoteBar]:
+    return _batcher.get(symbol)
@@ -0,0 +1,166 @@
+"""
+Cache of finished scanner responses, keyed by view and normalized params.
+
+Each entry remembers the chain snapshots (symbol, expiration, version) it
+was built from. A request reloads its chains (normally straight from the
+chain TTL cache) and reuses the entry while every version still matches;
+when a new snapshot lands, entries built from older ones are dropped.
+
+Views kept warm by the precompute scheduler are marked with `schedule`;
+their entries are served without reloading the chain for as long as they
+are younger than the key's max age. The response's `as_of` says when its
+chain snapshot was fetched.
+
+`respond` sets ETag and Last-Modified from the snapshot versions and fetch
+time, so a polling client gets a 304 until the chain changes. A response
+built from a chain that upstream could not refresh is flagged `stale`.
+"""
+import hashlib
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+from services import metrics, upstream
+from services.cache import LRUCache
+
+
+class CachedResult:
+    __slots__ = ('value', 'snapshots', 'modified', 'etag', 'stored_at')
+    
+    def __init__(self, key: Hashable, value: Any, chains: list):
+        self.value = value
+        self.snapshots = tuple((chain.symbol, chain.expiration, chain.version) for chain in chains)
+        self.modified = max(chain.fetched_at for chain in chains)
+        # Versions restart with the process; the fetch time keeps tags unique across restarts
+        digest = hashlib.blake2b(repr((key, self.snapshots, self.modified)).encode(), digest_size=12)
+        self.etag = f'"{digest.hexdigest()}"'
+        self.stored_at = time.time()
+    
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+_results = LRUCache(maxsize=256)
+_max_age: Dict[Hashable, float] = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+
+def view_key(view: str, symbol: str, expiration, **params) -> tuple:
+    """Cache key of one scanner view; `params` must include every default"""
+    return (view, symbol, expiration, tuple(sorted(params.items())))
+
+
+def _count(stat: str, n: int = 1):
+    with _lock:
+        _stats[stat] += n
+
+
+def _as_list(snapshot) -> list:
+    return list(snapshot) if isinstance(snapshot, (list, tuple)) else [snapshot]
+
+
+def schedule(key: Hashable, max_age: float):
+    """Serve `key` without reloading its chains while its result is younger than max_age seconds"""
+    with _lock:
+        _max_age[key] = max_age
+
+
+def store(key: Hashable, snapshot, value: Any) -> CachedResult:
+    """Cache `value`, built from `snapshot` (a chain or a list of chains)"""
+    entry = CachedResult(key, value, _as_list(snapshot))
+    _results.set(key, entry)
+    return entry
+
+
+def lookup(key: Hashable) -> Optional[CachedResult]:
+    """The stored result of a scheduled key, if still within its max age"""
+    max_age = _max_age.get(key)
+    if max_age is None:
+        return None
+    entry = _results.get(key)
+    if entry is None or entry.age >= max_age:
+        return None
+    return entry
+
+
+def serve(key: Hashable, load: Callable[[], Any], build: Callable[[Any], Any]) -> CachedResult:
+    """The cached result for key, rebuilt only when its chain snapshots changed
+    
+    `load` returns the view's chain (or list of chains) and `build` turns it
+    into the response.
+    """
+    entry = lookup(key)
+    if entry is not None:
+        _count("hits")
+        return entry
+    
+    with metrics.scanning(key[0]):
+        with metrics.stage("fetch"):
+            snapshot = load()
+        snapshots = tuple((chain.symbol, chain.expiration, chain.version) for chain in _as_list(snapshot))
+        entry = _results.get(key)
+        if entry is not None and entry.snapshots == snapshots:
+            _count("hits")
+            return entry
+        
+        _count("misses")
+        return store(key, snapshot, build(snapshot))
+
+
+def invalidate(chain):
+    """Drop results built from an older snapshot of chain's (symbol, expiration)"""
+    dropped = 0
+    for key, entry in _results.items():
+        if any(symbol == chain.symbol and expiration == chain.expiration and version < chain.version
+               for symbol, expiration, version in entry.snapshots):
+            _results.pop(key)
+            dropped += 1
+    if dropped:
+        _count("invalidated", dropped)
+
+
+def not_modified(request: Request, entry: CachedResult) -> bool:
+    """True when the request's validators still match entry (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(entry.modified) <= since
+
+
+def respond(request: Request, response: Response, entry: CachedResult):
+    """entry's value with ETag/Last-Modified set, or an empty 304 if the client's copy is current"""
+    headers = {"ETag": entry.etag, "Last-Modified": formatdate(entry.modified, usegmt=True)}
+    stale = upstream.any_stale(("chain", symbol, expiration) for symbol, expiration, _ in entry.snapshots)
+    if stale:
+        headers["Warning"] = '110 - "Response is Stale"'
+    if not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return entry.value.model_copy(update={"stale": True}) if stale else entry.value
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "size": len(_results)}
+
+
+def clear():
+    with _lock:
+        _max_age.clear()
+        for stat in _stats:
+            _stats[stat] = 0
+    _results.clear()
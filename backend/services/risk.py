@@ -0,0 +1,153 @@
+"""
+Exact expiration risk of open positions.
+
+Positions whose legs share one expiration have piecewise-linear payoffs, so
+max profit, max loss and breakevens are exact from the payoff at its strike
+kinks; all such positions are evaluated together in one LegArrays batch.
+Positions with legs on several expirations (calendars, diagonals) are valued
+at their first expiration on a price grid, pricing the later legs with
+Black-Scholes.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from models.position import PositionRisk, RiskConcentration, PortfolioRisk
+from services.exposure import CONTRACT_MULTIPLIER, open_legs
+from services.payoff import LegArrays, breakevens, payoff_extremes
+from services.probability import default_sigma, price_grid
+from services.yahoo_finance import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+
+def pack_legs(legs: pd.DataFrame, premiums: Dict[str, float]) -> Tuple[np.ndarray, LegArrays]:
+    """Pack a leg table into one LegArrays row per position
+    
+    Positions with fewer legs are padded with zero-weight legs. `premiums`
+    maps position id to net premium per share (credit positive).
+    
+    Returns:
+        (position ids, LegArrays) in matching order
+    """
+    ids, codes = np.unique(legs["position_id"].to_numpy(), return_inverse=True)
+    slot = legs.groupby("position_id").cumcount().to_numpy()
+    shape = (len(ids), int(slot.max()) + 1 if len(slot) else 1)
+    
+    strike = np.zeros(shape)
+    is_call = np.zeros(shape, dtype=bool)
+    weight = np.zeros(shape)
+    strike[codes, slot] = legs["strike"].to_numpy()
+    is_call[codes, slot] = legs["option_type"].to_numpy() == "call"
+    weight[codes, slot] = legs["contracts"].to_numpy()
+    premium = np.array([premiums[i] for i in ids], dtype=float)
+    return ids, LegArrays(strike, is_call, weight, premium)
+
+
+def _multi_expiry_risk(legs: pd.DataFrame, premium: float):
+    """(max payoff, min payoff, breakevens) of one multi-expiration position"""
+    symbol = legs["symbol"].iloc[0]
+    expirations = pd.to_datetime(legs["expiration"])
+    horizon = expirations.min()
+    chain = YahooFinanceService.get_chain(symbol, horizon.strftime("%Y-%m-%d"))
+    
+    iv = np.array([
+        YahooFinanceService.get_chain(symbol, exp).leg_ivs([option_type], [strike])[0]
+        for exp, option_type, strike in legs[["expiration", "option_type", "strike"]].itertuples(index=False)
+    ])
+    position = LegArrays(
+        strike=legs["strike"].to_numpy()[None, :],
+        is_call=(legs["option_type"].to_numpy() == "call")[None, :],
+        weight=legs["contracts"].to_numpy()[None, :],
+        premium=premium,
+        T_after=((expirations - horizon).dt.days.to_numpy() / 365.0)[None, :],
+        iv=iv[None, :],
+    )
+    grid = price_grid(chain, chain.T, default_sigma(position))
+    best, worst = payoff_extremes(position, chain.r, grid)
+    return best[0], worst[0], breakevens(position, chain.r, grid)[0]
+
+
+def _dollars(value: float) -> Optional[float]:
+    return round(float(value) * CONTRACT_MULTIPLIER, 2) if np.isfinite(value) else None
+
+
+def _concentration(risks: pd.DataFrame, by: str) -> List[RiskConcentration]:
+    total = risks["risk"].sum()
+    grouped = risks.groupby(by).agg(risk=("risk", "sum"), positions=("id", "count"))
+    grouped = grouped.sort_values("risk", ascending=False, kind="stable")
+    return [
+        RiskConcentration(
+            key=str(key),
+            positions=int(row["positions"]),
+            risk=round(float(row["risk"]), 2),
+            percent=round(float(row["risk"] / total * 100), 2) if total > 0 else 0.0,
+        )
+        for key, row in grouped.iterrows()
+    ]
+
+
+def portfolio_risk(positions: List[dict], trading_capital: Optional[float] = None) -> PortfolioRisk:
+    """Exact max profit / max loss / breakevens per open position plus book totals"""
+    by_id = {pos["id"]: pos for pos in positions if pos.get("status", "open") == "open"}
+    legs = open_legs(list(by_id.values()))
+    premiums = {pid: pos["entry_price"] * pos["quantity"] for pid, pos in by_id.items()}
+    
+    multi = legs.groupby("position_id")["expiration"].transform("nunique") > 1
+    results = {}
+    unpriced = []
+    
+    single = legs[~multi]
+    if len(single):
+        ids, batch = pack_legs(single, premiums)
+        best, worst = payoff_extremes(batch)
+        roots = breakevens(batch)
+        for i, pid in enumerate(ids):
+            results[pid] = (best[i], worst[i], roots[i], True)
+    
+    for pid, pos_legs in legs[multi].groupby("position_id", sort=False):
+        try:
+            best, worst, roots = _multi_expiry_risk(pos_legs, premiums[pid])
+            results[pid] = (best, worst, roots, False)
+        except Exception as e:
+            logger.warning(f"Could not evaluate risk for position {pid}: {e}")
+            unpriced.append(pid)
+    
+    position_risks = []
+    for pid, pos in by_id.items():
+        if pid not in results:
+            continue
+        best, worst, roots, exact = results[pid]
+        position_risks.append(PositionRisk(
+            id=pid,
+            symbol=pos["symbol"],
+            strategy_type=pos["strategy_type"],
+            strategy_name=pos["strategy_name"],
+            max_profit=_dollars(best),
+            max_loss=_dollars(-worst),
+            breakevens=[round(float(b), 2) for b in roots[np.isfinite(roots)]],
+            exact=exact,
+        ))
+    
+    risks = pd.DataFrame({
+        "id": [p.id for p in position_risks],
+        "symbol": [p.symbol for p in position_risks],
+        "strategy_type": [p.strategy_type for p in position_risks],
+        "risk": [max(p.max_loss, 0.0) if p.max_loss is not None else 0.0 for p in position_risks],
+    })
+    total_risk = float(risks["risk"].sum())
+    
+    return PortfolioRisk(
+        total_capital_at_risk=round(total_risk, 2),
+        capital_at_risk_percent=(
+            round(total_risk / trading_capital * 100, 2) if trading_capital else None
+        ),
+        unlimited_risk_positions=[p.id for p in position_risks if p.max_loss is None],
+        by_symbol=_concentration(risks, "symbol"),
+        by_strategy=_concentration(risks, "strategy_type"),
+        positions=position_risks,
+        unpriced_positions=sorted(unpriced),
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
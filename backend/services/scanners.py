@@ -0,0 +1,775 @@
+"""
+Vectorized candidate generation for the strategy scanners.
+
+Every scanner takes Chain snapshot(s) and returns a NumPy structured array
+with one record per candidate. Filtering and ranking happen on these arrays;
+routes convert only the records they return into pydantic models with
+records_to_models.
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+
+from services import metrics
+from services.chain import Chain, ChainSide, DEFAULT_IV, nearest_index
+from services.greeks import calculate_greeks_array
+from services.payoff import LegArrays
+from services.probability import probability_of_profit
+from services.scoring import SCORE_FIELDS, ranking, score
+
+_f8 = 'f8'
+_SCORES = [('expected_value', _f8), ('pop_weighted_ror', _f8), ('kelly_fraction', _f8)]
+
+VERTICAL_DTYPE = np.dtype([
+    ('sell_strike', _f8), ('buy_strike', _f8), ('sell_premium', _f8), ('buy_premium', _f8),
+    ('net_credit', _f8), ('max_profit', _f8), ('max_loss', _f8), ('breakeven', _f8),
+    ('risk_reward_ratio', _f8), ('probability_otm', _f8), ('probability_profit', _f8),
+    ('sell_delta', _f8), ('buy_delta', _f8), ('sell_iv', _f8), ('buy_iv', _f8),
+] + _SCORES)
+
+IRON_CONDOR_DTYPE = np.dtype([
+    ('put_sell_strike', _f8), ('put_buy_strike', _f8), ('put_credit', _f8),
+    ('call_sell_strike', _f8), ('call_buy_strike', _f8), ('call_credit', _f8),
+    ('net_credit', _f8), ('max_profit', _f8), ('max_loss', _f8),
+    ('lower_breakeven', _f8), ('upper_breakeven', _f8), ('profit_zone_width', _f8),
+    ('profit_zone_pct', _f8), ('risk_reward_ratio', _f8), ('probability_profit', _f8),
+] + _SCORES)
+
+IRON_BUTTERFLY_DTYPE = np.dtype([
+    ('center_strike', _f8), ('call_premium', _f8), ('put_premium', _f8),
+    ('upper_strike', _f8), ('lower_strike', _f8), ('upper_cost', _f8), ('lower_cost', _f8),
+    ('net_credit', _f8), ('max_profit', _f8), ('max_loss', _f8),
+    ('lower_breakeven', _f8), ('upper_breakeven', _f8), ('risk_reward_ratio', _f8),
+    ('probability_profit', _f8), ('distance_from_spot', _f8),
+] + _SCORES)
+
+STRADDLE_DTYPE = np.dtype([
+    ('strike', _f8), ('call_price', _f8), ('put_price', _f8), ('total_cost', _f8),
+    ('lower_breakeven', _f8), ('upper_breakeven', _f8), ('breakeven_move_pct', _f8),
+    ('distance_from_spot', _f8), ('call_iv', _f8), ('put_iv', _f8), ('avg_iv', _f8),
+    ('probability_profit', _f8),
+] + _SCORES)
+
+STRANGLE_DTYPE = np.dtype([
+    ('call_strike', _f8), ('put_strike', _f8), ('call_price', _f8), ('put_price', _f8),
+    ('total_cost', _f8), ('lower_breakeven', _f8), ('upper_breakeven', _f8),
+    ('breakeven_move_pct', _f8), ('width', _f8), ('call_iv', _f8), ('put_iv', _f8), ('avg_iv', _f8),
+    ('call_delta', _f8), ('put_delta', _f8), ('probability_profit', _f8),
+] + _SCORES)
+
+CALENDAR_DTYPE = np.dtype([
+    ('strike', _f8), ('option_type', 'U4'), ('near_price', _f8), ('far_price', _f8), ('net_debit', _f8),
+    ('near_iv', _f8), ('far_iv', _f8), ('iv_difference', _f8), ('near_theta', _f8),
+    ('far_theta', _f8), ('theta_edge', _f8), ('distance_from_spot', _f8), ('probability_profit', _f8),
+] + _SCORES)
+
+TERM_CALENDAR_DTYPE = np.dtype([
+    ('near_expiration', 'U10'), ('far_expiration', 'U10'), ('option_type', 'U4'),
+    ('near_strike', _f8), ('far_strike', _f8), ('near_price', _f8), ('far_price', _f8), ('net_debit', _f8),
+    ('near_iv', _f8), ('far_iv', _f8), ('iv_difference', _f8), ('near_theta', _f8),
+    ('far_theta', _f8), ('theta_edge', _f8), ('distance_from_spot', _f8), ('probability_profit', _f8),
+] + _SCORES)
+
+
+# Decimal places applied to each response field at the model boundary
+_PRICES = 2
+_SCORE_DECIMALS = {'expected_value': _PRICES, 'pop_weighted_ror': 4, 'kelly_fraction': 4}
+VERTICAL_DECIMALS = {
+    'sell_premium': _PRICES, 'buy_premium': _PRICES, 'net_credit': _PRICES, 'max_profit': _PRICES,
+    'max_loss': _PRICES, 'breakeven': _PRICES, 'risk_reward_ratio': 2, 'probability_otm': 1,
+    'probability_profit': 1,
+    **_SCORE_DECIMALS,
+}
+IRON_CONDOR_DECIMALS = {
+    'put_credit': _PRICES, 'call_credit': _PRICES, 'net_credit': _PRICES, 'max_profit': _PRICES,
+    'max_loss': _PRICES, 'lower_breakeven': _PRICES, 'upper_breakeven': _PRICES,
+    'profit_zone_width': 2, 'profit_zone_pct': 2, 'risk_reward_ratio': 2, 'probability_profit': 1,
+    **_SCORE_DECIMALS,
+}
+IRON_BUTTERFLY_DECIMALS = {
+    'call_premium': _PRICES, 'put_premium': _PRICES, 'upper_cost': _PRICES, 'lower_cost': _PRICES,
+    'net_credit': _PRICES, 'max_profit': _PRICES, 'max_loss': _PRICES, 'lower_breakeven': _PRICES,
+    'upper_breakeven': _PRICES, 'risk_reward_ratio': 2, 'probability_profit': 1, 'distance_from_spot': 2,
+    **_SCORE_DECIMALS,
+}
+STRADDLE_DECIMALS = {
+    'call_price': _PRICES, 'put_price': _PRICES, 'total_cost': _PRICES, 'lower_breakeven': _PRICES,
+    'upper_breakeven': _PRICES, 'breakeven_move_pct': 2, 'distance_from_spot': 2,
+    'call_iv': 1, 'put_iv': 1, 'avg_iv': 1, 'probability_profit': 1,
+    **_SCORE_DECIMALS,
+}
+STRANGLE_DECIMALS = {**STRADDLE_DECIMALS, 'call_delta': 4, 'put_delta': 4}
+CALENDAR_DECIMALS = {
+    'near_price': _PRICES, 'far_price': _PRICES, 'net_debit': _PRICES, 'near_iv': 1, 'far_iv': 1,
+    'iv_difference': 1, 'theta_edge': 4, 'distance_from_spot': 2, 'probability_profit': 1,
+    **_SCORE_DECIMALS,
+}
+TERM_CALENDAR_DECIMALS = dict(CALENDAR_DECIMALS)
+
+
+def _records(dtype: np.dtype, **columns) -> np.ndarray:
+    """Assemble a structured array from equally sized columns"""
+    n = len(next(iter(columns.values())))
+    out = np.empty(n, dtype=dtype)
+    for name in dtype.names:
+        out[name] = columns[name]
+    return out
+
+
+def _iv_percent(side: ChainSide) -> np.ndarray:
+    """Implied volatility in percent, 0 where Yahoo has none"""
+    return np.where(side.iv_valid, side.iv * 100, 0.0)
+
+
+def _truthy(values: np.ndarray) -> np.ndarray:
+    """Mask of entries that are present and non-zero"""
+    return np.isfinite(values) & (values != 0)
+
+
+@metrics.timed("generate")
+def vertical_spreads(chain: Chain, side: ChainSide, offset: float, width: float,
+                     pop_mode: str = "closed_form") -> np.ndarray:
+    """Credit verticals selling each strike and buying strike + offset
+    
+    Negative offsets give bull put spreads, positive offsets bear call spreads.
+    """
+    return _vertical_spreads(chain, side, _values(offset), _values(width), pop_mode)[0]
+
+
+def _values(values) -> np.ndarray:
+    return np.atleast_1d(np.asarray(values, dtype=float))
+
+
+def _vertical_spreads(chain: Chain, side: ChainSide, offsets: np.ndarray, widths: np.ndarray,
+                      pop_mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """vertical_spreads for several (offset, width) pairs in one pass
+    
+    Returns:
+        (records, index into offsets/widths of each record); records are
+        grouped by that index in order
+    """
+    which = np.repeat(np.arange(len(offsets)), len(side))
+    sell = np.tile(np.arange(len(side)), len(offsets))
+    buy = side.lookup(side.strike[sell] + offsets[which])
+    listed = buy >= 0
+    sell, buy, which = sell[listed], buy[listed], which[listed]
+    
+    sell_bid = side.bid_or_zero()[sell]
+    buy_ask = side.ask_or_zero()[buy]
+    net_credit = sell_bid - buy_ask
+    ok = (sell_bid > 0) & (buy_ask > 0) & (net_credit > 0)
+    sell, buy, which = sell[ok], buy[ok], which[ok]
+    sell_bid, buy_ask, net_credit = sell_bid[ok], buy_ask[ok], net_credit[ok]
+    offset, width = offsets[which], widths[which]
+    
+    sell_strike = side.strike[sell]
+    sell_delta = side.delta[sell]
+    max_profit = net_credit * 100
+    max_loss = (width - net_credit) * 100
+    # Breakeven sits net_credit beyond the short strike, towards the long strike
+    breakeven = np.where(offset < 0, sell_strike - net_credit, sell_strike + net_credit)
+    prob_otm = np.where(_truthy(sell_delta), (1 - np.abs(sell_delta)) * 100, np.nan)
+    sell_iv = side.iv_or_default[sell]
+    buy_iv = side.iv_or_default[buy]
+    
+    legs = LegArrays(
+        strike=np.column_stack([sell_strike, sell_strike + offset]),
+        is_call=side.option_type == 'call',
+        weight=[-1, 1],
+        premium=net_credit,
+        iv=np.column_stack([sell_iv, buy_iv]),
+    )
+    pop = probability_of_profit(chain, legs, pop_mode)
+    
+    records = _records(
+        VERTICAL_DTYPE,
+        sell_strike=sell_strike,
+        buy_strike=sell_strike + offset,
+        sell_premium=sell_bid,
+        buy_premium=buy_ask,
+        net_credit=net_credit,
+        max_profit=max_profit,
+        max_loss=max_loss,
+        breakeven=breakeven,
+        risk_reward_ratio=max_loss / max_profit,
+        probability_otm=np.where(prob_otm != 0, prob_otm, np.nan),
+        probability_profit=pop * 100,
+        sell_delta=sell_delta,
+        buy_delta=side.delta[buy],
+        sell_iv=sell_iv,
+        buy_iv=buy_iv,
+        **score(chain, legs, pop, pop_mode),
+    )
+    return records, which
+
+
+@metrics.timed("generate")
+def iron_condors(chain: Chain, width: float, pop_mode: str = "closed_form") -> np.ndarray:
+    """Every bull put x bear call pairing with the short call above the short put"""
+    return _iron_condors(chain, _values(width), pop_mode)[0]
+
+
+def _iron_condors(chain: Chain, widths: np.ndarray, pop_mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """iron_condors for several widths in one pass; returns (records, width index)"""
+    bull_puts, put_which = _vertical_spreads(chain, chain.puts, -widths, widths, pop_mode)
+    bear_calls, call_which = _vertical_spreads(chain, chain.calls, widths, widths, pop_mode)
+    
+    # Pair spreads of the same width; row-major nonzero keeps the (put, call)
+    # nesting order of the pairing
+    pairs = []
+    for i in range(len(widths)):
+        put_rows = np.flatnonzero(put_which == i)
+        call_rows = np.flatnonzero(call_which == i)
+        p, c = np.nonzero(bear_calls['sell_strike'][call_rows][None, :] > bull_puts['sell_strike'][put_rows][:, None])
+        pairs.append((put_rows[p], call_rows[c], np.full(len(p), i)))
+    p, c, which = (np.concatenate(part) for part in zip(*pairs))
+    bp = bull_puts[p]
+    bc = bear_calls[c]
+    
+    net_credit = bp['net_credit'] + bc['net_credit']
+    max_profit = net_credit * 100
+    max_loss = (widths[which] - net_credit) * 100
+    lower_breakeven = bp['sell_strike'] - net_credit
+    upper_breakeven = bc['sell_strike'] + net_credit
+    profit_zone_width = upper_breakeven - lower_breakeven
+    
+    # Probability that price ends between the breakevens, using the average
+    # IV of both short legs; fall back to short-leg deltas
+    legs = LegArrays(
+        strike=np.column_stack([bp['buy_strike'], bp['sell_strike'], bc['sell_strike'], bc['buy_strike']]),
+        is_call=[False, False, True, True],
+        weight=[1, -1, -1, 1],
+        premium=net_credit,
+        iv=np.column_stack([bp['buy_iv'], bp['sell_iv'], bc['sell_iv'], bc['buy_iv']]),
+    )
+    prob_profit = probability_of_profit(chain, legs, pop_mode) * 100
+    put_prob = np.where(_truthy(bp['sell_delta']), 1 - np.abs(bp['sell_delta']), 0.5)
+    call_prob = np.where(_truthy(bc['sell_delta']), 1 - np.abs(bc['sell_delta']), 0.5)
+    prob_profit = np.where(np.isnan(prob_profit), put_prob * call_prob * 100, prob_profit)
+    
+    records = _records(
+        IRON_CONDOR_DTYPE,
+        put_sell_strike=bp['sell_strike'],
+        put_buy_strike=bp['buy_strike'],
+        put_credit=bp['net_credit'],
+        call_sell_strike=bc['sell_strike'],
+        call_buy_strike=bc['buy_strike'],
+        call_credit=bc['net_credit'],
+        net_credit=net_credit,
+        max_profit=max_profit,
+        max_loss=max_loss,
+        lower_breakeven=lower_breakeven,
+        upper_breakeven=upper_breakeven,
+        profit_zone_width=profit_zone_width,
+        profit_zone_pct=profit_zone_width / chain.spot * 100,
+        risk_reward_ratio=np.where(max_profit > 0, max_loss / max_profit, 999),
+        probability_profit=prob_profit,
+        **score(chain, legs, prob_profit / 100, pop_mode),
+    )
+    return records, which
+
+
+@metrics.timed("generate")
+def iron_butterflies(chain: Chain, wing, pop_mode: str = "closed_form") -> np.ndarray:
+    """Short ATM straddle at each strike with long wings +/- wing away (one or several wings)"""
+    return _iron_butterflies(chain, _values(wing), pop_mode)[0]
+
+
+def _iron_butterflies(chain: Chain, wings: np.ndarray, pop_mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """iron_butterflies for several wings in one pass; returns (records, wing index)"""
+    calls, puts = chain.calls, chain.puts
+    # Centers come from the call/put strike join; wings are exact joins on
+    # the union strike grid shifted by each wing
+    paired = chain.paired()
+    which = np.repeat(np.arange(len(wings)), len(paired))
+    position = np.tile(paired, len(wings))
+    center, center_put = chain.call_idx[position], chain.put_idx[position]
+    center_strike = chain.strikes[position]
+    wing = wings[which]
+    upper_call = chain.side_rows(chain.strike_index(center_strike + wing), 'call')
+    lower_put = chain.side_rows(chain.strike_index(center_strike - wing), 'put')
+    listed = (upper_call >= 0) & (lower_put >= 0)
+    center, center_put, upper_call, lower_put = center[listed], center_put[listed], upper_call[listed], lower_put[listed]
+    which = which[listed]
+    
+    call_bid = calls.bid_or_zero()[center]
+    put_bid = puts.bid_or_zero()[center_put]
+    upper_ask = calls.ask_or_zero()[upper_call]
+    lower_ask = puts.ask_or_zero()[lower_put]
+    net_credit = call_bid + put_bid - upper_ask - lower_ask
+    ok = (call_bid > 0) & (put_bid > 0) & (upper_ask > 0) & (lower_ask > 0) & (net_credit > 0)
+    
+    center, center_put, upper_call, lower_put, which = center[ok], center_put[ok], upper_call[ok], lower_put[ok], which[ok]
+    center_strike = calls.strike[center]
+    wing = wings[which]
+    net_credit = net_credit[ok]
+    max_profit = net_credit * 100
+    max_loss = (wing - net_credit) * 100
+    lower_breakeven = center_strike - net_credit
+    upper_breakeven = center_strike + net_credit
+    
+    legs = LegArrays(
+        strike=np.column_stack([center_strike - wing, center_strike, center_strike, center_strike + wing]),
+        is_call=[False, False, True, True],
+        weight=[1, -1, -1, 1],
+        premium=net_credit,
+        iv=np.column_stack([
+            puts.iv_or_default[lower_put], puts.iv_or_default[center_put],
+            calls.iv_or_default[center], calls.iv_or_default[upper_call]
+        ]),
+    )
+    pop = probability_of_profit(chain, legs, pop_mode)
+    
+    records = _records(
+        IRON_BUTTERFLY_DTYPE,
+        center_strike=center_strike,
+        call_premium=call_bid[ok],
+        put_premium=put_bid[ok],
+        upper_strike=center_strike + wing,
+        lower_strike=center_strike - wing,
+        upper_cost=upper_ask[ok],
+        lower_cost=lower_ask[ok],
+        net_credit=net_credit,
+        max_profit=max_profit,
+        max_loss=max_loss,
+        lower_breakeven=lower_breakeven,
+        upper_breakeven=upper_breakeven,
+        risk_reward_ratio=max_loss / max_profit,
+        probability_profit=pop * 100,
+        distance_from_spot=(center_strike - chain.spot) / chain.spot * 100,
+        **score(chain, legs, pop, pop_mode),
+    )
+    return records, which
+
+
+@metrics.timed("generate")
+def straddles(chain: Chain, pop_mode: str = "closed_form") -> np.ndarray:
+    """Long call + long put at every strike listed on both sides"""
+    calls, puts = chain.calls, chain.puts
+    paired = chain.paired()
+    call_row, put_row = chain.call_idx[paired], chain.put_idx[paired]
+    
+    call_ask = calls.ask_or_zero()[call_row]
+    put_ask = puts.ask_or_zero()[put_row]
+    ok = (call_ask > 0) & (put_ask > 0)
+    call_row, put_row, call_ask, put_ask = call_row[ok], put_row[ok], call_ask[ok], put_ask[ok]
+    
+    strike = calls.strike[call_row]
+    total_cost = call_ask + put_ask
+    call_iv = _iv_percent(calls)[call_row]
+    put_iv = _iv_percent(puts)[put_row]
+    
+    legs = LegArrays(
+        strike=np.column_stack([strike, strike]),
+        is_call=[True, False],
+        weight=[1, 1],
+        premium=-total_cost,
+        iv=np.column_stack([calls.iv_or_default[call_row], puts.iv_or_default[put_row]]),
+    )
+    pop = probability_of_profit(chain, legs, pop_mode)
+    
+    return _records(
+        STRADDLE_DTYPE,
+        strike=strike,
+        call_price=call_ask,
+        put_price=put_ask,
+        total_cost=total_cost,
+        lower_breakeven=strike - total_cost,
+        upper_breakeven=strike + total_cost,
+        breakeven_move_pct=total_cost / strike * 100,
+        distance_from_spot=(strike - chain.spot) / chain.spot * 100,
+        call_iv=call_iv,
+        put_iv=put_iv,
+        avg_iv=(call_iv + put_iv) / 2,
+        probability_profit=pop * 100,
+        **score(chain, legs, pop, pop_mode),
+    )
+
+
+@metrics.timed("generate")
+def strangles(chain: Chain, width: float, pop_mode: str = "closed_form") -> np.ndarray:
+    """Long call + long put `width` below it (closest listed put when not exact)"""
+    return _strangles(chain, _values(width), pop_mode)[0]
+
+
+def _strangles(chain: Chain, widths: np.ndarray, pop_mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """strangles for several widths in one pass; returns (records, width index)"""
+    calls, puts = chain.calls, chain.puts
+    if len(calls) == 0 or len(puts) == 0:
+        return np.empty(0, dtype=STRANGLE_DTYPE), np.empty(0, dtype=np.intp)
+    
+    which = np.repeat(np.arange(len(widths)), len(calls))
+    call_row = np.tile(np.arange(len(calls)), len(widths))
+    # Exact matches are their own nearest strike
+    put_row = puts.nearest(calls.strike[call_row] - widths[which])
+    return _strangle_records(chain, call_row, put_row, which, pop_mode)
+
+
+@metrics.timed("generate")
+def delta_strangles(chain: Chain, call_deltas, put_deltas, pop_mode: str = "closed_form") -> Tuple[np.ndarray, np.ndarray]:
+    """Strangles pairing the call and put closest to each (call delta, put delta) target
+    
+    Deltas are absolute (0.10 for a 10-delta put). Only legs with an ask
+    and a delta are matched. A (call, put) pair chosen by several targets
+    is returned once, for the first of them.
+    
+    Returns:
+        (records, index of the target pair of each record)
+    """
+    call_deltas, put_deltas = _values(call_deltas), _values(put_deltas)
+    rows = []
+    for side, targets in ((chain.calls, call_deltas), (chain.puts, put_deltas)):
+        quoted = np.flatnonzero((side.ask_or_zero() > 0) & _truthy(side.delta))
+        if len(quoted) == 0:
+            return np.empty(0, dtype=STRANGLE_DTYPE), np.empty(0, dtype=np.intp)
+        order = np.argsort(np.abs(side.delta[quoted]), kind='stable')
+        rows.append(quoted[order][nearest_index(np.abs(side.delta[quoted][order]), targets)])
+    call_row, put_row = rows
+    
+    _, first = np.unique(np.column_stack([call_row, put_row]), axis=0, return_index=True)
+    first = np.sort(first)
+    return _strangle_records(chain, call_row[first], put_row[first], first, pop_mode)
+
+
+def _strangle_records(chain: Chain, call_row: np.ndarray, put_row: np.ndarray, which: np.ndarray,
+                      pop_mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Long call + long put records for matched rows; drops unquoted and crossed pairs"""
+    calls, puts = chain.calls, chain.puts
+    call_strike = calls.strike[call_row]
+    put_strike = puts.strike[put_row]
+    call_ask = calls.ask_or_zero()[call_row]
+    put_ask = puts.ask_or_zero()[put_row]
+    ok = (call_strike > put_strike) & (call_ask > 0) & (put_ask > 0)
+    call_row, put_row, which = call_row[ok], put_row[ok], which[ok]
+    call_strike, put_strike, call_ask, put_ask = call_strike[ok], put_strike[ok], call_ask[ok], put_ask[ok]
+    
+    total_cost = call_ask + put_ask
+    lower_breakeven = put_strike - total_cost
+    upper_breakeven = call_strike + total_cost
+    move_to_upper = (upper_breakeven - chain.spot) / chain.spot * 100
+    move_to_lower = (chain.spot - lower_breakeven) / chain.spot * 100
+    call_iv = _iv_percent(calls)[call_row]
+    put_iv = _iv_percent(puts)[put_row]
+    
+    legs = LegArrays(
+        strike=np.column_stack([call_strike, put_strike]),
+        is_call=[True, False],
+        weight=[1, 1],
+        premium=-total_cost,
+        iv=np.column_stack([calls.iv_or_default[call_row], puts.iv_or_default[put_row]]),
+    )
+    pop = probability_of_profit(chain, legs, pop_mode)
+    
+    records = _records(
+        STRANGLE_DTYPE,
+        call_strike=call_strike,
+        put_strike=put_strike,
+        call_price=call_ask,
+        put_price=put_ask,
+        total_cost=total_cost,
+        lower_breakeven=lower_breakeven,
+        upper_breakeven=upper_breakeven,
+        breakeven_move_pct=np.minimum(move_to_upper, move_to_lower),
+        width=call_strike - put_strike,
+        call_iv=call_iv,
+        put_iv=put_iv,
+        avg_iv=(call_iv + put_iv) / 2,
+        call_delta=calls.delta[call_row],
+        put_delta=puts.delta[put_row],
+        probability_profit=pop * 100,
+        **score(chain, legs, pop, pop_mode),
+    )
+    return records, which
+
+
+@metrics.timed("generate")
+def calendar_spreads(near_chain: Chain, far_chain: Chain, pop_mode: str = "closed_form") -> np.ndarray:
+    """Sell near-term, buy far-term at each strike listed in both expirations
+    
+    POP is evaluated at the near expiration, valuing the far leg with
+    Black-Scholes at its own IV for the time it has left.
+    """
+    spot = near_chain.spot
+    r = near_chain.r
+    parts = []
+    
+    for option_type in ('call', 'put'):
+        near_side = near_chain.side(option_type)
+        far_side = far_chain.side(option_type)
+        
+        near_row = np.arange(len(near_side))
+        far_row = far_side.lookup(near_side.strike)
+        listed = far_row >= 0
+        near_row, far_row = near_row[listed], far_row[listed]
+        
+        near_bid = near_side.bid_or_zero()[near_row]
+        far_ask = far_side.ask_or_zero()[far_row]
+        net_debit = far_ask - near_bid
+        ok = (near_bid > 0) & (far_ask > 0) & (net_debit > 0)
+        near_row, far_row, near_bid, far_ask, net_debit = (
+            near_row[ok], far_row[ok], near_bid[ok], far_ask[ok], net_debit[ok]
+        )
+        
+        strike = near_side.strike[near_row]
+        near_iv = _iv_percent(near_side)[near_row]
+        far_iv = _iv_percent(far_side)[far_row]
+        near_sigma = np.where(near_iv > 0, near_iv / 100, DEFAULT_IV)
+        far_sigma = np.where(far_iv > 0, far_iv / 100, DEFAULT_IV)
+        _, _, near_theta, _ = calculate_greeks_array(spot, strike, near_chain.T, r, near_sigma, option_type)
+        _, _, far_theta, _ = calculate_greeks_array(spot, strike, far_chain.T, r, far_sigma, option_type)
+        theta_edge = np.where(
+            _truthy(near_theta) & _truthy(far_theta), np.abs(near_theta) - np.abs(far_theta), np.nan
+        )
+        legs = LegArrays(
+            strike=np.column_stack([strike, strike]),
+            is_call=option_type == 'call',
+            weight=[-1, 1],
+            premium=-net_debit,
+            T_after=[0.0, max(far_chain.T - near_chain.T, 0.0)],
+            iv=np.column_stack([near_sigma, far_sigma]),
+        )
+        pop = probability_of_profit(near_chain, legs, pop_mode)
+        
+        parts.append(_records(
+            CALENDAR_DTYPE,
+            strike=strike,
+            option_type=np.full(len(strike), option_type),
+            near_price=near_bid,
+            far_price=far_ask,
+            net_debit=net_debit,
+            near_iv=near_iv,
+            far_iv=far_iv,
+            iv_difference=near_iv - far_iv,
+            near_theta=near_theta,
+            far_theta=far_theta,
+            theta_edge=np.where(theta_edge != 0, theta_edge, np.nan),
+            distance_from_spot=(strike - spot) / spot * 100,
+            probability_profit=pop * 100,
+            **score(near_chain, legs, pop, pop_mode),
+        ))
+    
+    return np.concatenate(parts)
+
+
+def _term_side(chain: Chain, option_type: str, strikes: np.ndarray, spot: float) -> Dict[str, np.ndarray]:
+    """One chain side's quotes and greeks aligned to a shared strike grid (NaN/0 where unlisted)"""
+    side = chain.side(option_type)
+    row = side.lookup(strikes)
+    listed = row >= 0
+    row = np.maximum(row, 0)
+    
+    def aligned(values, missing=np.nan):
+        return np.where(listed, values[row], missing) if len(side) else np.full(len(strikes), missing)
+    
+    iv = aligned(_iv_percent(side), 0.0)
+    sigma = np.where(iv > 0, iv / 100, DEFAULT_IV)
+    _, _, theta, _ = calculate_greeks_array(spot, strikes, chain.T, chain.r, sigma, option_type)
+    return {
+        'bid': aligned(side.bid_or_zero(), 0.0),
+        'ask': aligned(side.ask_or_zero(), 0.0),
+        'iv': iv,
+        'sigma': sigma,
+        'theta': theta,
+    }
+
+
+@metrics.timed("generate")
+def term_calendars(chains: List[Chain], strike_offsets=(0.0,), pop_mode: str = "closed_form",
+                   rank_by: Optional[str] = None, limit: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """Calendars and diagonals across every (near, far) pair of expirations
+    
+    Sells the near-term option at each strike and buys the far-term option
+    of the same type at strike + offset (offset 0 is a calendar, any other
+    a diagonal). Strikes of all chains are aligned on one grid and each
+    side's quotes and theta are computed once per chain; every (near, far,
+    offset, strike, type) combination is then priced in one vectorized pass.
+    
+    POP and scores use the near expiration as the horizon, like
+    calendar_spreads, and value the far leg with Black-Scholes, which
+    dominates the cost. With `rank_by` ('theta_edge' or 'iv_difference')
+    and `limit`, only the best `limit` combinations by that field (highest
+    first) are scored and they are returned in rank order.
+    
+    Args:
+        chains: Snapshots of one symbol, any order
+        strike_offsets: Far strike minus near strike for each variant
+    
+    Returns:
+        (records, number of combinations found before the limit)
+    """
+    chains = sorted(chains, key=lambda chain: chain.expiration)
+    offsets = _values(strike_offsets)
+    if len(chains) < 2:
+        return np.empty(0, dtype=TERM_CALENDAR_DTYPE), 0
+    spot = chains[0].spot
+    expirations = np.array([chain.expiration for chain in chains])
+    T = np.array([chain.T for chain in chains])
+    strikes = np.unique(np.concatenate([chain.strikes for chain in chains]))
+    # Grid column of every (offset, near strike) far leg; off-grid strikes
+    # point at a trailing column with no quotes
+    far_strike = strikes[None, :] + offsets[:, None]
+    far_pos = np.minimum(np.searchsorted(strikes, far_strike), len(strikes) - 1)
+    far_col = np.where(strikes[far_pos] == far_strike, far_pos, len(strikes))
+    
+    parts = []
+    for option_type in ('call', 'put'):
+        aligned = [_term_side(chain, option_type, strikes, spot) for chain in chains]
+        stack = {
+            name: np.column_stack([np.stack([a[name] for a in aligned]), np.full(len(chains), fill)])
+            for name, fill in (('bid', 0.0), ('ask', 0.0), ('iv', 0.0), ('sigma', DEFAULT_IV), ('theta', np.nan))
+        }
+        # (near, far, offset, strike) for every near-before-far pair at once
+        near_bid = stack['bid'][:-1, None, None, :-1]
+        far_ask = stack['ask'][None, :, far_col]
+        net_debit = far_ask - near_bid
+        pairs = np.arange(len(chains))[:-1, None] < np.arange(len(chains))[None, :]
+        ok = pairs[:, :, None, None] & (near_bid > 0) & (far_ask > 0) & (net_debit > 0)
+        near, far, k, s = np.nonzero(ok)
+        col = far_col[k, s]
+        parts.append({
+            'near': near, 'far': far, 'option_type': np.full(len(near), option_type),
+            'near_strike': strikes[s], 'far_strike': strikes[s] + offsets[k],
+            'near_price': stack['bid'][near, s], 'far_price': stack['ask'][far, col],
+            'net_debit': net_debit[near, far, k, s],
+            'near_iv': stack['iv'][near, s], 'far_iv': stack['iv'][far, col],
+            'near_sigma': stack['sigma'][near, s], 'far_sigma': stack['sigma'][far, col],
+            'near_theta': stack['theta'][near, s], 'far_theta': stack['theta'][far, col],
+        })
+    c = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    
+    theta_edge = np.where(
+        _truthy(c['near_theta']) & _truthy(c['far_theta']),
+        np.abs(c['near_theta']) - np.abs(c['far_theta']), np.nan
+    )
+    c['theta_edge'] = np.where(theta_edge != 0, theta_edge, np.nan)
+    c['iv_difference'] = c['near_iv'] - c['far_iv']
+    
+    # Pre-rank on the cheap columns so only the survivors are scored
+    candidates = len(c['near'])
+    rows = np.arange(candidates)
+    if rank_by is not None and limit is not None:
+        rows = top(rows, c[rank_by], limit, descending=True)
+    c = {name: values[rows] for name, values in c.items()}
+    
+    columns = {name: np.full(len(rows), np.nan) for name in ('probability_profit',) + SCORE_FIELDS}
+    for i in np.unique(c['near']):
+        sel = np.flatnonzero(c['near'] == i)
+        legs = LegArrays(
+            strike=np.column_stack([c['near_strike'][sel], c['far_strike'][sel]]),
+            is_call=(c['option_type'][sel] == 'call')[:, None],
+            weight=[-1, 1],
+            premium=-c['net_debit'][sel],
+            T_after=np.column_stack([np.zeros(len(sel)), np.maximum(T[c['far'][sel]] - T[i], 0.0)]),
+            iv=np.column_stack([c['near_sigma'][sel], c['far_sigma'][sel]]),
+        )
+        pop = probability_of_profit(chains[i], legs, pop_mode)
+        columns['probability_profit'][sel] = pop * 100
+        for name, values in score(chains[i], legs, pop, pop_mode).items():
+            columns[name][sel] = values
+    
+    records = _records(
+        TERM_CALENDAR_DTYPE,
+        near_expiration=expirations[c['near']],
+        far_expiration=expirations[c['far']],
+        option_type=c['option_type'],
+        near_strike=c['near_strike'],
+        far_strike=c['far_strike'],
+        near_price=c['near_price'],
+        far_price=c['far_price'],
+        net_debit=c['net_debit'],
+        near_iv=c['near_iv'],
+        far_iv=c['far_iv'],
+        iv_difference=c['iv_difference'],
+        near_theta=c['near_theta'],
+        far_theta=c['far_theta'],
+        theta_edge=c['theta_edge'],
+        distance_from_spot=(c['near_strike'] - spot) / spot * 100,
+        **columns,
+    )
+    return records, candidates
+
+
+# Strategy -> name of the parameter swept by sweep()
+SWEEP_PARAMETERS = {
+    'bull_put': 'width', 'bear_call': 'width', 'iron_condor': 'width',
+    'iron_butterfly': 'wing', 'strangle': 'width',
+}
+
+
+@metrics.timed("generate")
+def sweep(chain: Chain, strategy: str, values, pop_mode: str = "closed_form") -> Tuple[np.ndarray, np.ndarray]:
+    """Candidates for every width/wing in `values` from one scanner pass
+    
+    Returns:
+        (records, index into values of each record); each value's records
+        are exactly what the single-value scanner returns for it
+    """
+    values = _values(values)
+    if strategy == 'bull_put':
+        return _vertical_spreads(chain, chain.puts, -values, values, pop_mode)
+    if strategy == 'bear_call':
+        return _vertical_spreads(chain, chain.calls, values, values, pop_mode)
+    if strategy == 'iron_condor':
+        return _iron_condors(chain, values, pop_mode)
+    if strategy == 'iron_butterfly':
+        return _iron_butterflies(chain, values, pop_mode)
+    if strategy == 'strangle':
+        return _strangles(chain, values, pop_mode)
+    raise ValueError(f"Unknown sweep strategy {strategy}")
+
+
+@metrics.timed("score")
+def top(records: np.ndarray, key: np.ndarray, limit: int, descending: bool = False) -> np.ndarray:
+    """The first `limit` records of a stable sort by key; NaN keys rank last
+    
+    Only candidates that can make the cut are sorted: argpartition finds the
+    cut-off key, and every record tied with it is kept so the result matches
+    a full stable sort exactly.
+    """
+    key = np.asarray(key, dtype=float)
+    key = np.where(np.isnan(key), np.inf, -key if descending else key)
+    if limit < len(key):
+        cutoff = key[np.argpartition(key, limit - 1)[limit - 1]]
+        candidates = np.flatnonzero(key <= cutoff)
+    else:
+        candidates = np.arange(len(key))
+    order = candidates[np.argsort(key[candidates], kind='stable')]
+    return records[order[:limit]]
+
+
+@metrics.timed("score")
+def rank(records: np.ndarray, limit: int, order_by: Optional[str], key: np.ndarray,
+         descending: bool = False) -> np.ndarray:
+    """top() by the `order_by` score when one is requested, else by `key`"""
+    if order_by:
+        key, descending = ranking(records, order_by)
+    return top(records, key, limit, descending)
+
+
+@metrics.timed("serialize")
+def records_to_models(
+    records: np.ndarray,
+    model: Type[BaseModel],
+    decimals: Optional[Dict[str, int]] = None,
+    **constants
+) -> List[BaseModel]:
+    """Build response models for the given records only
+    
+    Fields are taken from the record columns matching the model's fields,
+    rounded per `decimals`; NaN becomes None. `constants` fill fields that
+    are the same for every record.
+    """
+    decimals = decimals or {}
+    names = [name for name in model.model_fields if name in records.dtype.names]
+    columns = []
+    for name in names:
+        values = records[name]
+        if values.dtype.kind == 'f':
+            if name in decimals:
+                values = np.round(values, decimals[name])
+            values = [v if v == v else None for v in values.tolist()]
+        else:
+            values = values.tolist()
+        columns.append(values)
+    
+    return [model(**dict(zip(names, row)), **constants) for row in zip(*columns)]
@@ -0,0 +1,71 @@
+"""
+Risk-adjusted scores for scanner candidates.
+
+Scores are computed for every candidate in one vectorized pass and stored as
+record columns, so any of them can be used to rank a scan:
+
+    expected_value    - mean P&L per contract at the horizon, in dollars
+    pop_weighted_ror  - POP x max profit / max loss
+    kelly_fraction    - Kelly bet size for a win-max-profit / lose-max-loss
+                        bet with the position's POP; negative means no edge
+
+Scores that depend on max profit are NaN when the profit is unbounded.
+"""
+import numpy as np
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException
+
+from services import metrics
+from services.chain import Chain
+from services.payoff import LegArrays
+from services.probability import expected_payoff, payoff_range
+
+SCORE_FIELDS = ('expected_value', 'pop_weighted_ror', 'kelly_fraction')
+
+# Record fields accepted by `order_by`; all rank highest first
+ORDER_BY_FIELDS = SCORE_FIELDS + ('probability_profit',)
+
+
+def validate_order_by(order_by: Optional[str]) -> Optional[str]:
+    """Reject unknown ranking fields with a 400"""
+    if order_by is not None and order_by not in ORDER_BY_FIELDS:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid order_by. Valid options: {', '.join(ORDER_BY_FIELDS)}"
+        )
+    return order_by
+
+
+@metrics.timed("score")
+def score(chain: Chain, legs: LegArrays, prob_profit: np.ndarray,
+          mode: str = "closed_form") -> Dict[str, np.ndarray]:
+    """Score columns for positions described by `legs`
+    
+    Args:
+        chain: Snapshot the positions were priced from (the horizon chain)
+        legs: Positions to score
+        prob_profit: (n,) probability of profit as a fraction (0-1)
+        mode: POP mode, also used for the expected value
+    
+    Returns:
+        Dict mapping each name in SCORE_FIELDS to an (n,) array
+    """
+    ev = expected_payoff(chain, legs, mode) * 100
+    best, worst = payoff_range(chain, legs)
+    max_profit = np.where(np.isfinite(best), best * 100, np.nan)
+    max_loss = np.where(np.isfinite(worst), -worst * 100, np.nan)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        odds = np.where((max_profit > 0) & (max_loss > 0), max_profit / max_loss, np.nan)
+        kelly = prob_profit - (1 - prob_profit) / odds
+    
+    return {
+        'expected_value': ev,
+        'pop_weighted_ror': prob_profit * odds,
+        'kelly_fraction': kelly,
+    }
+
+
+def ranking(records: np.ndarray, order_by: str) -> Tuple[np.ndarray, bool]:
+    """(key, descending) for ranking records by an ORDER_BY_FIELDS column"""
+    validate_order_by(order_by)
+    return np.round(records[order_by], 4), True
@@ -0,0 +1,139 @@
+"""
+On-disk store of recorded chain snapshots for offline replay.
+
+Each snapshot is one compressed .npz file holding both sides of a Chain as
+plain arrays (the already sorted, de-duplicated ChainSide columns plus their
+marks) and the spot/T/r it was priced with:
+
+    <root>/<symbol>/<expiration>/<YYYYmmddTHHMMSSZ>.npz
+
+Recording is enabled by setting CHAIN_SNAPSHOT_DIR; every fresh chain fetch
+is then written once. Loading can rebuild a full Chain (for the scanners) or
+read only the leg marks (for marking positions along a replay).
+"""
+import logging
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from services.cache import LRUCache
+from services.chain import Chain
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get('CHAIN_SNAPSHOT_DIR', '')
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+MARKET_TZ = "America/New_York"
+
+# Side column -> Yahoo option_chain column, so a Chain can be rebuilt as fetched
+_COLUMNS = {
+    'strike': 'strike', 'last': 'lastPrice', 'bid': 'bid', 'ask': 'ask', 'iv': 'impliedVolatility',
+    'volume': 'volume', 'open_interest': 'openInterest', 'in_the_money': 'inTheMoney',
+}
+
+_file_cache = LRUCache(maxsize=1024)
+
+
+def _root(root: Optional[str]) -> Path:
+    root = root or SNAPSHOT_DIR
+    if not root:
+        raise ValueError("No snapshot directory configured (set CHAIN_SNAPSHOT_DIR)")
+    return Path(root)
+
+
+def record(chain: Chain, root: str = None, taken_at: datetime = None) -> Path:
+    """Write one chain snapshot; returns the file path"""
+    taken_at = taken_at or datetime.fromtimestamp(chain.fetched_at, timezone.utc)
+    directory = _root(root) / chain.symbol / chain.expiration
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{taken_at.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)}.npz"
+    
+    arrays = {'spot': chain.spot, 'T': chain.T, 'r': chain.r}
+    for side in (chain.calls, chain.puts):
+        for column in _COLUMNS:
+            arrays[f"{side.option_type}_{column}"] = getattr(side, column)
+        arrays[f"{side.option_type}_mark"] = side.mark()
+    # Write then rename so readers never see a partial file
+    partial = path.with_suffix('.partial.npz')
+    np.savez_compressed(partial, **arrays)
+    os.replace(partial, path)
+    return path
+
+
+def record_quietly(chain: Chain):
+    """Record a fetched chain when CHAIN_SNAPSHOT_DIR is set; never raises"""
+    if not SNAPSHOT_DIR:
+        return
+    try:
+        record(chain)
+    except Exception as e:
+        logger.warning(f"Could not record snapshot of {chain.symbol} {chain.expiration}: {e}")
+
+
+def _arrays(path) -> dict:
+    """Contents of one snapshot file (cached, read-only)"""
+    path = str(path)
+    
+    def read():
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        for values in arrays.values():
+            values.flags.writeable = False
+        return arrays
+    
+    return _file_cache.get_or_compute(path, read)
+
+
+def index(symbol: str, root: str = None) -> pd.DataFrame:
+    """All snapshots of a symbol, sorted by time
+    
+    Columns: expiration, taken_at (UTC Timestamp), local (market-time
+    Timestamp), path.
+    """
+    rows = []
+    base = _root(root) / symbol
+    if base.is_dir():
+        for path in base.glob("*/*.npz"):
+            if path.name.endswith('.partial.npz'):
+                continue
+            rows.append((path.parent.name, path.stem, str(path)))
+    frame = pd.DataFrame(rows, columns=["expiration", "stamp", "path"])
+    frame["taken_at"] = pd.to_datetime(frame["stamp"], format=TIMESTAMP_FORMAT, utc=True)
+    frame["local"] = frame["taken_at"].dt.tz_convert(MARKET_TZ)
+    frame = frame.drop(columns="stamp").sort_values(["taken_at", "expiration"], kind="stable")
+    return frame.reset_index(drop=True)[["expiration", "taken_at", "local", "path"]]
+
+
+def load_chain(symbol: str, expiration: str, path) -> Chain:
+    """Rebuild the Chain a snapshot was recorded from"""
+    arrays = _arrays(path)
+    frames = {
+        option_type: pd.DataFrame({
+            yahoo: arrays[f"{option_type}_{column}"] for column, yahoo in _COLUMNS.items()
+        })
+        for option_type in ('call', 'put')
+    }
+    return Chain(symbol, expiration, frames['call'], frames['put'],
+                 float(arrays['spot']), float(arrays['T']), float(arrays['r']))
+
+
+def spot(path) -> float:
+    return float(_arrays(path)['spot'])
+
+
+def leg_marks(path, option_types: np.ndarray, strikes: np.ndarray) -> np.ndarray:
+    """Recorded mark of each (option_type, strike) leg; NaN if unlisted or unquoted"""
+    arrays = _arrays(path)
+    marks = np.full(strikes.shape, np.nan)
+    for option_type in ('call', 'put'):
+        sel = option_types == option_type
+        side_strikes = arrays[f"{option_type}_strike"]
+        if not sel.any() or len(side_strikes) == 0:
+            continue
+        pos = np.minimum(np.searchsorted(side_strikes, strikes[sel]), len(side_strikes) - 1)
+        found = side_strikes[pos] == strikes[sel]
+        marks[sel] = np.where(found, arrays[f"{option_type}_mark"][pos], np.nan)
+    return marks
@@ -0,0 +1,65 @@
+"""
+How long each kind of upstream data stays fresh, by market state.
+
+Every cache asks `expires_at(kind, fetched_at)` (or `is_fresh`) instead of
+keeping its own TTL, so all of them follow the exchange calendar in
+services/market_hours. A policy entry is either a number of seconds or one
+of:
+    CHANGE - until the market state next changes (e.g. CLOSED -> PRE)
+    OPEN   - until the next regular session opens
+    CLOSE  - until the current or next regular session closes
+
+Options only trade in the regular session, so outside it chains are kept
+until the open; after the close, they are refreshed slowly for a while because
+final marks and settlement prices keep arriving. Over weekends and holidays
+nearly everything is served from cache.
+"""
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Union
+
+from services import market_hours
+from services.market_hours import CLOSED, POST, PRE, REGULAR
+
+CHANGE, OPEN, CLOSE = "change", "open", "close"
+
+TTL = Union[float, str]
+
+POLICY: Dict[str, Dict[str, TTL]] = {
+    "quote": {REGULAR: 5, PRE: 15, POST: 15, CLOSED: CHANGE},
+    "info": {REGULAR: 60, PRE: 60, POST: 60, CLOSED: CHANGE},  # 52w range, market cap, marketState
+    "chain": {REGULAR: 15, PRE: OPEN, POST: 300, CLOSED: OPEN},
+    "expirations": {REGULAR: CLOSE, PRE: CLOSE, POST: CLOSE, CLOSED: CLOSE},  # Listings roll over at the close
+    "history_intraday": {REGULAR: 60, PRE: OPEN, POST: 900, CLOSED: OPEN},  # Tail refresh of the bar store
+    "history_daily": {REGULAR: 300, PRE: OPEN, POST: 900, CLOSED: OPEN},
+}
+
+
+def expires_at(kind: str, fetched_at: float = None) -> float:
+    """Epoch seconds at which data of `kind` fetched at `fetched_at` (default now) goes stale"""
+    return _expires_at(kind, time.time() if fetched_at is None else fetched_at)
+
+
+# Caches check freshness on every lookup; each fetch time is resolved once
+@lru_cache(maxsize=4096)
+def _expires_at(kind: str, fetched_at: float) -> float:
+    at = datetime.fromtimestamp(fetched_at, market_hours.MARKET_TZ)
+    ttl = POLICY[kind][market_hours.market_state(at)]
+    if ttl == CHANGE:
+        return market_hours.next_change(at).timestamp()
+    if ttl == OPEN:
+        return market_hours.next_open(at).timestamp()
+    if ttl == CLOSE:
+        return market_hours.next_close(at).timestamp()
+    return fetched_at + ttl
+
+
+def is_fresh(kind: str, fetched_at: float, now: float = None) -> bool:
+    return (time.time() if now is None else now) < expires_at(kind, fetched_at)
+
+
+def seconds_left(kind: str, now: float = None) -> float:
+    """How long data of `kind` fetched now stays fresh"""
+    now = time.time() if now is None else now
+    return expires_at(kind, now) - now
@@ -0,0 +1,216 @@
+"""
+Guarded calls to the Yahoo provider.
+
+Every upstream request goes through `call`:
+    - one token bucket shared by all callers caps the request rate at
+      RATE_PER_SECOND (bursts of up to BURST), so load queues instead of
+      tripping Yahoo's rate limiting
+    - transient failures (429s, connection errors, timeouts, responses the
+      caller marks as empty) are retried up to MAX_ATTEMPTS times with
+      full-jitter exponential backoff
+    - a circuit breaker opens after FAILURE_THRESHOLD consecutive calls fail;
+      while it is open calls fail fast with UpstreamUnavailable, and after
+      OPEN_SECONDS a single trial call decides whether it closes again
+
+Callers holding an expired cache entry fall back to it when `call` raises
+UpstreamUnavailable and record its key with `mark_stale`, so responses built
+from it are flagged as stale until a fetch succeeds again.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_PER_SECOND = float(os.environ.get('UPSTREAM_RATE_PER_SECOND', '5'))
+BURST = int(os.environ.get('UPSTREAM_BURST', '10'))
+ACQUIRE_TIMEOUT_SECONDS = 15  # Longest wait for a token before giving up
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30
+
+# Error text yfinance/requests/curl use for throttling and flaky connections
+TRANSIENT_MARKERS = ("429", "Too Many Requests", "Rate limit", "timed out", "Timeout", "Connection", "502", "503", "504")
+
+
+class UpstreamUnavailable(Exception):
+    """Upstream is rate limiting, failing or behind an open circuit breaker"""
+
+
+class EmptyResponse(Exception):
+    """Upstream answered with no data where some was expected"""
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', '_lock')
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to `timeout` seconds for it"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    __slots__ = ('threshold', 'open_seconds', 'failures', 'opened_at', 'trial', '_lock')
+    
+    def __init__(self, threshold: int, open_seconds: float):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False  # A half-open trial call is in flight
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.trial or time.monotonic() - self.opened_at >= self.open_seconds else "open"
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.trial = True
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Upstream circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+    
+    def release(self):
+        """Give up a trial call without a verdict"""
+        with self._lock:
+            self.trial = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or (self.opened_at is None and self.failures >= self.threshold):
+                logger.warning(f"Upstream circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+_bucket = TokenBucket(RATE_PER_SECOND, BURST)
+_breaker = CircuitBreaker(FAILURE_THRESHOLD, OPEN_SECONDS)
+_stale: set = set()
+_lock = threading.Lock()
+_stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "stale_served": 0}
+
+
+def _count(stat: str):
+    with _lock:
+        _stats[stat] += 1
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (EmptyResponse, TimeoutError, OSError)):  # requests/curl errors are OSErrors
+        return True
+    text = f"{type(error).__name__}: {error}"
+    return any(marker.lower() in text.lower() for marker in TRANSIENT_MARKERS)
+
+
+def call(name: str, fn: Callable[..., Any], *args, empty: Callable[[Any], bool] = None, **kwargs) -> Any:
+    """fn(*args, **kwargs) under the shared rate limit, retries and circuit breaker
+    
+    Args:
+        name: What is being fetched, for errors and logs
+        empty: Optional check for a response that should be retried as a
+            transient failure (e.g. an option chain with no rows)
+    
+    Raises:
+        UpstreamUnavailable: circuit open, no rate-limit token in time, or
+            every attempt failed transiently; other errors propagate as is
+    """
+    if not _breaker.allow():
+        _count("rejected")
+        raise UpstreamUnavailable(f"{name}: upstream circuit open")
+    
+    method = name.split("(")[0]  # "option_chain(^SPX 2025-01-17)" -> "option_chain"
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            _count("retries")
+            time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))))
+        if not _bucket.acquire(ACQUIRE_TIMEOUT_SECONDS):
+            _breaker.release()
+            raise UpstreamUnavailable(f"{name}: timed out waiting for the upstream rate limit")
+        _count("calls")
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+            if empty is not None and empty(result):
+                raise EmptyResponse(f"{name}: empty response")
+        except Exception as e:
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, method, type(e).__name__)
+            if not is_transient(e):
+                # Upstream answered; the request itself was bad
+                _breaker.record_success()
+                raise
+            error = e
+            logger.warning(f"Upstream {name} attempt {attempt + 1}/{MAX_ATTEMPTS} failed: {e}")
+        else:
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, method, "ok")
+            _breaker.record_success()
+            return result
+    
+    _count("failures")
+    _breaker.record_failure()
+    raise UpstreamUnavailable(f"{name} failed after {MAX_ATTEMPTS} attempts: {error}") from error
+
+
+def mark_stale(key: Hashable):
+    """Record that `key` is being served from an expired cache entry"""
+    _count("stale_served")
+    with _lock:
+        _stale.add(key)
+
+
+def mark_fresh(key: Hashable):
+    with _lock:
+        _stale.discard(key)
+
+
+def is_stale(key: Hashable) -> bool:
+    return key in _stale
+
+
+def any_stale(keys: Iterable[Hashable]) -> bool:
+    return any(key in _stale for key in keys)
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "circuit": _breaker.state, "stale_keys": len(_stale)}
@@ -0,0 +1,216 @@
+"""
+One-day Value-at-Risk and expected shortfall of the open book.
+
+Modes:
+    historical   - full revaluation under the last HISTORY_DAYS joint daily
+                   log returns of every underlying in the book
+    monte_carlo  - full revaluation under MC_PATHS correlated normal returns
+                   with the historical covariance, seeded by the trading day
+    parametric   - delta-normal: book delta dollars against that covariance
+
+A scenario set is built once per (trading day, mode, symbols). Each
+position's P/L vector over a scenario set is cached under the set, so when
+positions open or close only the new ones are revalued; the book P/L is the
+sum of cached per-position vectors.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timezone
+from typing import List, Sequence, Tuple
+from zoneinfo import ZoneInfo
+from fastapi import HTTPException
+from scipy.stats import norm
+
+from models.position import PortfolioVaR, VaRLevel
+from services.cache import LRUCache
+from services.exposure import CONTRACT_MULTIPLIER, open_legs, position_greeks
+from services.greeks import black_scholes_price
+from services.scenarios import leg_inputs
+from services.yahoo_finance import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+VAR_MODES = ("historical", "parametric", "monte_carlo")
+CONFIDENCE_LEVELS = (0.95, 0.99)
+HORIZON_DAYS = 1
+HISTORY_PERIOD = "1y"
+HISTORY_DAYS = 250
+MC_PATHS = 10000
+MAX_EVALUATIONS = 2_000_000  # Leg x path Black-Scholes evaluations per batch
+
+_scenario_cache = LRUCache(maxsize=16)
+_pnl_cache = LRUCache(maxsize=4096)
+
+
+def validate_mode(mode: str) -> str:
+    """Reject unknown VaR modes with a 400"""
+    if mode not in VAR_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Valid options: {', '.join(VAR_MODES)}")
+    return mode
+
+
+def trading_day() -> date:
+    """Current date in New York, which keys the daily scenario sets"""
+    return datetime.now(ZoneInfo("America/New_York")).date()
+
+
+def daily_log_returns(symbol: str) -> pd.Series:
+    """Daily close-to-close log returns over HISTORY_PERIOD, indexed by date"""
+    history = YahooFinanceService.fetch_history(symbol, HISTORY_PERIOD)
+    closes = pd.Series(
+        [point.close for point in history.data],
+        index=pd.to_datetime([point.date for point in history.data]),
+    )
+    return np.log(closes).diff().dropna()
+
+
+class ScenarioSet:
+    """1-day log return scenarios for a tuple of symbols"""
+    
+    __slots__ = ('key', 'symbols', 'returns', 'covariance')
+    
+    def __init__(self, key: tuple, symbols: Tuple[str, ...], returns: np.ndarray, covariance: np.ndarray):
+        self.key = key
+        self.symbols = symbols
+        self.returns = returns  # (paths, symbols); empty for parametric
+        self.covariance = covariance  # (symbols, symbols) daily
+    
+    def __len__(self) -> int:
+        return self.returns.shape[0]
+
+
+def scenario_set(symbols: Sequence[str], mode: str, day: date = None) -> ScenarioSet:
+    """Scenario set for the trading day (cached)"""
+    symbols = tuple(sorted(set(symbols)))
+    day = day or trading_day()
+    key = (day.isoformat(), mode, symbols)
+    
+    def build():
+        frame = pd.concat({s: daily_log_returns(s) for s in symbols}, axis=1, join="inner").tail(HISTORY_DAYS)
+        history = frame.to_numpy() * np.sqrt(HORIZON_DAYS)
+        covariance = np.atleast_2d(np.cov(history, rowvar=False))
+        if mode == "historical":
+            returns = history
+        elif mode == "monte_carlo":
+            rng = np.random.default_rng(day.toordinal())
+            factor = np.linalg.cholesky(covariance + 1e-12 * np.eye(len(symbols)))
+            returns = rng.standard_normal((MC_PATHS, len(symbols))) @ factor.T
+        else:
+            returns = np.empty((0, len(symbols)))
+        returns.flags.writeable = False
+        return ScenarioSet(key, symbols, returns, covariance)
+    
+    return _scenario_cache.get_or_compute(key, build)
+
+
+def revalue_positions(legs: pd.DataFrame, scenarios: ScenarioSet) -> Tuple[np.ndarray, np.ndarray]:
+    """Dollar P/L of each position in every scenario by full revaluation
+    
+    `legs` must carry spot, T, r and iv (see scenarios.leg_inputs). Legs are
+    priced in batches of at most MAX_EVALUATIONS leg x path points.
+    
+    Returns:
+        (position ids, (positions, paths) P/L array)
+    """
+    legs = legs.sort_values("position_id", kind="stable")
+    ids, starts = np.unique(legs["position_id"].to_numpy(), return_index=True)
+    symbol_index = np.searchsorted(np.array(scenarios.symbols), legs["symbol"].to_numpy())
+    
+    spot, strike, T, r, iv = (legs[name].to_numpy() for name in ("spot", "strike", "T", "r", "iv"))
+    option_type = legs["option_type"].to_numpy()
+    scale = legs["contracts"].to_numpy() * CONTRACT_MULTIPLIER
+    T_next = np.maximum(T - HORIZON_DAYS / 365.0, 0.0)
+    base = black_scholes_price(spot, strike, T, r, iv, option_type)
+    
+    leg_pnl = np.empty((len(legs), len(scenarios)))
+    step = max(1, MAX_EVALUATIONS // max(len(scenarios), 1))
+    for lo in range(0, len(legs), step):
+        sl = slice(lo, lo + step)
+        S = spot[sl, None] * np.exp(scenarios.returns[:, symbol_index[sl]].T)
+        values = black_scholes_price(
+            S, strike[sl, None], T_next[sl, None], r[sl, None], iv[sl, None], option_type[sl, None]
+        )
+        leg_pnl[sl] = (values - base[sl, None]) * scale[sl, None]
+    
+    return ids, np.add.reduceat(leg_pnl, starts, axis=0) if len(legs) else leg_pnl
+
+
+def _levels_from_pnl(pnl: np.ndarray) -> List[VaRLevel]:
+    losses = -pnl
+    levels = []
+    for confidence in CONFIDENCE_LEVELS:
+        var = float(np.quantile(losses, confidence))
+        tail = losses[losses >= var]
+        levels.append(VaRLevel(
+            confidence=confidence,
+            var=round(var, 2),
+            expected_shortfall=round(float(tail.mean()) if len(tail) else var, 2),
+        ))
+    return levels
+
+
+def _parametric_levels(legs: pd.DataFrame, scenarios: ScenarioSet) -> Tuple[List[VaRLevel], List[str]]:
+    greeks = position_greeks(legs)
+    unpriced = sorted(set(greeks.loc[~greeks["priced"], "position_id"]))
+    greeks = greeks[~greeks["position_id"].isin(unpriced)]
+    delta_dollars = greeks.groupby("symbol")["delta_dollars"].sum().reindex(scenarios.symbols).fillna(0.0)
+    d = delta_dollars.to_numpy()
+    sigma = float(np.sqrt(max(d @ scenarios.covariance @ d, 0.0)))
+    levels = []
+    for confidence in CONFIDENCE_LEVELS:
+        z = norm.ppf(confidence)
+        levels.append(VaRLevel(
+            confidence=confidence,
+            var=round(z * sigma, 2),
+            expected_shortfall=round(sigma * norm.pdf(z) / (1 - confidence), 2),
+        ))
+    return levels, unpriced
+
+
+def portfolio_var(positions: List[dict], mode: str = "historical") -> PortfolioVaR:
+    """1-day VaR and expected shortfall of all open positions"""
+    validate_mode(mode)
+    legs = open_legs(positions)
+    day = trading_day()
+    scenarios = scenario_set(legs["symbol"], mode, day) if len(legs) else None
+    unpriced: List[str] = []
+    
+    if scenarios is None:
+        levels = [VaRLevel(confidence=c, var=0.0, expected_shortfall=0.0) for c in CONFIDENCE_LEVELS]
+    elif mode == "parametric":
+        levels, unpriced = _parametric_levels(legs, scenarios)
+    else:
+        # Reuse cached P/L vectors; revalue only positions not seen today
+        contents = {}
+        for row in legs[["position_id", "expiration", "option_type", "strike", "contracts"]].itertuples(index=False):
+            contents.setdefault(row[0], []).append(row[1:])
+        keys = {pid: (scenarios.key, pid, tuple(rows)) for pid, rows in contents.items()}
+        vectors = {pid: _pnl_cache.get(key) for pid, key in keys.items()}
+        missing = [pid for pid, vector in vectors.items() if vector is None]
+        
+        if missing:
+            new_legs = leg_inputs(legs[legs["position_id"].isin(missing)])
+            unpriced = sorted(set(new_legs.loc[new_legs["spot"].isna(), "position_id"]))
+            new_legs = new_legs[~new_legs["position_id"].isin(unpriced)]
+            ids, pnl = revalue_positions(new_legs, scenarios)
+            for pid, vector in zip(ids, pnl):
+                vector.flags.writeable = False
+                _pnl_cache.set(keys[pid], vector)
+                vectors[pid] = vector
+            logger.info(f"VaR revalued {len(ids)} new positions over {len(scenarios)} {mode} scenarios")
+        
+        priced = [vector for vector in vectors.values() if vector is not None]
+        book = np.sum(priced, axis=0) if priced else np.zeros(len(scenarios))
+        levels = _levels_from_pnl(book)
+    
+    return PortfolioVaR(
+        mode=mode,
+        horizon_days=HORIZON_DAYS,
+        scenarios=len(scenarios) if scenarios is not None else 0,
+        positions=int(legs["position_id"].nunique()) - len(unpriced),
+        levels=levels,
+        unpriced_positions=unpriced,
+        as_of=day.isoformat(),
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
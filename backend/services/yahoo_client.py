@@ -0,0 +1,67 @@
+"""
+Shared HTTP session and Ticker registry for yfinance.
+
+A yf.Ticker built without a session opens its own curl session, so every
+call paid for a new connection (DNS, TCP and TLS handshakes) and cookie
+setup. Instead:
+    - `session()` is one curl_cffi session for the whole process (browser
+      impersonation, TCP keep-alive, at most POOL_SIZE cached connections
+      per thread), given to every Ticker and to yf.download; Yahoo's
+      cookie and crumb are fetched once on it and then reused
+    - `ticker(symbol)` keeps Ticker objects in an LRU registry, so per-symbol
+      state (exchange timezone, price history helper) is looked up once
+
+yfinance memoizes `Ticker.info`, and a Ticker's expiration listing only
+grows, so registered Tickers are rebuilt when ttl_policy expires the
+listing, and `fresh_ticker` (a new Ticker on the shared session, no network
+needed to build it) is used to re-read `info` and `options`.
+"""
+import threading
+import time
+
+import yfinance as yf
+from curl_cffi import CurlOpt
+from curl_cffi import requests as curl_requests
+
+from services import ttl_policy
+from services.cache import LRUCache
+
+POOL_SIZE = 10  # Cached connections per thread
+KEEPALIVE_IDLE_SECONDS = 60
+REGISTRY_SIZE = 256
+
+_session = None
+_session_lock = threading.Lock()
+_tickers = LRUCache(maxsize=REGISTRY_SIZE)  # symbol -> (created_at, Ticker)
+
+
+def session() -> curl_requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = curl_requests.Session(impersonate="chrome", curl_options={
+                    CurlOpt.MAXCONNECTS: POOL_SIZE,
+                    CurlOpt.TCP_KEEPALIVE: 1,
+                    CurlOpt.TCP_KEEPIDLE: KEEPALIVE_IDLE_SECONDS,
+                })
+    return _session
+
+
+def fresh_ticker(symbol: str) -> yf.Ticker:
+    """A new Ticker on the shared session, for memoized fields"""
+    return yf.Ticker(symbol, session=session())
+
+
+def ticker(symbol: str) -> yf.Ticker:
+    """The registered Ticker for a symbol"""
+    entry = _tickers.get(symbol)
+    if entry is not None and ttl_policy.is_fresh("expirations", entry[0]):
+        return entry[1]
+    created = fresh_ticker(symbol)
+    _tickers.set(symbol, (time.time(), created))
+    return created
+
+
+def stats() -> dict:
+    return {"tickers": len(_tickers), "hits": _tickers.hits, "misses": _tickers.misses}
@@ -1,7 +1,11 @@
 import yfinance as yf
+import numpy as np
 import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
 from datetime import datetime, timezone
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Tuple
 from fastapi import HTTPException
 import logging
 
@@ -9,7 +13,10 @@ from models.schemas import (
     SPXQuote, HistoricalDataPoint, SPXHistory, 
     OptionContract, OptionsChain, OptionsExpirations
 )
-from services.greeks import calculate_greeks
+from services.chain import Chain, ChainSide
+from services import bar_store, metrics, quote_batch, result_cache, snapshots, ttl_policy, upstream, yahoo_client
+from services import downsample as downsampling
+from services.cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
@@ -19,24 +26,54 @@ class YahooFinanceService:
     
     RISK_FREE_RATE = 0.045  # 4.5%
     
+    _chain_cache: Dict[Tuple[str, str], Chain] = {}
+    _chain_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    _history_cache = LRUCache(maxsize=64)  # Formatted responses per store version
+    _info_cache = LRUCache(maxsize=256)  # symbol -> (fetched_at, info)
+    _expirations_cache: Dict[str, Tuple[float, Tuple[str, ...], frozenset]] = {}  # symbol -> (expires_at, listed, set)
+    _expirations_locks: Dict[str, threading.Lock] = {}
+    _fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chain-fetch")
+    
     @staticmethod
     def get_ticker(symbol: str) -> yf.Ticker:
-        """Get a Yahoo Finance ticker object"""
-        return yf.Ticker(symbol)
+        """Get a Yahoo Finance ticker object (registered, on the shared session)"""
+        return yahoo_client.ticker(symbol)
+    
+    @classmethod
+    def get_info(cls, symbol: str) -> dict:
+        """ticker.info (slow-moving fields: 52w range, market cap, state), refetched per ttl_policy
+        
+        Falls back to the last info (or {}) when upstream is unavailable.
+        """
+        cached = cls._info_cache.get(symbol)
+        if cached is not None and ttl_policy.is_fresh("info", cached[0]):
+            return cached[1]
+        try:
+            info = upstream.call(f"info({symbol})", lambda: yahoo_client.fresh_ticker(symbol).info) or {}
+        except upstream.UpstreamUnavailable as e:
+            logger.warning(f"Serving stale info for {symbol}: {e}")
+            upstream.mark_stale(("info", symbol))
+            return cached[1] if cached is not None else {}
+        upstream.mark_fresh(("info", symbol))
+        cls._info_cache.set(symbol, (time.time(), info))
+        return info
     
     @classmethod
     def fetch_quote(cls, symbol: str) -> SPXQuote:
-        """Fetch current quote for a symbol"""
+        """Fetch current quote for a symbol
+        
+        Price and today's bar come from the coalesced quote batch; the
+        remaining fields from the cached ticker.info.
+        """
         try:
-            ticker = cls.get_ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="2d")
+            bar = quote_batch.get(symbol)
             
-            if hist.empty:
+            if bar is None:
                 raise HTTPException(status_code=503, detail=f"Unable to fetch market data for {symbol}")
             
-            current_price = float(hist['Close'].iloc[-1])
-            previous_close = float(info.get('previousClose', hist['Close'].iloc[-2] if len(hist) > 1 else current_price))
+            info = cls.get_info(symbol)
+            current_price = bar.price
+            previous_close = float(info.get('previousClose', bar.previous_close if bar.previous_close is not None else current_price))
             
             change = current_price - previous_close
             change_percent = (change / previous_close) * 100 if previous_close else 0
@@ -50,30 +87,37 @@ class YahooFinanceService:
                 change=round(change, 2),
                 change_percent=round(change_percent, 2),
                 previous_close=round(previous_close, 2),
-                open=round(float(info.get('open', hist['Open'].iloc[-1])), 2),
-                day_high=round(float(info.get('dayHigh', hist['High'].iloc[-1])), 2),
-                day_low=round(float(info.get('dayLow', hist['Low'].iloc[-1])), 2),
-                volume=int(hist['Volume'].iloc[-1]) if hist['Volume'].iloc[-1] > 0 else None,
+                open=round(bar.open, 2),
+                day_high=round(bar.high, 2),
+                day_low=round(bar.low, 2),
+                volume=int(bar.volume) if bar.volume > 0 else None,
                 market_cap=info.get('marketCap'),
                 fifty_two_week_high=round(float(info.get('fiftyTwoWeekHigh', 0)), 2),
                 fifty_two_week_low=round(float(info.get('fiftyTwoWeekLow', 0)), 2),
                 timestamp=datetime.now(timezone.utc).isoformat(),
-                market_state=market_state
+                market_state=market_state,
+                stale=upstream.any_stale([("quote", symbol), ("info", symbol)])
             )
         except HTTPException:
             raise
+        except upstream.UpstreamUnavailable as e:
+            logger.warning(f"Quote for {symbol} unavailable: {e}")
+            raise HTTPException(status_code=503, detail=f"Market data for {symbol} is temporarily unavailable")
         except Exception as e:
             logger.error(f"Error fetching quote for {symbol}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to fetch data for {symbol}: {str(e)}")
     
     @classmethod
-    def fetch_history(cls, symbol: str, period: str, interval: str = None) -> SPXHistory:
+    def fetch_history(cls, symbol: str, period: str, interval: str = None,
+                      max_points: int = None, downsample: str = "lttb") -> SPXHistory:
         """Fetch historical data for a symbol
         
         Args:
             symbol: Stock/index symbol
             period: Time period (1d, 5d, 1mo, etc.)
             interval: Data interval (1m, 5m, 15m, 1h, 1d). Auto-selected if None.
+            max_points: Return at most this many bars (all bars if None)
+            downsample: 'lttb' (line charts) or 'ohlc' (candles) when reducing
         """
         valid_periods = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
         valid_intervals = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo"]
@@ -92,46 +136,93 @@ class YahooFinanceService:
         
         if interval not in valid_intervals:
             raise HTTPException(status_code=400, detail=f"Invalid interval. Valid options: {', '.join(valid_intervals)}")
+        downsampling.validate(max_points, downsample)
         
         try:
-            ticker = cls.get_ticker(symbol)
-            hist = ticker.history(period=period, interval=interval)
+            history_fetch = cls.get_ticker(symbol).history
+            version, tz, bars = bar_store.bars(
+                symbol, period, interval, lambda **kwargs: upstream.call(f"history({symbol})", history_fetch, **kwargs)
+            )
             
-            if hist.empty:
+            if len(bars['ts']) == 0:
                 raise HTTPException(status_code=503, detail=f"Unable to fetch historical data for {symbol}")
             
-            data_points = []
-            for date, row in hist.iterrows():
-                # Format date/time based on interval
-                if interval in ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"]:
-                    date_str = date.strftime("%Y-%m-%d %H:%M")
-                else:
-                    date_str = date.strftime("%Y-%m-%d")
-                
-                data_points.append(HistoricalDataPoint(
-                    date=date_str,
-                    open=round(float(row['Open']), 2),
-                    high=round(float(row['High']), 2),
-                    low=round(float(row['Low']), 2),
-                    close=round(float(row['Close']), 2),
-                    volume=int(row['Volume']) if row['Volume'] > 0 else None
-                ))
+            key = (symbol, interval, period, version, len(bars['ts']), max_points, downsample)
+            history = cls._history_cache.get(key)
+            if history is None:
+                bars = downsampling.downsample(bars, max_points, downsample)
+                points = cls._history_points(bars, tz, interval in bar_store.INTRADAY_INTERVALS)
+                history = SPXHistory(symbol=symbol, period=period, data=points)
+                cls._history_cache.set(key, history)
             
-            logger.info(f"History fetched for {symbol}: {len(data_points)} data points for period {period}, interval {interval}")
+            logger.info(f"History fetched for {symbol}: {len(history.data)} data points for period {period}, interval {interval}")
             
-            return SPXHistory(symbol=symbol, period=period, data=data_points)
+            if upstream.is_stale(("history", symbol, interval)):
+                return history.model_copy(update={"stale": True})
+            return history
         except HTTPException:
             raise
+        except upstream.UpstreamUnavailable as e:
+            logger.warning(f"History for {symbol} unavailable: {e}")
+            raise HTTPException(status_code=503, detail=f"Historical data for {symbol} is temporarily unavailable")
         except Exception as e:
             logger.error(f"Error fetching history for {symbol}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to fetch historical data for {symbol}: {str(e)}")
     
+    @staticmethod
+    def _history_points(bars: Dict[str, np.ndarray], tz: str, intraday: bool) -> List[HistoricalDataPoint]:
+        """Format stored bars, one vectorized pass per column"""
+        fmt = "%Y-%m-%d %H:%M" if intraday else "%Y-%m-%d"
+        dates = pd.DatetimeIndex(bars['ts'], tz="UTC").tz_convert(tz).strftime(fmt).tolist()
+        prices = [np.round(bars[name], 2).tolist() for name in ('open', 'high', 'low', 'close')]
+        volume = bars['volume']
+        volumes = [v if v > 0 else None for v in np.where(volume > 0, volume, 0).astype(np.int64).tolist()]
+        # Values are already typed and rounded, so skip per-row validation
+        return [
+            HistoricalDataPoint.model_construct(date=d, open=o, high=h, low=lo, close=c, volume=v)
+            for d, o, h, lo, c, v in zip(dates, *prices, volumes)
+        ]
+    
+    @classmethod
+    def _cached_expirations(cls, symbol: str):
+        entry = cls._expirations_cache.get(symbol)
+        if entry is not None and time.time() < entry[0]:
+            return entry
+        
+        with cls._expirations_locks.setdefault(symbol, threading.Lock()):
+            entry = cls._expirations_cache.get(symbol)
+            if entry is not None and time.time() < entry[0]:
+                return entry
+            try:
+                options = lambda: yahoo_client.fresh_ticker(symbol).options
+                listed = tuple(upstream.call(f"options({symbol})", options) or ())
+            except upstream.UpstreamUnavailable as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Serving stale expirations for {symbol}: {e}")
+                upstream.mark_stale(("expirations", symbol))
+                return entry
+            upstream.mark_fresh(("expirations", symbol))
+            entry = (ttl_policy.expires_at("expirations"), listed, frozenset(listed))
+            # An empty listing is usually a transient upstream failure; retry next time
+            if listed:
+                cls._expirations_cache[symbol] = entry
+            return entry
+    
+    @classmethod
+    def get_expirations(cls, symbol: str) -> Tuple[str, ...]:
+        """Listed expirations of a symbol, fetched once per trading day (cache rolls at the close)"""
+        return cls._cached_expirations(symbol)[1]
+    
+    @classmethod
+    def is_listed_expiration(cls, symbol: str, expiration: str) -> bool:
+        return expiration in cls._cached_expirations(symbol)[2]
+    
     @classmethod
     def fetch_expirations(cls, symbol: str) -> OptionsExpirations:
         """Fetch available expiration dates for options (excludes expired dates)"""
         try:
-            ticker = cls.get_ticker(symbol)
-            expirations = ticker.options
+            expirations = cls.get_expirations(symbol)
             
             if not expirations:
                 raise HTTPException(status_code=503, detail=f"No options data available for {symbol}")
@@ -148,16 +239,43 @@ class YahooFinanceService:
             return OptionsExpirations(symbol=symbol, expirations=valid_expirations)
         except HTTPException:
             raise
+        except upstream.UpstreamUnavailable as e:
+            logger.warning(f"Expirations for {symbol} unavailable: {e}")
+            raise HTTPException(status_code=503, detail=f"Options data for {symbol} is temporarily unavailable")
         except Exception as e:
             logger.error(f"Error fetching options expirations for {symbol}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to fetch options expirations for {symbol}: {str(e)}")
     
     @classmethod
     def get_current_price(cls, symbol: str) -> float:
-        """Get current price for a symbol"""
-        ticker = cls.get_ticker(symbol)
-        hist = ticker.history(period="1d")
-        return float(hist['Close'].iloc[-1]) if not hist.empty else 100.0
+        """Get current price for a symbol (from the coalesced quote batch)
+        
+        Raises:
+            HTTPException: 503 when no price (not even a stale one) is available
+        """
+        try:
+            bar = quote_batch.get(symbol)
+        except upstream.UpstreamUnavailable as e:
+            logger.warning(f"Price for {symbol} unavailable: {e}")
+            bar = None
+        if bar is None:
+            raise HTTPException(status_code=503, detail=f"No price available for {symbol}")
+        return bar.price
+    
+    @classmethod
+    def prefetch_quotes(cls, keys: Iterable[Tuple[str, str]]):
+        """Fetch in one batch the spot of every symbol whose (symbol, expiration) chain will be refetched
+        
+        Callers that load many chains one after another (portfolio marking)
+        would otherwise make one quote download per symbol.
+        """
+        symbols = set()
+        for symbol, expiration in keys:
+            chain = cls._chain_cache.get((symbol, expiration))
+            if chain is None or not ttl_policy.is_fresh("chain", chain.fetched_at):
+                symbols.add(symbol)
+        if len(symbols) > 1:
+            quote_batch.get_many(sorted(symbols))
     
     @classmethod
     def calculate_time_to_expiration(cls, expiration: str) -> float:
@@ -168,30 +286,81 @@ class YahooFinanceService:
         return max(days_to_exp / 365.0, 1/365.0)  # At least 1 day
     
     @classmethod
-    def fetch_options_chain(cls, symbol: str, expiration: str) -> OptionsChain:
-        """Fetch options chain for a specific expiration"""
+    def get_chain(cls, symbol: str, expiration: str) -> Chain:
+        """Get the current chain snapshot for (symbol, expiration)
+        
+        Snapshots are refetched from Yahoo only once ttl_policy marks them stale
+        and are shared by every caller; scanners must treat them as read-only.
+        If the refetch fails the previous snapshot is served and flagged stale
+        in `upstream`; with no previous snapshot it raises a 503.
+        """
         if not expiration:
             raise HTTPException(status_code=400, detail="Expiration date is required")
         
-        try:
-            ticker = cls.get_ticker(symbol)
+        key = (symbol, expiration)
+        chain = cls._chain_cache.get(key)
+        if chain is not None and ttl_policy.is_fresh("chain", chain.fetched_at):
+            return chain
+        
+        # One fetch per key at a time; concurrent callers wait and share the result
+        with cls._chain_locks.setdefault(key, threading.Lock()):
+            chain = cls._chain_cache.get(key)
+            if chain is not None and ttl_policy.is_fresh("chain", chain.fetched_at):
+                return chain
             
-            if expiration not in ticker.options:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Invalid expiration date for {symbol}. Available: {', '.join(ticker.options[:5])}..."
+            try:
+                if not cls.is_listed_expiration(symbol, expiration):
+                    raise HTTPException(
+                        status_code=400, 
+                        detail=f"Invalid expiration date for {symbol}. Available: {', '.join(cls.get_expirations(symbol)[:5])}..."
+                    )
+                
+                opt_chain = upstream.call(
+                    f"option_chain({symbol} {expiration})", cls.get_ticker(symbol).option_chain, expiration,
+                    empty=lambda fetched: fetched.calls.empty and fetched.puts.empty
                 )
+                bar = quote_batch.get(symbol)
+                if bar is None:
+                    raise upstream.UpstreamUnavailable(f"No price available for {symbol}")
+            except upstream.UpstreamUnavailable as e:
+                if chain is None:
+                    raise HTTPException(status_code=503, detail=f"Options data for {symbol} is temporarily unavailable: {e}")
+                logger.warning(f"Serving stale {symbol} {expiration} chain from {chain.as_of}: {e}")
+                upstream.mark_stale(("chain", symbol, expiration))
+                return chain
             
-            opt_chain = ticker.option_chain(expiration)
-            current_price = cls.get_current_price(symbol)
-            T = cls.calculate_time_to_expiration(expiration)
-            r = cls.RISK_FREE_RATE
-            
-            # Process calls
-            calls = cls._process_options(opt_chain.calls, current_price, T, r, 'call')
+            upstream.mark_fresh(("chain", symbol, expiration))
+            with metrics.stage("prepare"):
+                chain = Chain(
+                    symbol=symbol,
+                    expiration=expiration,
+                    calls_df=opt_chain.calls,
+                    puts_df=opt_chain.puts,
+                    spot=bar.price,
+                    T=cls.calculate_time_to_expiration(expiration),
+                    r=cls.RISK_FREE_RATE
+                )
+            cls._chain_cache[key] = chain
+            result_cache.invalidate(chain)
+            snapshots.record_quietly(chain)
+            return chain
+    
+    @classmethod
+    def get_chains(cls, symbol: str, expirations: List[str]) -> List[Chain]:
+        """get_chain for several expirations, fetched concurrently (spots share one quote batch)"""
+        return list(cls._fetch_pool.map(lambda expiration: cls.get_chain(symbol, expiration), expirations))
+    
+    @classmethod
+    def fetch_options_chain(cls, symbol: str, expiration: str) -> OptionsChain:
+        """Fetch options chain for a specific expiration"""
+        if not expiration:
+            raise HTTPException(status_code=400, detail="Expiration date is required")
+        
+        try:
+            chain = cls.get_chain(symbol, expiration)
             
-            # Process puts
-            puts = cls._process_options(opt_chain.puts, current_price, T, r, 'put')
+            calls = cls._process_options(chain.calls)
+            puts = cls._process_options(chain.puts)
             
             logger.info(f"Options chain fetched for {symbol}: {len(calls)} calls, {len(puts)} puts for {expiration}")
             
@@ -199,7 +368,8 @@ class YahooFinanceService:
                 symbol=symbol,
                 expirationDate=expiration,
                 calls=calls,
-                puts=puts
+                puts=puts,
+                stale=upstream.is_stale(("chain", symbol, expiration))
             )
         except HTTPException:
             raise
@@ -207,50 +377,52 @@ class YahooFinanceService:
             logger.error(f"Error fetching options chain for {symbol}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to fetch options chain for {symbol}: {str(e)}")
     
-    @classmethod
-    def _process_options(cls, df: pd.DataFrame, current_price: float, T: float, r: float, option_type: str) -> List[OptionContract]:
-        """Process options dataframe into OptionContract list"""
-        import math
+    @staticmethod
+    def _process_options(side: ChainSide) -> List[OptionContract]:
+        """Convert one side of a chain snapshot into OptionContract list"""
+        def clean(values, default=0.0, decimals=2):
+            """Round column-wise, replacing NaN/inf with a default"""
+            values = np.where(np.isfinite(values), values, default)
+            return (np.round(values, decimals) if decimals is not None else values).tolist()
         
-        def safe_float(val, default=0.0):
-            """Convert to float, handling NaN and inf values"""
-            if pd.isna(val) or (isinstance(val, float) and (math.isnan(val) or math.isinf(val))):
-                return default
-            return float(val)
+        def counts(values):
+            """Integer counts with NaN mapped to None"""
+            return [int(v) if v == v else None for v in values.tolist()]
         
-        def safe_int(val, default=None):
-            """Convert to int, handling NaN values"""
-            if pd.isna(val):
-                return default
-            return int(val)
+        columns = zip(
+            clean(side.strike),
+            clean(side.last),
+            clean(side.bid),
+            clean(side.ask),
+            clean(side.change),
+            clean(side.percent_change),
+            counts(side.volume),
+            counts(side.open_interest),
+            clean(side.iv_or_default * 100),
+            side.in_the_money.tolist(),
+            clean(side.delta, decimals=None),
+            clean(side.gamma, decimals=None),
+            clean(side.theta, decimals=None),
+            clean(side.vega, decimals=None)
+        )
         
-        options = []
-        for _, row in df.iterrows():
-            strike = safe_float(row['strike'])
-            iv = safe_float(row['impliedVolatility'], 0.3)
-            
-            delta, gamma, theta, vega = calculate_greeks(current_price, strike, T, r, iv, option_type)
-            
-            # Ensure greeks are not NaN/inf
-            delta = safe_float(delta, 0.0)
-            gamma = safe_float(gamma, 0.0)
-            theta = safe_float(theta, 0.0)
-            vega = safe_float(vega, 0.0)
-            
-            options.append(OptionContract(
-                strike=round(strike, 2),
-                lastPrice=round(safe_float(row['lastPrice']), 2),
-                bid=round(safe_float(row['bid']), 2),
-                ask=round(safe_float(row['ask']), 2),
-                change=round(safe_float(row['change']), 2),
-                percentChange=round(safe_float(row['percentChange']), 2),
-                volume=safe_int(row['volume']),
-                openInterest=safe_int(row['openInterest']),
-                impliedVolatility=round(iv * 100, 2),
-                inTheMoney=bool(row['inTheMoney']) if not pd.isna(row['inTheMoney']) else False,
+        return [
+            OptionContract(
+                strike=strike,
+                lastPrice=last,
+                bid=bid,
+                ask=ask,
+                change=change,
+                percentChange=percent_change,
+                volume=volume,
+                openInterest=open_interest,
+                impliedVolatility=iv,
+                inTheMoney=itm,
                 delta=delta,
                 gamma=gamma,
                 theta=theta,
                 vega=vega
-            ))
-        return options
+            )
+            for (strike, last, bid, ask, change, percent_change, volume, open_interest,
+                 iv, itm, delta, gamma, theta, vega) in columns
+        ]
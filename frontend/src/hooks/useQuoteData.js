@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback, useRef } from "react";
 import axios from "axios";
-import { API } from "../utils/constants";
+import { API, CHART_MAX_POINTS } from "../utils/constants";
 
 /**
  * Custom hook for managing quote and history data
@@ -47,14 +47,19 @@ export const useQuoteData = (initialSymbol = "^SPX") => {
   const fetchHistory = useCallback(async (selectedPeriod) => {
     setIsLoadingHistory(true);
     try {
-      const response = await axios.get(`${API}/history?symbol=${symbol}&period=${selectedPeriod}`);
+      // LTTB keeps unevenly spaced original bars, which only suits the plain line;
+      // candles and indicators (Bollinger's 20-bar SMA) need evenly spaced buckets
+      const downsample = chartType === "line" ? "lttb" : "ohlc";
+      const response = await axios.get(
+        `${API}/history?symbol=${symbol}&period=${selectedPeriod}&max_points=${CHART_MAX_POINTS}&downsample=${downsample}`
+      );
       setHistory(response.data.data);
     } catch (e) {
       console.error(`Error fetching ${symbol} history:`, e);
     } finally {
       setIsLoadingHistory(false);
     }
-  }, [symbol]);
+  }, [symbol, chartType]);
 
   // Handle refresh
   const handleRefresh = useCallback(async () => {
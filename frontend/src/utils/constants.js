@@ -3,6 +3,9 @@
 export const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 export const API = `${BACKEND_URL}/api`;
 
+// Most bars the price chart requests; longer histories are downsampled server-side
+export const CHART_MAX_POINTS = 600;
+
 // Auto-refresh interval options
 export const REFRESH_INTERVALS = [
   { value: 0, label: "Off" },
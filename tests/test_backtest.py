@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import backtest, snapshots
+
+EXPIRY = pd.Timestamp("2026-03-20 16:00", tz="America/New_York")
+
+# Bull put spread: short 100 put, long 95 put (two padding slots), 2.00 credit
+IS_CALL = np.zeros((1, backtest.LEG_SLOTS), dtype=bool)
+STRIKE = np.array([[100.0, 95.0, 0.0, 0.0]])
+WEIGHT = np.array([[-1.0, 1.0, 0.0, 0.0]])
+TRADES = pd.DataFrame({"entry": [pd.Timestamp("2026-03-19 10:00", tz="America/New_York")], "credit": [2.0]})
+
+# Recorded (short put, long put) marks: cost to close is their difference
+MARKS = {"entry": (3.0, 1.0), "drop": (4.5, 1.0), "noon": (2.0, 0.5), "late": (0.7, 0.2)}
+SPOTS = {"entry": 101.0, "drop": 96.0, "noon": 102.0, "late": 104.0}
+
+
+def snaps(*names):
+    taken = {"entry": "2026-03-19 10:00", "drop": "2026-03-19 14:00",
+             "noon": "2026-03-20 12:00", "late": "2026-03-20 15:00"}
+    local = pd.to_datetime([taken[name] for name in names]).tz_localize("America/New_York")
+    return pd.DataFrame({"taken_at": local.tz_convert("UTC"), "local": local, "path": list(names)})
+
+
+@pytest.fixture(autouse=True)
+def recorded(monkeypatch):
+    def leg_marks(path, option_types, strikes):
+        short, long = MARKS[path]
+        return np.select([strikes == 100.0, strikes == 95.0], [short, long], np.nan)
+    
+    monkeypatch.setattr(snapshots, "leg_marks", leg_marks)
+    monkeypatch.setattr(snapshots, "spot", lambda path: SPOTS[path])
+
+
+def replay(frame, settle_spot=None, take_profits=(50.0,), stop_losses=(100.0,), close_before_expiry_hours=2.0):
+    exit_price, index, reason = backtest.replay(
+        TRADES, IS_CALL, STRIKE, WEIGHT, frame, EXPIRY, settle_spot,
+        np.array(take_profits), np.array(stop_losses), close_before_expiry_hours
+    )
+    return exit_price[0], index[0], [backtest.EXIT_REASONS[code] for code in reason[0]]
+
+
+def test_expiry_close_wins_over_take_profit_on_the_same_snapshot():
+    # At 15:00 the spread costs 0.50 (75% of the credit kept) with one hour left
+    exit_price, index, reason = replay(snaps("entry", "noon", "late"), take_profits=(50.0, 20.0), stop_losses=(100.0, 100.0))
+    
+    np.testing.assert_allclose(exit_price, [0.5, 1.5])
+    assert list(index) == [2, 1]
+    assert reason == ["expiry_close", "take_profit"]  # 20% is already reached at noon
+
+
+def test_stop_loss():
+    # At 14:00 on entry day the spread costs 3.50: a 75% loss
+    exit_price, index, reason = replay(snaps("entry", "drop", "noon"), take_profits=(90.0, 90.0), stop_losses=(50.0, 100.0))
+    
+    np.testing.assert_allclose(exit_price[0], 3.5)
+    assert (index[0], reason[0]) == (1, "stop_loss")
+    assert (index[1], reason[1]) == (-1, "settled")  # Still open, nothing to settle at yet
+
+
+def test_unclosed_trades_settle_at_intrinsic_or_stay_open():
+    frame = snaps("entry", "noon")
+    
+    settled_price, index, reason = replay(frame, settle_spot=97.0, take_profits=(90.0,), close_before_expiry_hours=0.0)
+    open_price, _, _ = replay(frame, settle_spot=None, take_profits=(90.0,), close_before_expiry_hours=0.0)
+    
+    assert (settled_price[0], index[0], reason) == (3.0, -1, ["settled"])
+    assert np.isnan(open_price[0])
+
+
+def test_settlement_waits_for_the_expiration_close():
+    during = EXPIRY - pd.Timedelta(hours=1)
+    after = EXPIRY + pd.Timedelta(hours=1)
+    
+    assert backtest._settlement_spot(snaps("entry", "noon", "late"), EXPIRY, now=during) is None
+    assert backtest._settlement_spot(snaps("entry", "noon", "late"), EXPIRY, now=after) == 104.0
+    assert backtest._settlement_spot(snaps("entry"), EXPIRY, now=after) is None  # Nothing recorded that day
@@ -0,0 +1,66 @@
+import numpy as np
+
+from services.payoff import LegArrays, breakevens, payoff_extremes, profit_intervals
+
+
+def roots(legs):
+    """Breakevens of the first position, NaN padding dropped"""
+    found = breakevens(legs)[0]
+    return found[np.isfinite(found)]
+
+
+def bull_put_spread():
+    """Short 100 put, long 95 put for a 1.50 credit"""
+    return LegArrays([[100.0, 95.0]], False, [[-1.0, 1.0]], 1.5)
+
+
+def iron_condor():
+    """Long 85 put, short 90 put, short 110 call, long 115 call for a 2.00 credit"""
+    return LegArrays([[85.0, 90.0, 110.0, 115.0]], [[False, False, True, True]], [[1.0, -1.0, -1.0, 1.0]], 2.0)
+
+
+def test_put_spread_max_loss_and_breakeven():
+    best, worst = payoff_extremes(bull_put_spread())
+    
+    assert best[0] == 1.5
+    assert worst[0] == -3.5  # 5 wide less the credit
+    np.testing.assert_allclose(roots(bull_put_spread()), [98.5])
+
+
+def test_iron_condor_two_breakevens():
+    best, worst = payoff_extremes(iron_condor())
+    lo, hi = profit_intervals(iron_condor())
+    profitable = hi[0] > lo[0]
+    
+    assert (best[0], worst[0]) == (2.0, -3.0)
+    np.testing.assert_allclose(roots(iron_condor()), [88.0, 112.0])
+    np.testing.assert_allclose(np.stack([lo[0][profitable], hi[0][profitable]], axis=1), [[88.0, 90.0], [90.0, 110.0], [110.0, 112.0]])
+
+
+def test_unbounded_payoffs():
+    long_call = LegArrays([[100.0]], True, [[1.0]], -3.0)
+    short_call = LegArrays([[100.0]], True, [[-1.0]], 3.0)
+    
+    assert payoff_extremes(long_call) == (np.inf, -3.0)
+    assert payoff_extremes(short_call) == (3.0, -np.inf)
+    np.testing.assert_allclose(roots(long_call), [103.0])
+    np.testing.assert_allclose(roots(short_call), [103.0])
+    
+    lo, hi = profit_intervals(long_call)
+    assert (lo[0, -1], hi[0, -1]) == (103.0, np.inf)
+
+
+def test_padded_batch_matches_single_positions():
+    batch = LegArrays(
+        [[100.0, 95.0, 0.0, 0.0], [85.0, 90.0, 110.0, 115.0]],
+        [[False, False, False, False], [False, False, True, True]],
+        [[-1.0, 1.0, 0.0, 0.0], [1.0, -1.0, -1.0, 1.0]],
+        [1.5, 2.0],
+    )
+    best, worst = payoff_extremes(batch)
+    
+    np.testing.assert_array_equal(best, [1.5, 2.0])
+    np.testing.assert_array_equal(worst, [-3.5, -3.0])
+    found = breakevens(batch)
+    np.testing.assert_allclose(found[0][np.isfinite(found[0])], [98.5])
+    np.testing.assert_allclose(found[1][np.isfinite(found[1])], [88.0, 112.0])
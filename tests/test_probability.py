@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from scipy.stats import norm
+
+from benchmarks.synthetic import make_chain_frames
+from services.chain import Chain
+from services.payoff import LegArrays
+from services.probability import probability_of_profit
+
+SPOT, T, R, VOL = 100.0, 30 / 365, 0.04, 0.2
+
+
+@pytest.fixture
+def chain():
+    """Flat-volatility chain, so the lognormal Monte Carlo samples use VOL"""
+    calls, puts = make_chain_frames(41, SPOT, step=1.0, T=T, r=R)
+    calls["impliedVolatility"] = puts["impliedVolatility"] = VOL
+    return Chain("TEST", "2099-01-01", calls, puts, SPOT, T, R)
+
+
+def prob_above(x: float) -> float:
+    """P(S_T > x) for a lognormal terminal price"""
+    return norm.sf((np.log(x / SPOT) - (R - VOL ** 2 / 2) * T) / (VOL * np.sqrt(T)))
+
+
+def test_closed_form_matches_lognormal_cdf(chain):
+    put_spread = LegArrays([[100.0, 95.0]], False, [[-1.0, 1.0]], 1.5)  # Profits above 98.5
+    condor = LegArrays([[85.0, 90.0, 110.0, 115.0]], [[False, False, True, True]],
+                       [[1.0, -1.0, -1.0, 1.0]], 2.0)  # Profits between 88 and 112
+    
+    assert probability_of_profit(chain, put_spread, sigma=VOL)[0] == pytest.approx(prob_above(98.5), abs=1e-12)
+    assert probability_of_profit(chain, condor, sigma=VOL)[0] == pytest.approx(prob_above(88.0) - prob_above(112.0), abs=1e-12)
+
+
+def test_monte_carlo_agrees_with_closed_form(chain):
+    legs = LegArrays([[100.0, 95.0], [105.0, 110.0]], [[False, False], [True, True]],
+                     [[-1.0, 1.0], [-1.0, 1.0]], [1.5, 1.0])
+    closed = probability_of_profit(chain, legs, sigma=VOL)
+    sampled = probability_of_profit(chain, legs, mode="monte_carlo", smile=False)
+    
+    np.testing.assert_allclose(sampled, closed, atol=0.01)
+
+
+def test_invalid_volatility_gives_nan(chain):
+    legs = LegArrays([[100.0, 95.0]], False, [[-1.0, 1.0]], 1.5)
+    
+    assert np.isnan(probability_of_profit(chain, legs, sigma=0.0)[0])
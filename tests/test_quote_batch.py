@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import httpx
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+
+from routes import quotes
+from services import quote_batch
+from services.yahoo_finance import YahooFinanceService
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "SPY", "QQQ", "IWM", "^GSPC", "^VIX"]
+
+
+def _bars(price: float) -> pd.DataFrame:
+    index = pd.date_range("2026-01-05", periods=2, freq="D")
+    return pd.DataFrame({"Open": price, "High": price + 1, "Low": price - 1, "Close": [price - 2, price],
+                         "Volume": 1e6}, index=index)
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Symbol lists passed to each upstream download"""
+    calls = []
+    
+    def download(symbols):
+        calls.append(list(symbols))
+        return {symbol: _bars(100.0 + i) for i, symbol in enumerate(symbols)}
+    
+    monkeypatch.setattr(quote_batch, "_batcher", quote_batch.QuoteBatcher(download=download, window=0.1))
+    monkeypatch.setattr(YahooFinanceService, "get_info", classmethod(lambda cls, symbol: {}))
+    return calls
+
+
+def test_concurrent_threads_share_one_download(downloads):
+    barrier = threading.Barrier(len(SYMBOLS))
+    results = {}
+    
+    def request(symbol):
+        barrier.wait()
+        results[symbol] = quote_batch.get(symbol)
+    
+    threads = [threading.Thread(target=request, args=(symbol,)) for symbol in SYMBOLS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(downloads) == 1
+    assert sorted(downloads[0]) == sorted(SYMBOLS)
+    assert all(results[symbol].symbol == symbol for symbol in SYMBOLS)
+
+
+def test_concurrent_quote_requests_share_one_download(downloads):
+    app = FastAPI()
+    app.include_router(quotes.router, prefix="/api")
+    
+    async def request_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/api/quote", params={"symbol": s}) for s in SYMBOLS))
+    
+    responses = asyncio.run(request_all())
+    
+    assert [r.status_code for r in responses] == [200] * len(SYMBOLS)
+    assert [r.json()["symbol"] for r in responses] == SYMBOLS
+    assert len(downloads) == 1
+    assert sorted(downloads[0]) == sorted(SYMBOLS)
+
+
+def test_fresh_quotes_are_not_downloaded_again(downloads):
+    quote_batch.get_many(["AAPL", "MSFT"])
+    quote_batch.get_many(["MSFT", "AAPL"])
+    
+    assert downloads == [["AAPL", "MSFT"]]
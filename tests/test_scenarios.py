@@ -0,0 +1,46 @@
+import numpy as np
+
+from services import scenarios
+from services.greeks import black_scholes_price
+
+SPOT_SHOCKS, IV_SHOCKS, DAYS = [-10.0, 0.0, 10.0], [0.0, 5.0], [0, 7]
+
+
+def position(pos_id, legs, quantity=1):
+    return {
+        "id": pos_id, "symbol": "SPY", "expiration": "2099-01-01", "strategy_type": "custom",
+        "quantity": quantity, "status": "open",
+        "legs": [{"action": action, "option_type": option_type, "strike": strike, "price": 1.0}
+                 for action, option_type, strike in legs],
+    }
+
+
+def fake_leg_inputs(legs):
+    """Every leg priced at spot 100, 30 days, 4% and 20% vol; the "unpriced" position has no spot"""
+    legs = legs.assign(spot=100.0, T=30 / 365, r=0.04, iv=0.2)
+    legs.loc[legs["position_id"] == "unpriced", "spot"] = np.nan
+    return legs
+
+
+def test_legs_are_summed_per_position(monkeypatch):
+    monkeypatch.setattr(scenarios, "leg_inputs", fake_leg_inputs)
+    positions = [
+        position("put", [("buy", "put", 95.0)], quantity=2),
+        position("flat", [("buy", "call", 100.0), ("sell", "call", 100.0)]),
+        position("unpriced", [("buy", "call", 100.0)]),
+    ]
+    
+    result = scenarios.portfolio_scenarios(positions, SPOT_SHOCKS, IV_SHOCKS, DAYS)
+    by_key = {p.key: np.array(p.pnl) for p in result.positions}
+    
+    S = 100.0 * (1 + np.array(SPOT_SHOCKS) / 100)[:, None, None]
+    sigma = 0.2 + np.array(IV_SHOCKS)[None, :, None] / 100
+    T_left = 30 / 365 - np.array(DAYS)[None, None, :] / 365
+    expected = (black_scholes_price(S, 95.0, T_left, 0.04, sigma, "put")
+                - black_scholes_price(100.0, 95.0, 30 / 365, 0.04, 0.2, "put")) * 200
+    
+    assert sorted(by_key) == ["flat", "put"]
+    assert result.unpriced_positions == ["unpriced"]
+    np.testing.assert_array_equal(by_key["flat"], 0.0)
+    np.testing.assert_allclose(by_key["put"], np.round(expected, 2))
+    np.testing.assert_allclose(result.total, np.round(expected, 2))
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from services import value_at_risk
+from services.greeks import black_scholes_price
+from services.value_at_risk import ScenarioSet, revalue_positions
+
+RETURNS = np.array([[-0.05, 0.02], [0.0, 0.0], [0.03, -0.01]])  # Paths x (AAA, BBB) log returns
+
+
+def legs_frame():
+    """Legs of positions "a" and "b" interleaved; "a" is long and short the same call"""
+    return pd.DataFrame({
+        "position_id": ["b", "a", "b", "a"],
+        "symbol": ["BBB", "AAA", "AAA", "AAA"],
+        "option_type": ["put", "call", "call", "call"],
+        "strike": [50.0, 100.0, 105.0, 100.0],
+        "contracts": [-1.0, 1.0, 2.0, -1.0],
+        "spot": [50.0, 100.0, 100.0, 100.0],
+        "T": 30 / 365, "r": 0.04, "iv": 0.25,
+    })
+
+
+def leg_pnl(option_type, strike, contracts, spot, returns):
+    S = spot * np.exp(returns)
+    T_next = 30 / 365 - value_at_risk.HORIZON_DAYS / 365
+    return (black_scholes_price(S, strike, T_next, 0.04, 0.25, option_type)
+            - black_scholes_price(spot, strike, 30 / 365, 0.04, 0.25, option_type)) * contracts * 100
+
+
+def test_leg_pnl_is_summed_per_position():
+    scenario_set = ScenarioSet(("test",), ("AAA", "BBB"), RETURNS, np.eye(2))
+    
+    ids, pnl = revalue_positions(legs_frame(), scenario_set)
+    
+    expected_b = leg_pnl("put", 50.0, -1.0, 50.0, RETURNS[:, 1]) + leg_pnl("call", 105.0, 2.0, 100.0, RETURNS[:, 0])
+    assert list(ids) == ["a", "b"]
+    np.testing.assert_allclose(pnl[0], 0.0, atol=1e-9)
+    np.testing.assert_allclose(pnl[1], expected_b)
+
+
+def test_batching_does_not_change_pnl(monkeypatch):
+    scenario_set = ScenarioSet(("test",), ("AAA", "BBB"), RETURNS, np.eye(2))
+    _, whole = revalue_positions(legs_frame(), scenario_set)
+    
+    monkeypatch.setattr(value_at_risk, "MAX_EVALUATIONS", len(RETURNS))  # One leg per batch
+    _, batched = revalue_positions(legs_frame(), scenario_set)
+    
+    np.testing.assert_allclose(batched, whole)